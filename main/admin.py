@@ -1,14 +1,24 @@
 from django.contrib import admin
-from .models import Event, Registration
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from . import services
+from .models import Event, Registration, WaitlistEntry
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'date', 'location', 'organizer', 'created_at')
+    list_display = ('title', 'date', 'location', 'organizer', 'registration_count', 'capacity', 'created_at')
     list_filter = ('date', 'organizer')
     search_fields = ('title', 'description', 'location')
     date_hierarchy = 'date'
 
+    def delete_model(self, request, obj):
+        services.delete_event(obj)
+
+    def delete_queryset(self, request, queryset):
+        for event in queryset:
+            services.delete_event(event)
+
 
 @admin.register(Registration)
 class RegistrationAdmin(admin.ModelAdmin):
@@ -16,3 +26,32 @@ class RegistrationAdmin(admin.ModelAdmin):
     list_filter = ('event', 'created_at')
     search_fields = ('student__username', 'event__title')
     date_hierarchy = 'created_at'
+
+    def delete_model(self, request, obj):
+        services.unregister_student(obj.event, obj.student)
+
+    def delete_queryset(self, request, queryset):
+        for registration in queryset.select_related('event', 'student'):
+            services.unregister_student(registration.event, registration.student)
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'event', 'created_at')
+    list_filter = ('event',)
+    search_fields = ('student__username', 'event__title')
+
+
+class OrganizerAwareUserAdmin(UserAdmin):
+    """User admin that purges an organizer's events in chunks before deleting them"""
+
+    def delete_model(self, request, obj):
+        services.delete_organizer(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            services.delete_organizer(user)
+
+
+admin.site.unregister(User)
+admin.site.register(User, OrganizerAwareUserAdmin)
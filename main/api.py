@@ -0,0 +1,180 @@
+"""
+Read-only JSON API, version 1.
+
+Rows are read with .values() and serialized as plain dicts, so no model
+instances are built. Clients choose fields with ?fields=a,b,c and page with
+the 'next' URL (keyset cursors, as on the HTML listings). Every response has
+an ETag; event list and detail ETags come from the cache version tokens, so a
+304 costs no database query at all.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+
+from . import caching, ical
+from .budgets import query_budget
+from .models import Event, Registration
+from .pagination import InvalidCursor, KeysetPaginator
+from .views import EVENT_SLICES, MAX_PAGE_SIZE, POPULAR_ORDERING
+
+# Public field name -> ORM lookup
+EVENT_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'date': 'date',
+    'location': 'location',
+    'organizer': 'organizer__username',
+    'registration_count': 'registration_count',
+    'capacity': 'capacity',
+    'updated_at': 'updated_at',
+}
+EVENT_LIST_DEFAULT = ('id', 'title', 'date', 'location', 'organizer', 'registration_count', 'capacity')
+REGISTRATION_FIELDS = {
+    'id': 'id',
+    'registered_at': 'created_at',
+    'event_id': 'event_id',
+    'event_title': 'event__title',
+    'event_date': 'event__date',
+    'event_location': 'event__location',
+}
+REGISTRATION_ORDERING = ('-created_at', '-id')
+DEFAULT_PAGE_SIZE = 50
+
+
+class BadRequest(Exception):
+    """Raised for invalid query parameters; becomes a 400 response"""
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def _error(message, status):
+    return _json({'error': message}, status=status)
+
+
+def _etag(*parts):
+    return '"' + hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest() + '"'
+
+
+def _conditional(request, etag, build):
+    """Answer 304 if the client's copy matches `etag`, otherwise the JSON from build()"""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            response = _json(build())
+        except BadRequest as exc:
+            return _error(str(exc), 400)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _fields(request, available, default):
+    """Parse ?fields= into public names, keeping the order given"""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(default)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise BadRequest(f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(available)}.')
+    return names
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get('size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('size must be an integer.')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _page(request, queryset, fields, lookups, ordering):
+    """Fetch one keyset page of .values() rows and project them onto `fields`"""
+    keys = [name.lstrip('-') for name in ordering]
+    values = queryset.values(*dict.fromkeys(keys + [lookups[name] for name in fields]))
+    paginator = KeysetPaginator(values, ordering, _page_size(request))
+    try:
+        page = paginator.page(request.GET.get('after'))
+    except InvalidCursor:
+        raise BadRequest('Invalid page cursor.')
+
+    next_url = None
+    if page.next_cursor:
+        params = request.GET.copy()
+        params['after'] = page.next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return {
+        'results': [{name: row[lookups[name]] for name in fields} for row in page],
+        'next': next_url,
+    }
+
+
+@query_budget(1)
+@require_GET
+def event_list(request):
+    """GET /api/v1/events/?when=upcoming|past&sort=date|popular&fields=...&size=...&after=..."""
+    when = request.GET.get('when', 'upcoming')
+    if when not in EVENT_SLICES:
+        return _error('when must be upcoming or past.', 400)
+    sort = request.GET.get('sort', 'date')
+    if sort not in ('date', 'popular'):
+        return _error('sort must be date or popular.', 400)
+
+    # The listing changes when events or registration counts change, and as
+    # events move from upcoming to past; the time bucket bounds that drift
+    tokens = caching.list_versions([caching.EVENTS_LIST, caching.POPULARITY_LIST])
+    bucket = int(time.time() // getattr(settings, 'EVENT_CACHE_TIMEOUT', 300))
+    etag = _etag('events', *tokens, bucket, request.GET.urlencode())
+
+    def build():
+        fields = _fields(request, EVENT_FIELDS, EVENT_LIST_DEFAULT)
+        events = Event.objects.upcoming() if when == 'upcoming' else Event.objects.past()
+        ordering = POPULAR_ORDERING if sort == 'popular' else EVENT_SLICES[when]
+        return _page(request, events, fields, EVENT_FIELDS, ordering)
+
+    return _conditional(request, etag, build)
+
+
+@query_budget(1)
+@require_GET
+def event_detail(request, event_id):
+    """GET /api/v1/events/<id>/?fields=..."""
+    version = caching.event_versions([event_id])[event_id]
+    etag = _etag('event', event_id, version, request.GET.get('fields', ''))
+
+    def build():
+        fields = _fields(request, EVENT_FIELDS, EVENT_FIELDS)
+        row = Event.objects.filter(pk=event_id).values(*[EVENT_FIELDS[name] for name in fields]).first()
+        if row is None:
+            raise LookupError
+        return {name: row[EVENT_FIELDS[name]] for name in fields}
+
+    try:
+        return _conditional(request, etag, build)
+    except LookupError:
+        return _error('Event not found.', 404)
+
+
+@query_budget(4)
+@require_GET
+def my_registrations(request):
+    """GET /api/v1/me/registrations/?fields=...&size=...&after=... (session authentication)"""
+    if not request.user.is_authenticated:
+        return _error('Authentication required.', 401)
+    # The same validators as the student's calendar feed: count and newest changes
+    etag, _ = ical.feed_state(ical.STUDENT, request.user.pk)
+    etag = _etag('registrations', etag, request.GET.urlencode())
+
+    def build():
+        fields = _fields(request, REGISTRATION_FIELDS, REGISTRATION_FIELDS)
+        registrations = Registration.objects.filter(student=request.user, event__deleted_at__isnull=True)
+        return _page(request, registrations, fields, REGISTRATION_FIELDS, REGISTRATION_ORDERING)
+
+    return _conditional(request, etag, build)
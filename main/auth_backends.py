@@ -0,0 +1,32 @@
+"""
+Authentication backend that caches the users of authenticated requests.
+
+AuthenticationMiddleware looks the session's user up on every request. With
+AUTH_USER_CACHE_TIMEOUT set, CachedModelBackend serves that lookup from the
+cache instead; the session's auth hash is still checked against the cached
+user's password, and signals.forget_cached_user drops the entry whenever the
+user is saved or deleted.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() goes through the cache"""
+
+    def get_user(self, user_id):
+        timeout = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 0)
+        if not timeout:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, timeout)
+        return user
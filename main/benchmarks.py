@@ -0,0 +1,163 @@
+"""
+View benchmarks shared by the run_benchmarks and load_test commands.
+
+scenarios() turns the data in the database into one request per URL in
+main/urls.py, made as the kind of user who would normally make it. Results
+are written as JSON, and compare() checks a run against a saved baseline so a
+slower view or an extra query fails the run.
+"""
+import json
+import statistics
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from . import ical, services
+from .metrics import percentile
+from .models import Event, Registration
+
+# Dataset sizes for run_benchmarks --sizes, passed to seeding.seed_dataset
+SIZES = {
+    'tiny': {'students': 20, 'events': 30, 'registrations': 100},
+    'small': {'students': 500, 'events': 1000, 'registrations': 10000},
+    'medium': {'students': 2000, 'events': 5000, 'registrations': 50000},
+    'large': {'students': 5000, 'events': 20000, 'registrations': 200000},
+}
+# URL names that are not benchmarked, with the reason
+SKIPPED = {
+    'logout': 'ends the session the other scenarios use',
+}
+# Latencies below this many milliseconds never count as regressions; the
+# noise on sub-millisecond timings is larger than any real change
+LATENCY_FLOOR_MS = 1.0
+
+# One benchmarked request. `user` is None for anonymous requests and `prepare`,
+# if set, is called untimed before each request to put the data in the state
+# the request expects.
+Scenario = namedtuple('Scenario', 'name url_name method path data user prepare')
+
+
+def summarize(latencies):
+    """Median, p95 and p99 of a list of millisecond latencies"""
+    ordered = sorted(latencies)
+    return {
+        'median_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(percentile(ordered, 0.95), 3),
+        'p99_ms': round(percentile(ordered, 0.99), 3),
+    }
+
+
+def pick_subjects():
+    """The event and users the scenarios act on; raises LookupError without enough data"""
+    event = (
+        Event.objects.upcoming().order_by('-registration_count', '-id').first()
+        or Event.objects.order_by('-registration_count', '-id').first()
+    )
+    registration = Registration.objects.filter(event__deleted_at__isnull=True).select_related('student').first()
+    if event is None or registration is None:
+        raise LookupError('No events or registrations found.')
+    student = registration.student
+    open_event = (
+        Event.objects.upcoming().with_free_seat().exclude(registrations__student=student)
+        .order_by('id').first()
+    )
+    return {
+        'event': event,
+        'open_event': open_event,
+        'student': student,
+        'organizer': event.organizer,
+        'admin': User.objects.filter(is_superuser=True).order_by('id').first(),
+    }
+
+
+def scenarios(subjects):
+    """Scenarios covering every URL name in main/urls.py except SKIPPED"""
+    event, student = subjects['event'], subjects['student']
+    organizer, admin = subjects['organizer'], subjects['admin']
+    word = event.title.split()[0]
+    student_feed = ical.feed_token(student, ical.STUDENT)
+
+    def get(name, url_name, user=None, args=(), query=''):
+        return Scenario(name, url_name, 'GET', reverse(url_name, args=args) + query, None, user, None)
+
+    result = [
+        get('home', 'home'),
+        get('home (popular)', 'home', query='?sort=popular'),
+        get('search', 'search_events', query=f'?q={word}'),
+        # A two-letter prefix matches a large share of the events
+        get('search (broad)', 'search_events', query=f'?q={word[:2]}'),
+        get('login', 'login'),
+        get('register', 'register'),
+        get('event_detail', 'event_detail', args=[event.id]),
+        get('event_detail (student)', 'event_detail', student, [event.id]),
+        get('my_events', 'my_events', student),
+        get('calendar_feed', 'calendar_feed', args=[ical.STUDENT, student_feed]),
+        get('dashboard (organizer)', 'dashboard', organizer),
+        get('create_event', 'create_event', organizer),
+        get('edit_event', 'edit_event', organizer, [event.id]),
+        get('delete_event', 'delete_event', organizer, [event.id]),
+        get('event_registrations', 'event_registrations', organizer, [event.id]),
+        get('import_registrations', 'import_registrations', organizer, [event.id]),
+        get('export_event_registrations', 'export_event_registrations', organizer, [event.id, 'csv']),
+        get('export_registrations', 'export_registrations', organizer, ['csv']),
+        get('api_event_list', 'api_event_list'),
+        get('api_event_detail', 'api_event_detail', args=[event.id]),
+        get('api_my_registrations', 'api_my_registrations', student),
+    ]
+    if admin is not None:
+        result += [
+            get('dashboard (admin)', 'dashboard', admin),
+            get('cache_stats', 'cache_stats', admin),
+            get('request_stats', 'request_stats', admin),
+        ]
+
+    open_event = subjects['open_event']
+    if open_event is not None:
+        # Each request is timed on its own, prepared by an untimed call of the other
+        register = reverse('register_for_event', args=[open_event.id])
+        unregister = reverse('unregister_from_event', args=[open_event.id])
+        result += [
+            Scenario(
+                'register_for_event', 'register_for_event', 'POST', register, {}, student,
+                lambda: services.unregister_student(open_event, student),
+            ),
+            Scenario(
+                'unregister_from_event', 'unregister_from_event', 'POST', unregister, {}, student,
+                lambda: services.register_student(open_event, student),
+            ),
+        ]
+    return result
+
+
+def write_results(path, results, **meta):
+    with open(path, 'w') as output:
+        json.dump({'meta': meta, 'results': results}, output, indent=2, default=str)
+
+
+def load_results(path):
+    with open(path) as source:
+        return json.load(source)['results']
+
+
+def compare(results, baseline, threshold, latency_key='median_ms'):
+    """
+    Describe every result that regressed against the baseline.
+
+    Results are matched on (size, name). A latency regresses when it is more
+    than `threshold` (a fraction) above the baseline and above
+    LATENCY_FLOOR_MS; a query count regresses when it grows at all.
+    """
+    previous = {(row.get('size'), row['name']): row for row in baseline}
+    regressions = []
+    for row in results:
+        before = previous.get((row.get('size'), row['name']))
+        if before is None:
+            continue
+        label = f"{row.get('size') or 'live'} {row['name']}"
+        latency, limit = row[latency_key], before[latency_key] * (1 + threshold)
+        if latency > limit and latency > LATENCY_FLOOR_MS:
+            regressions.append(f'{label}: {latency_key} {before[latency_key]} -> {latency}')
+        if row.get('queries') is not None and before.get('queries') is not None and row['queries'] > before['queries']:
+            regressions.append(f"{label}: queries {before['queries']} -> {row['queries']}")
+    return regressions
@@ -0,0 +1,174 @@
+"""
+Query budgets: the most SQL queries a view, or any block of code, may run.
+
+Views declare a budget with @query_budget(n); other code can use
+`with QueryBudget(n, 'label'):`. Queries are counted by an execute_wrapper on
+every connection, which finds the open budgets through a context variable, so
+the queries an async view runs in a sync_to_async thread count as well.
+
+When a budget is exceeded and QUERY_BUDGET_STRICT is on (always under
+`manage.py test`) QueryBudgetExceeded is raised, listing the queries grouped
+by the line of project code that ran them. Otherwise a warning is logged
+with the stack of the first query over budget and the request carries on.
+"""
+import logging
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_active = ContextVar('query_budget', default=None)
+# Characters of SQL shown per query in reports
+SQL_PREVIEW = 300
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a block runs more queries than its budget"""
+
+
+def _project_frames(stack):
+    """The frames of a stack that are in project code, outside the execute wrappers"""
+    root = str(settings.BASE_DIR)
+    wrappers = (__file__, metrics.__file__)
+    return [
+        frame for frame in stack
+        if frame.filename.startswith(root) and frame.filename not in wrappers and 'site-packages' not in frame.filename
+    ]
+
+
+def _call_site(stack):
+    """The innermost frame in project code, as 'path:line in function'"""
+    frames = _project_frames(stack)
+    if not frames:
+        return '<outside project code>'
+    frame = frames[-1]
+    return f'{frame.filename[len(str(settings.BASE_DIR)) + 1:]}:{frame.lineno} in {frame.name}'
+
+
+class QueryBudget:
+    """Context manager that fails or warns when its block runs more than `limit` queries"""
+
+    def __init__(self, limit, label=None, strict=None):
+        self.limit = limit
+        self.label = label or 'block'
+        self.strict = getattr(settings, 'QUERY_BUDGET_STRICT', False) if strict is None else strict
+        self.count = 0
+        # Strict budgets keep every query for the report; lenient ones only
+        # the first one over budget, so staying within budget costs no stacks
+        self.queries = []
+        self.sample = None
+
+    def __enter__(self):
+        self.parent = _active.get()
+        self._token = _active.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active.reset(self._token)
+        if exc_type is None and self.count > self.limit:
+            if self.strict:
+                raise QueryBudgetExceeded(self.report())
+            sql, stack = self.sample
+            logger.warning(
+                '%s ran %d queries, over its budget of %d. First query over budget: %s\n%s',
+                self.label, self.count, self.limit, sql[:SQL_PREVIEW],
+                ''.join(traceback.format_list(_project_frames(stack) or stack[-10:])),
+            )
+
+    def needs_stack(self):
+        return self.strict or (self.count == self.limit and self.sample is None)
+
+    def record(self, sql, stack):
+        self.count += 1
+        if self.strict:
+            self.queries.append((_call_site(stack), sql))
+        elif self.count > self.limit and self.sample is None:
+            self.sample = (sql, stack)
+
+    def report(self):
+        """The queries grouped by call site, busiest first"""
+        by_site = defaultdict(list)
+        for site, sql in self.queries:
+            by_site[site].append(sql)
+        lines = [f'{self.label} ran {self.count} queries, over its budget of {self.limit}:']
+        for site, statements in sorted(by_site.items(), key=lambda item: -len(item[1])):
+            lines.append(f'  {len(statements)}x {site}')
+            for sql in dict.fromkeys(statements):
+                lines.append(f'      {sql[:SQL_PREVIEW]}')
+        return '\n'.join(lines)
+
+
+def charge(sql):
+    """Count one query against every open budget"""
+    budget = _active.get()
+    stack = None
+    while budget is not None:
+        if stack is None and budget.needs_stack():
+            stack = traceback.extract_stack()[:-1]
+        budget.record(sql, stack)
+        budget = budget.parent
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Database execute_wrapper that counts queries against every open budget"""
+    charge(sql)
+    return execute(sql, params, many, context)
+
+
+def instrument(connection):
+    """Install sql_wrapper on a database connection, once"""
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+@contextmanager
+def exempt():
+    """Do not count the block's queries against any budget, e.g. jobs run inline"""
+    token = _active.set(None)
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def query_budget(limit):
+    """Decorate a sync or async view with a budget of `limit` queries"""
+    def decorator(view):
+        label = f'{view.__module__}.{view.__qualname__}'
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                with QueryBudget(limit, label):
+                    return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                with QueryBudget(limit, label):
+                    return view(request, *args, **kwargs)
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+class QueryBudgetTestMixin:
+    """
+    TestCase mixin: budgeted views raise when over budget, whatever the
+    settings, and assertMaxQueries() puts a budget on any block.
+    """
+
+    def setUp(self):
+        super().setUp()
+        strict = self.settings(QUERY_BUDGET_STRICT=True)
+        strict.enable()
+        self.addCleanup(strict.disable)
+
+    def assertMaxQueries(self, limit, label=None):
+        return QueryBudget(limit, label or self.id(), strict=True)
@@ -0,0 +1,314 @@
+"""
+Caching of event list pages, rendered event fragments, event objects and
+whole pages for anonymous visitors.
+
+Every cache key embeds a version token. Signals replace the token for an event
+whenever the event or one of its registrations changes, and replace the list
+tokens whenever a listing could change, so stale entries are never read again
+and simply expire. Tokens are random rather than incrementing integers, so a
+primary key reused after a delete, or an evicted or expired version key, can
+never resurrect an old fragment. Version keys expire too, so requests for ids
+that do not exist cannot grow the cache without bound.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.safestring import mark_safe
+
+from .models import Event
+from .pagination import KeysetPage
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+# Listings that change when any event is created, edited or deleted
+EVENTS_LIST = 'events'
+# Listings ordered by registration count, which change on every sign-up
+POPULARITY_LIST = 'popularity'
+# Anonymous listing pages, which also change when a fragment changes without
+# the listing itself moving, e.g. when an organizer is renamed
+PAGES = 'pages'
+# Per-event links of the fragment templates, as {{ urls.<key> }}
+EVENT_URL_NAMES = {
+    'detail': 'event_detail',
+    'registrations': 'event_registrations',
+    'edit': 'edit_event',
+    'delete': 'delete_event',
+}
+_URL_PLACEHOLDER = 2147483647
+
+
+class Fragment:
+    """Rendered HTML for one event, tagged with the event id"""
+
+    def __init__(self, event_id, html):
+        self.id = event_id
+        self.html = mark_safe(html)
+
+
+def _timeout():
+    return getattr(settings, 'EVENT_CACHE_TIMEOUT', 300)
+
+
+def _version_timeout():
+    return getattr(settings, 'CACHE_VERSION_TIMEOUT', 3600)
+
+
+def _record(namespace, hits, misses):
+    with _stats_lock:
+        _stats[f'{namespace}_hits'] += hits
+        _stats[f'{namespace}_misses'] += misses
+
+
+def cache_stats():
+    """Return hit/miss counters for this process"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+
+def bump_event_version(*event_ids):
+    """Invalidate every cached fragment and object for the given events"""
+    cache.set_many({f'event:{event_id}:version': _new_token() for event_id in event_ids}, _version_timeout())
+
+
+def bump_list_version(*kinds):
+    """Invalidate cached list pages of the given kinds"""
+    cache.set_many({f'list:{kind}:version': _new_token() for kind in kinds}, _version_timeout())
+
+
+def bump_on_commit(event_ids=(), kinds=()):
+    """
+    Bump event and list versions once the current transaction commits.
+
+    Bumping earlier would let a concurrent reader cache the rows as they were
+    before the commit under the new token, where they would stay until they
+    expire. Outside a transaction the bump happens at once.
+    """
+    event_ids, kinds = list(event_ids), list(kinds)
+
+    def bump():
+        if event_ids:
+            bump_event_version(*event_ids)
+        if kinds:
+            bump_list_version(*kinds)
+    transaction.on_commit(bump)
+
+
+def _versions(keys):
+    """Fetch version tokens, creating any that are missing"""
+    found = cache.get_many(keys)
+    missing = {key: _new_token() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, _version_timeout())
+        found.update(missing)
+    return found
+
+
+def event_versions(event_ids):
+    """Map event ids to their current version tokens in one cache round trip"""
+    keys = {event_id: f'event:{event_id}:version' for event_id in event_ids}
+    tokens = _versions(list(keys.values()))
+    return {event_id: tokens[key] for event_id, key in keys.items()}
+
+
+def list_versions(kinds):
+    """Return the current version tokens of the given list kinds, in order"""
+    tokens = _versions([f'list:{kind}:version' for kind in kinds])
+    return [tokens[f'list:{kind}:version'] for kind in kinds]
+
+
+def cached_event_page(key_parts, popular, build_page):
+    """
+    Return (KeysetPage of event ids, {id: Event}) for a listing page.
+
+    build_page() runs the keyset query on a miss; its Event instances are
+    returned so cold renders need no second query.
+    """
+    kinds = [EVENTS_LIST, POPULARITY_LIST] if popular else [EVENTS_LIST]
+    key = 'page:' + ':'.join(str(part) for part in key_parts) + ':' + ':'.join(list_versions(kinds))
+
+    cached = cache.get(key)
+    if cached is not None:
+        _record('list', 1, 0)
+        ids, next_cursor = cached
+        return KeysetPage(ids, next_cursor), {}
+
+    _record('list', 0, 1)
+    page = build_page()
+    ids = [event.id for event in page.object_list]
+    cache.set(key, (ids, page.next_cursor), _timeout())
+    return KeysetPage(ids, page.next_cursor), {event.id: event for event in page.object_list}
+
+
+class EventUrls:
+    """
+    Builds the EVENT_URL_NAMES links of any event from one reverse() per name.
+
+    Each name is reversed once with a placeholder id, and the id of each
+    event is spliced in, rather than matching the URL patterns again for
+    every row of a listing.
+    """
+
+    def __init__(self):
+        self._parts = {
+            key: reverse(name, args=[_URL_PLACEHOLDER]).split(str(_URL_PLACEHOLDER))
+            for key, name in EVENT_URL_NAMES.items()
+        }
+
+    def __call__(self, event_id):
+        event_id = str(event_id)
+        return {key: event_id.join(parts) for key, parts in self._parts.items()}
+
+
+def render_events(template_name, events):
+    """Render a fragment template for each event, returning HTML by event id"""
+    template = get_template(template_name)
+    urls = EventUrls()
+    return {
+        event.id: template.render({
+            'event': event,
+            'urls': urls(event.id),
+            'organizer_name': event.organizer.get_full_name() or event.organizer.username,
+        })
+        for event in events
+    }
+
+
+def render_event_fragments(template_name, event_ids, loaded=None):
+    """
+    Render one template per event, reusing cached HTML where the version matches.
+
+    Events missing from both the fragment cache and `loaded` are fetched in a
+    single query.
+    """
+    loaded = loaded or {}
+    versions = event_versions(event_ids)
+    keys = {
+        event_id: f'fragment:{template_name}:{event_id}:{versions[event_id]}'
+        for event_id in event_ids
+    }
+    cached = cache.get_many(list(keys.values()))
+    missing = [event_id for event_id in event_ids if keys[event_id] not in cached]
+    _record('fragment', len(event_ids) - len(missing), len(missing))
+
+    need_query = [event_id for event_id in missing if event_id not in loaded]
+    if need_query:
+        loaded = {**loaded, **Event.objects.with_listing_data().in_bulk(need_query)}
+
+    events = [loaded[event_id] for event_id in missing if event_id in loaded]
+    rendered = {keys[event_id]: html for event_id, html in render_events(template_name, events).items()}
+    if rendered:
+        cache.set_many(rendered, _timeout())
+        cached.update(rendered)
+
+    # Events deleted since the page was cached are skipped
+    return [
+        Fragment(event_id, cached[keys[event_id]])
+        for event_id in event_ids if keys[event_id] in cached
+    ]
+
+
+def get_event(event_id):
+    """Return the Event with its organizer from cache, or None if it does not exist"""
+    version = event_versions([event_id])[event_id]
+    key = f'event:{event_id}:{version}:object'
+    event = cache.get(key)
+    if event is not None:
+        _record('event', 1, 0)
+        return event
+    _record('event', 0, 1)
+    event = Event.objects.with_listing_data().filter(pk=event_id).first()
+    if event is not None:
+        cache.set(key, event, _timeout())
+    return event
+
+
+def is_anonymous_request(request):
+    """
+    Whether a GET or HEAD request is served the anonymous version of a page.
+
+    Decided from the cookies alone, without loading the session: a request
+    with a session cookie may be logged in, and one with a messages cookie
+    has flash messages to show.
+    """
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def _page_key(request, tokens):
+    url = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return f'anonpage:{url}:' + ':'.join(str(token) for token in tokens)
+
+
+def get_page(request, tokens):
+    """Return (key, response) for an anonymous page under these version tokens; the response is None on a miss"""
+    key = _page_key(request, tokens)
+    entry = cache.get(key)
+    if entry is None:
+        _record('page', 0, 1)
+        return key, None
+    _record('page', 1, 0)
+    content, content_type, etag, last_modified = entry
+    response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return key, response
+
+
+def set_page(request, key, response):
+    """
+    Store a freshly rendered anonymous page and give it its validators.
+
+    Pages that set a cookie, such as a CSRF token, belong to one visitor and
+    are not stored.
+    """
+    if (
+        response.status_code != 200 or response.streaming or response.cookies
+        or request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or request.session.modified
+    ):
+        return
+    etag = '"' + hashlib.md5(response.content).hexdigest() + '"'
+    last_modified = int(time.time())
+    cache.set(key, (response.content, response['Content-Type'], etag, last_modified), _timeout())
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+
+
+def finish_page(request, response):
+    """Answer 304 if the visitor's copy is current, and make caches revalidate the page"""
+    if response.has_header('ETag'):
+        not_modified = get_conditional_response(
+            request, etag=response['ETag'], last_modified=parse_http_date_safe(response['Last-Modified'])
+        )
+        if not_modified is not None:
+            for header in ('ETag', 'Last-Modified'):
+                not_modified[header] = response[header]
+            response = not_modified
+        response['Cache-Control'] = 'public, no-cache'
+    # Shared caches must not hand this copy to visitors who are logged in
+    patch_vary_headers(response, ['Cookie'])
+    return response
@@ -0,0 +1,26 @@
+from django.utils.functional import SimpleLazyObject
+
+from .models import Registration
+
+
+def registered_event_ids(request):
+    """
+    The ids of the events the requesting student is registered for.
+
+    Loaded with one query the first time it is asked for and kept on the
+    request, so views and templates share it. Anonymous visitors and staff,
+    who cannot register, get an empty set without a query.
+    """
+    if not hasattr(request, '_registered_event_ids'):
+        user = request.user
+        if user.is_authenticated and not (user.is_staff or user.is_superuser):
+            ids = frozenset(Registration.objects.filter(student=user).order_by().values_list('event_id', flat=True))
+        else:
+            ids = frozenset()
+        request._registered_event_ids = ids
+    return request._registered_event_ids
+
+
+def registrations(request):
+    """Template context: registered_event_ids, queried only when a template reads it"""
+    return {'registered_event_ids': SimpleLazyObject(lambda: registered_event_ids(request))}
@@ -0,0 +1,49 @@
+"""
+SQLite backend with connection-time PRAGMAs and a configurable transaction mode.
+
+Adds two keys to DATABASES['default']['OPTIONS'], named as in Django 5.1
+which supports both natively:
+
+init_command
+    SQL run on every new connection, e.g. 'PRAGMA journal_mode=WAL; ...'.
+transaction_mode
+    'DEFERRED' (SQLite's default), 'IMMEDIATE' or 'EXCLUSIVE'. IMMEDIATE takes
+    the write lock when atomic() starts, so a transaction that reads and then
+    writes waits on busy_timeout instead of failing with "database is locked"
+    when another writer got there first.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    init_command = None
+    transaction_mode = None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.init_command = kwargs.pop('init_command', None)
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'settings.DATABASES is improperly configured. transaction_mode must be '
+                f'one of {", ".join(TRANSACTION_MODES)}, not {transaction_mode!r}.'
+            )
+        self.transaction_mode = transaction_mode.upper() if transaction_mode else None
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if self.init_command:
+            for statement in self.init_command.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,65 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+
+from . import caching
+
+
+async def aget_user(request):
+    """Resolve the lazy request.user in a worker thread, since it may query the session"""
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def async_login_required(view):
+    """login_required for async views; Django 4.2's decorator only wraps sync views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def cache_anonymous_page(versions):
+    """
+    Serve anonymous visitors a shared cached copy of a sync or async view's page.
+
+    `versions(request, *args, **kwargs)` returns the caching version tokens
+    the page depends on, so any change that would alter the page selects a
+    new cache entry. Cached pages carry an ETag and Last-Modified, and a
+    visitor whose copy is current gets a 304. Requests that are or may be
+    logged in (see caching.is_anonymous_request) always run the view, as
+    does every request when ANONYMOUS_PAGE_CACHE is off.
+    """
+    def applies(request):
+        return getattr(settings, 'ANONYMOUS_PAGE_CACHE', True) and caching.is_anonymous_request(request)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if not applies(request):
+                    return await view(request, *args, **kwargs)
+                key, response = await sync_to_async(
+                    lambda: caching.get_page(request, versions(request, *args, **kwargs))
+                )()
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    await sync_to_async(caching.set_page)(request, key, response)
+                return caching.finish_page(request, response)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if not applies(request):
+                    return view(request, *args, **kwargs)
+                key, response = caching.get_page(request, versions(request, *args, **kwargs))
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                    caching.set_page(request, key, response)
+                return caching.finish_page(request, response)
+        return wrapper
+    return decorator
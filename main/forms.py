@@ -1,6 +1,8 @@
+from datetime import datetime, time, timedelta
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import Event
 
 
@@ -33,7 +35,55 @@ class EventForm(forms.ModelForm):
 
     class Meta:
         model = Event
-        fields = ('title', 'description', 'date', 'location')
+        fields = ('title', 'description', 'date', 'location', 'capacity')
         widgets = {
             'description': forms.Textarea(attrs={'rows': 4}),
         }
+
+
+class RegistrationImportForm(forms.Form):
+    """Form for uploading a CSV of students to register for an event"""
+    file = forms.FileField(
+        label='CSV file',
+        help_text='One username or email per line, in the first column. A header row is optional.'
+    )
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        if not upload.name.lower().endswith(('.csv', '.txt')):
+            raise forms.ValidationError('Please upload a .csv or .txt file.')
+        return upload
+
+
+class EventSearchForm(forms.Form):
+    """Form for searching events"""
+    q = forms.CharField(max_length=200, label='Search')
+    start = forms.DateField(
+        required=False, label='From',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    end = forms.DateField(
+        required=False, label='To',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    organizer = forms.ModelChoiceField(
+        queryset=User.objects.filter(is_staff=True).order_by('username'),
+        required=False, empty_label='Any organizer',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and end < start:
+            raise forms.ValidationError('The end date must not be before the start date.')
+        return cleaned_data
+
+    def date_range(self):
+        """Return the aware datetime range [start, end) covering the chosen days"""
+        start, end = self.cleaned_data.get('start'), self.cleaned_data.get('end')
+        if start:
+            start = timezone.make_aware(datetime.combine(start, time.min))
+        if end:
+            end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        return start, end
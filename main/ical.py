@@ -0,0 +1,137 @@
+"""
+iCalendar (RFC 5545) feeds of a student's registrations and an organizer's events.
+
+Calendar apps cannot log in, so each feed URL carries a signed token naming the
+user. Feeds are polled every few minutes; feed_state() reads the validators
+with one query, unchanged feeds are answered with 304 Not Modified,
+and rendered bodies are cached under their ETag so they are only regenerated
+when something in them changed.
+"""
+import hashlib
+from datetime import timedelta, timezone
+
+from django.core import signing
+from django.db.models import Count, Max
+from django.urls import reverse
+
+from . import caching
+from .models import Event, Registration
+
+STUDENT = 'student'
+ORGANIZER = 'organizer'
+# Events have no end time; calendars show them as one-hour slots
+EVENT_DURATION = timedelta(hours=1)
+# Bump to change every ETag when the feed format changes
+FEED_FORMAT_VERSION = 2
+
+
+def _signer(kind):
+    return signing.Signer(salt=f'main.ical.{kind}')
+
+
+def feed_token(user, kind):
+    return _signer(kind).sign(str(user.pk))
+
+
+def user_id_for_token(token, kind):
+    """Return the user id signed into a feed token, or None if the token is not valid"""
+    try:
+        return int(_signer(kind).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def feed_events(kind, user_id):
+    """Events shown in a feed"""
+    if kind == STUDENT:
+        return Event.objects.filter(registrations__student_id=user_id)
+    return Event.objects.filter(organizer_id=user_id)
+
+
+def feed_state(kind, user_id):
+    """
+    Return (etag, last_modified) for a feed from one query.
+
+    For students the registration count catches removals, the newest
+    updated_at catches edits and the newest registration catches sign-ups to
+    events that were edited earlier. Organizer feeds show registration counts,
+    which change without touching updated_at, so their ETag is built from the
+    events' cache version tokens, which every registration change bumps.
+    """
+    if kind == STUDENT:
+        state = Registration.objects.filter(
+            student_id=user_id, event__deleted_at__isnull=True
+        ).aggregate(count=Count('id'), updated=Max('event__updated_at'), registered=Max('created_at'))
+        last_modified = max((value for value in (state['updated'], state['registered']) if value), default=None)
+        parts = [state['count'], state['updated'], state['registered']]
+    else:
+        events = list(feed_events(kind, user_id).order_by('id').values_list('id', 'updated_at'))
+        versions = caching.event_versions([event_id for event_id, _ in events])
+        last_modified = max((updated for _, updated in events), default=None)
+        parts = [f'{event_id}.{versions[event_id]}' for event_id, _ in events]
+
+    key = f'{FEED_FORMAT_VERSION}:{kind}:{user_id}:' + ':'.join(str(part) for part in parts)
+    etag = '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+    return etag, last_modified
+
+
+def _escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces joined by CRLF and a space"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        cut = 75 if not parts else 74
+        # Never split inside a UTF-8 sequence
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts)
+
+
+def _timestamp(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_feed(kind, user_id, build_absolute_uri):
+    """Render the feed as iCalendar text from a single query"""
+    events = feed_events(kind, user_id).order_by('date', 'id').only(
+        'id', 'title', 'description', 'location', 'date', 'updated_at', 'registration_count', 'capacity'
+    )
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Student Engagement Platform//Events//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:' + ('My Events' if kind == STUDENT else 'Organized Events'),
+    ]
+    for event in events:
+        description = event.description
+        if kind == ORGANIZER:
+            seats = f' of {event.capacity}' if event.capacity else ''
+            description = f'{event.registration_count}{seats} registered\n\n{description}'
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:event-{event.id}@student-engagement',
+            f'DTSTAMP:{_timestamp(event.updated_at)}',
+            f'LAST-MODIFIED:{_timestamp(event.updated_at)}',
+            f'DTSTART:{_timestamp(event.date)}',
+            f'DTEND:{_timestamp(event.date + EVENT_DURATION)}',
+            f'SUMMARY:{_escape(event.title)}',
+            f'LOCATION:{_escape(event.location)}',
+            f'DESCRIPTION:{_escape(description)}',
+            f'URL:{build_absolute_uri(reverse("event_detail", args=[event.id]))}',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
@@ -0,0 +1,168 @@
+"""
+A small database-backed job queue.
+
+Request handlers enqueue jobs; the run_worker management command runs them.
+A job row is written in the caller's transaction, so work is only queued for
+changes that commit. Workers claim jobs with a conditional UPDATE, so several
+can poll the same table. Failed jobs are retried with exponential backoff
+until a task's max_attempts is reached and are then kept as 'failed' for
+inspection; finished jobs are deleted.
+
+Tasks declared with batch=True receive the payloads of every due job of that
+task in one call, which lets e.g. organizer digests send one email per
+organizer rather than one per registration.
+
+With JOBS_EAGER (on under `manage.py test`) jobs run immediately in the
+caller instead and their errors propagate. The INSERT that would have queued
+each job still counts against the caller's query budget.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import budgets
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+class Task:
+    """A registered job function"""
+
+    def __init__(self, func, name, max_attempts, batch):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.batch = batch
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, **payload):
+        """Queue one run of the task with keyword arguments `payload`"""
+        return enqueue(self.name, payload)
+
+    def delay_many(self, payloads):
+        """Queue one run of the task per payload with a single INSERT"""
+        return enqueue_many(self.name, payloads)
+
+    def run(self, payloads):
+        if self.batch:
+            self.func(payloads)
+        else:
+            for payload in payloads:
+                self.func(**payload)
+
+
+def task(name=None, max_attempts=5, batch=False):
+    """Register a function as a job task; call .delay(**payload) to queue it"""
+    def register(func):
+        registered = Task(func, name or f'{func.__module__}.{func.__name__}', max_attempts, batch)
+        TASKS[registered.name] = registered
+        return registered
+    return register
+
+
+def enqueue(name, payload):
+    if name not in TASKS:
+        raise KeyError(f'Unknown task {name!r}')
+    if getattr(settings, 'JOBS_EAGER', False):
+        # Inline jobs stand in for the worker; their queries are not the
+        # caller's, but the INSERT that would have queued the job is
+        budgets.charge(f'INSERT INTO "main_job" -- {name}, run eagerly')
+        with budgets.exempt():
+            TASKS[name].run([payload])
+        return None
+    return Job.objects.create(name=name, payload=payload)
+
+
+def enqueue_many(name, payloads):
+    """Queue one job per payload in a single INSERT"""
+    if name not in TASKS:
+        raise KeyError(f'Unknown task {name!r}')
+    if getattr(settings, 'JOBS_EAGER', False):
+        if payloads:
+            budgets.charge(f'INSERT INTO "main_job" -- {len(payloads)} x {name}, run eagerly')
+        with budgets.exempt():
+            TASKS[name].run(payloads)
+        return []
+    return Job.objects.bulk_create([Job(name=name, payload=payload) for payload in payloads])
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts`, doubling each time, with jitter"""
+    base = getattr(settings, 'JOBS_RETRY_BACKOFF', 10)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, 'JOBS_MAX_BACKOFF', 3600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _claim(limit):
+    """Mark up to `limit` due pending jobs as running and return those this worker won"""
+    now = timezone.now()
+    due = list(
+        Job.objects.filter(status=Job.PENDING, run_after__lte=now)
+        .order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+    )
+    if not due:
+        return []
+    with transaction.atomic():
+        Job.objects.filter(id__in=due, status=Job.PENDING).update(status=Job.RUNNING, locked_at=now)
+        # Another worker may have claimed some of them between the two queries
+        return list(Job.objects.filter(id__in=due, status=Job.RUNNING, locked_at=now))
+
+
+def _finish(jobs, error):
+    if error is None:
+        Job.objects.filter(id__in=[job.id for job in jobs]).delete()
+        return
+    now = timezone.now()
+    for job in jobs:
+        job.attempts += 1
+        job.last_error = error
+        job.locked_at = None
+        task = TASKS.get(job.name)
+        if task is None or job.attempts >= task.max_attempts:
+            job.status = Job.FAILED
+            logger.error('Job %s failed permanently: %s', job, error.splitlines()[-1])
+        else:
+            job.status = Job.PENDING
+            job.run_after = now + timedelta(seconds=backoff(job.attempts))
+    Job.objects.bulk_update(jobs, ['attempts', 'last_error', 'locked_at', 'status', 'run_after'])
+
+
+def run_pending(limit=100):
+    """Run up to `limit` due jobs, batching jobs of batch tasks; returns how many ran"""
+    jobs = _claim(limit)
+    groups = {}
+    for job in jobs:
+        task = TASKS.get(job.name)
+        if task is not None and task.batch:
+            groups.setdefault(job.name, []).append(job)
+        else:
+            groups[job.id] = [job]
+
+    for group in groups.values():
+        task = TASKS.get(group[0].name)
+        error = None
+        try:
+            if task is None:
+                raise KeyError(f'Unknown task {group[0].name!r}')
+            task.run([job.payload for job in group])
+        except Exception:
+            error = traceback.format_exc()
+        _finish(group, error)
+    return len(jobs)
+
+
+def requeue_stale(older_than):
+    """Return jobs left running by a crashed worker to the queue; returns how many"""
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=timezone.now() - older_than
+    ).update(status=Job.PENDING, locked_at=None)
@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from main.models import Event, Registration
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the JSON API with the HTML pages showing the same data: median '
+        'latency, response size and queries per request, cold and with a matching '
+        'ETag. Uses the data already in the database; run populate_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Timed requests per URL')
+
+    def build_pairs(self):
+        """(label, HTML url, API url, user) tuples"""
+        event_id = Event.objects.order_by('-registration_count').values_list('id', flat=True).first()
+        registration = Registration.objects.filter(event__deleted_at__isnull=True).select_related('student').first()
+        if event_id is None or registration is None:
+            raise CommandError('No events or registrations found. Run populate_data first.')
+        # Compare the slice that has data; a freshly populated database may have no upcoming events
+        when = 'upcoming' if Event.objects.upcoming().exists() else 'past'
+        home = f'{reverse("home")}?when={when}'
+        events = f'{reverse("api_event_list")}?when={when}&size=12'
+        return [
+            ('event list', home, events, None),
+            ('event list (3 fields)', home, events + '&fields=id,title,date', None),
+            ('event detail', reverse('event_detail', args=[event_id]), reverse('api_event_detail', args=[event_id]), None),
+            ('my registrations', reverse('my_events'), reverse('api_my_registrations'), registration.student),
+        ]
+
+    def measure(self, client, url, repeat, **headers):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url, **headers)
+            timings.append((time.perf_counter() - start) * 1000)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, **headers)
+        return statistics.median(timings), len(response.content), len(queries), response
+
+    def row(self, name, median, size, queries):
+        self.stdout.write(f'  {name:<12}{median:>9.2f} ms {size:>10} B {queries:>6} queries')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        for label, html_url, api_url, user in self.build_pairs():
+            client = Client(HTTP_HOST='localhost')
+            if user is not None:
+                client.force_login(user)
+            cache.clear()
+            client.get(html_url)
+            client.get(api_url)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+            self.row('HTML', *self.measure(client, html_url, repeat)[:3])
+            median, size, queries, response = self.measure(client, api_url, repeat)
+            self.row('JSON', median, size, queries)
+            self.row('JSON 304', *self.measure(
+                client, api_url, repeat, HTTP_IF_NONE_MATCH=response['ETag']
+            )[:3])
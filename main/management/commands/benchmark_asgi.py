@@ -0,0 +1,144 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+from django.urls import reverse
+from main.metrics import percentile
+from main.models import Event, Registration
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the read-heavy pages through the WSGI and ASGI handlers in process '
+        'at a fixed concurrency and compare throughput and tail latency. '
+        'Uses the data already in the database; run populate_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per handler')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once')
+        parser.add_argument('--handler', choices=['both', 'wsgi', 'asgi'], default='both')
+
+    def build_targets(self):
+        """(path, session cookie) pairs covering the async read views"""
+        event_ids = list(Event.objects.order_by('-registration_count').values_list('id', flat=True)[:20])
+        registration = Registration.objects.select_related('student', 'event').first()
+        if not event_ids or registration is None:
+            raise CommandError('No events or registrations found. Run populate_data first.')
+
+        student_cookie = self.session_cookie(registration.student)
+        organizer_cookie = self.session_cookie(registration.event.organizer)
+        targets = [(reverse('home'), ''), (reverse('home') + '?sort=popular', '')]
+        targets += [(reverse('event_detail', args=[event_id]), '') for event_id in event_ids[:5]]
+        targets += [(reverse('event_detail', args=[event_ids[0]]), student_cookie)]
+        targets += [(reverse('my_events'), student_cookie)]
+        targets += [(reverse('event_registrations', args=[registration.event_id]), organizer_cookie)]
+        return targets
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def wsgi_request(self, application, path, cookie):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+            'HTTP_COOKIE': cookie, 'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.errors': self.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False, 'wsgi.version': (1, 0),
+        }
+        status = []
+        start = time.perf_counter()
+        body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        return (time.perf_counter() - start) * 1000, status[0].startswith('200')
+
+    async def asgi_request(self, application, path, cookie):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        received = asyncio.Event()
+        status = []
+
+        async def receive():
+            if not received.is_set():
+                received.set()
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Keep the connection open until the handler is done with it
+            await asyncio.Future()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        start = time.perf_counter()
+        await application(scope, receive, send)
+        return (time.perf_counter() - start) * 1000, status[0] == 200
+
+    def run_wsgi(self, targets, total, concurrency):
+        application = get_wsgi_application()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            results = list(pool.map(
+                lambda i: self.wsgi_request(application, *targets[i % len(targets)]), range(total)
+            ))
+        return results, time.perf_counter() - start
+
+    def run_asgi(self, targets, total, concurrency):
+        application = get_asgi_application()
+
+        async def drive():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(i):
+                async with semaphore:
+                    return await self.asgi_request(application, *targets[i % len(targets)])
+
+            return await asyncio.gather(*(one(i) for i in range(total)))
+
+        start = time.perf_counter()
+        results = asyncio.run(drive())
+        return results, time.perf_counter() - start
+
+    def report(self, name, results, elapsed):
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        self.stdout.write(
+            f'{name:<5} {len(results) / elapsed:>9.1f} req/s   '
+            f'p50 {percentile(latencies, 0.50):>8.2f} ms   '
+            f'p95 {percentile(latencies, 0.95):>8.2f} ms   '
+            f'p99 {percentile(latencies, 0.99):>8.2f} ms   '
+            f'errors {errors}'
+        )
+
+    def handle(self, *args, **options):
+        targets = self.build_targets()
+        total, concurrency = options['requests'], options['concurrency']
+        handlers = ['wsgi', 'asgi'] if options['handler'] == 'both' else [options['handler']]
+
+        self.stdout.write(
+            f'{total} requests per handler over {len(targets)} URLs at concurrency {concurrency}\n'
+        )
+        for name in handlers:
+            run = self.run_wsgi if name == 'wsgi' else self.run_asgi
+            # Warm the caches and connections so both handlers start equal
+            run(targets, len(targets), 1)
+            results, elapsed = run(targets, total, concurrency)
+            self.report(name, results, elapsed)
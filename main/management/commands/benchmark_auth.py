@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+# (label, session engine, AUTH_USER_CACHE_TIMEOUT)
+PROFILES = [
+    ('db sessions', 'django.contrib.sessions.backends.db', 0),
+    ('cached_db + cached user', 'django.contrib.sessions.backends.cached_db', 300),
+    ('signed cookies + cached user', 'django.contrib.sessions.backends.signed_cookies', 300),
+]
+PASSWORD = 'bench-Passw0rd!'
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark user at the end"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure login latency and the latency and queries of authenticated pages '
+        'under each session engine profile. All changes are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=5, help='Timed logins per profile')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed requests per page')
+
+    def timed(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def queries(self, func):
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            func()
+        return len(captured)
+
+    def run_profile(self, user, logins, repeat):
+        host = 'testserver' if 'testserver' in settings.ALLOWED_HOSTS else 'localhost'
+        credentials = {'username': user.username, 'password': PASSWORD}
+        login_ms = self.timed(lambda: Client(HTTP_HOST=host).post(reverse('login'), credentials), logins)
+
+        client = Client(HTTP_HOST=host)
+        client.post(reverse('login'), credentials)
+        self.stdout.write(f'  {"login":<26}{login_ms:>9.1f} ms')
+        for name in ('my_events', 'api_my_registrations', 'home'):
+            url = reverse(name)
+            client.get(url)
+            median = self.timed(lambda: client.get(url), repeat)
+            count = self.queries(lambda: client.get(url))
+            self.stdout.write(f'  {name:<26}{median:>9.2f} ms {count:>4} queries')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(username='bench_auth', password=PASSWORD)
+                start = time.perf_counter()
+                authenticate(username=user.username, password=PASSWORD)
+                self.stdout.write(
+                    f'One authenticate() (password hash) costs {(time.perf_counter() - start) * 1000:.1f} ms; '
+                    'login_view used to pay it twice.'
+                )
+                for label, engine, timeout in PROFILES:
+                    cache.clear()
+                    with override_settings(SESSION_ENGINE=engine, AUTH_USER_CACHE_TIMEOUT=timeout):
+                        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+                        self.run_profile(user, options['logins'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+        cache.clear()
@@ -0,0 +1,80 @@
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from main import services
+from main.models import Event, Registration
+from main.seeding import ensure_users
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded dataset at the end of the benchmark"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare Model.delete() against the chunked purge for an event with many '
+        'registrations and for an organizer with many events. All changes are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrations', type=int, default=50000, help='Registrations per event')
+        parser.add_argument('--organizer-events', type=int, default=20, help='Events of the deleted organizer')
+        parser.add_argument('--memory', action='store_true', help='Also report peak Python memory (slower)')
+
+    def seed_event(self, organizer, student_ids, title):
+        event = Event.objects.create(
+            title=title, description='Benchmark', location='Hall', date=timezone.now(), organizer=organizer
+        )
+        Registration.objects.bulk_create(
+            (Registration(event=event, student_id=student_id) for student_id in student_ids), batch_size=5000
+        )
+        return event
+
+    def seed_organizer(self, name, student_ids, events):
+        organizer = User.objects.create_user(username=name, is_staff=True)
+        per_event = len(student_ids) // events
+        for index in range(events):
+            self.seed_event(organizer, student_ids[index * per_event:(index + 1) * per_event], f'{name} {index}')
+        return organizer
+
+    def measure(self, label, func, memory):
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        peak = ''
+        if memory:
+            peak = f'   peak {tracemalloc.get_traced_memory()[1] / 1024 / 1024:>8.1f} MiB'
+            tracemalloc.stop()
+        self.stdout.write(f'{label:<34}{elapsed:>8.2f} s{peak}')
+
+    def handle(self, *args, **options):
+        count = options['registrations']
+        try:
+            with transaction.atomic():
+                student_ids, _ = ensure_users(
+                    [f'bench_student{i}' for i in range(count)], lambda index: {}, '!', 5000
+                )
+                organizer = User.objects.create_user(username='bench_organizer', is_staff=True)
+                collected = self.seed_event(organizer, student_ids, 'Collector')
+                purged = self.seed_event(organizer, student_ids, 'Purge')
+                self.stdout.write(f'Event with {count} registrations:')
+                self.measure('  Model.delete()', collected.delete, options['memory'])
+                self.measure('  services.purge_event()', lambda: services.purge_event(purged.pk), options['memory'])
+
+                events = options['organizer_events']
+                first = self.seed_organizer('bench_organizer_a', student_ids, events)
+                second = self.seed_organizer('bench_organizer_b', student_ids, events)
+                self.stdout.write(f'\nOrganizer with {events} events and {count} registrations:')
+                self.measure('  User.delete()', first.delete, options['memory'])
+                self.measure(
+                    '  services.delete_organizer()', lambda: services.delete_organizer(second), options['memory']
+                )
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('\n✓ Benchmark complete. Seeded data rolled back.'))
@@ -0,0 +1,98 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from main.models import Event, Registration, WaitlistEntry
+from main.seeding import seed_dataset
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded dataset at the end of the benchmark"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large dataset, then print EXPLAIN plans and timings for the hot '
+        'queries with and without the query indexes. All changes are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--events', type=int, default=20000)
+        parser.add_argument('--registrations', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+
+    def hot_queries(self):
+        """The query shapes issued by the views, keyed by view name"""
+        student_id = Registration.objects.order_by('student_id').values_list('student_id', flat=True).first()
+        event = Event.objects.order_by('-registration_count').first()
+        return {
+            'home (upcoming)': Event.objects.upcoming().select_related('organizer').order_by('date', 'id')[:13],
+            'home (past)': Event.objects.past().select_related('organizer').order_by('-date', '-id')[:13],
+            'home (popular)': Event.objects.upcoming().order_by('-registration_count', '-id')[:13],
+            'dashboard': Event.objects.filter(organizer_id=event.organizer_id).upcoming().order_by('date', 'id')[:26],
+            'my_events': Registration.objects.filter(student_id=student_id).select_related('event').order_by('-created_at'),
+            'event_registrations': Registration.objects.filter(event=event).select_related('student').order_by('-created_at'),
+            'waitlist head': WaitlistEntry.objects.filter(event=event).order_by('created_at', 'id')[:1],
+        }
+
+    def measure(self, label, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {label} ==='))
+        results = {}
+        for name, queryset in self.hot_queries().items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset._chain())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(f'\n{name}: median {results[name]:.3f} ms')
+            self.stdout.write(self.explain(queryset, label))
+        return results
+
+    def explain(self, queryset, label):
+        if connection.vendor != 'sqlite':
+            return queryset.explain()
+        # sqlite3 caches prepared EXPLAIN statements by SQL text and does not
+        # re-plan them after DROP INDEX, so make the text unique per phase
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql} /* {label} */', params)
+            return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+
+    def drop_indexes(self):
+        """Drop the composite indexes declared in the models' Meta.indexes"""
+        schema_editor = connection.SchemaEditorClass(connection)
+        with connection.cursor() as cursor:
+            for model in (Event, Registration, WaitlistEntry):
+                for index in model._meta.indexes:
+                    cursor.execute(str(index.remove_sql(model, schema_editor)))
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                counts = seed_dataset(
+                    options['students'], options['events'], options['registrations'], prefix='bench_'
+                )
+                self.stdout.write(
+                    f'Seeded {counts["events"]} events and {counts["registrations"]} registrations '
+                    f'in {time.perf_counter() - start:.1f}s'
+                )
+                if connection.vendor == 'sqlite':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+
+                after = self.measure('With indexes', options['repeat'])
+                self.drop_indexes()
+                before = self.measure('Without indexes', options['repeat'])
+
+                self.stdout.write(self.style.MIGRATE_HEADING('\n=== Summary (median ms) ==='))
+                self.stdout.write(f'{"query":<22}{"before":>10}{"after":>10}{"speedup":>10}')
+                for name in after:
+                    speedup = before[name] / after[name] if after[name] else float('inf')
+                    self.stdout.write(f'{name:<22}{before[name]:>10.3f}{after[name]:>10.3f}{speedup:>9.1f}x')
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('\n✓ Benchmark complete. Seeded data rolled back.'))
@@ -0,0 +1,55 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.template import Engine
+from django.template.loaders.cached import Loader as CachedLoader
+from django.utils import timezone
+from main import caching
+from main.models import Event
+
+TEMPLATES = ['main/includes/event_card.html', 'main/includes/event_row.html']
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the event card and row fragments for a number of in-memory '
+        'events and report the render time. Nothing is written to the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000, help='Events rendered per run')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per template')
+
+    def events(self, count):
+        organizer = User(id=1, username='organizer', first_name='Ada', last_name='Lovelace')
+        now = timezone.now()
+        return [
+            Event(
+                id=index + 1, title=f'Event {index}', description='Lorem ipsum dolor sit amet ' * 8,
+                date=now, location=f'Hall {index % 10}', organizer=organizer,
+                capacity=50, registration_count=index % 50,
+            )
+            for index in range(count)
+        ]
+
+    def handle(self, *args, **options):
+        loaders = Engine.get_default().template_loaders
+        cached = any(isinstance(loader, CachedLoader) for loader in loaders)
+        self.stdout.write(f'Cached template loader: {"on" if cached else "off"}')
+
+        events = self.events(options['events'])
+        for template_name in TEMPLATES:
+            # First run compiles the template and warms the loader cache
+            caching.render_events(template_name, events)
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                caching.render_events(template_name, events)
+                timings.append((time.perf_counter() - start) * 1000)
+            median = statistics.median(timings)
+            self.stdout.write(
+                f'{template_name:<32} {len(events)} events  median {median:>8.1f} ms  '
+                f'min {min(timings):>8.1f} ms  {median * 1000 / len(events):>6.1f} µs/event'
+            )
@@ -0,0 +1,132 @@
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from main.metrics import percentile
+from main.models import Event, Registration
+
+# The stock backend with SQLite defaults, closing the connection after every
+# request, against the tuned profile from settings
+PROFILES = {
+    'baseline': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'OPTIONS': {},
+        'CONN_MAX_AGE': 0,
+    },
+    'tuned': {
+        'ENGINE': 'main.db_backends.sqlite3',
+        'OPTIONS': settings.DATABASE_PROFILES['sqlite']['OPTIONS'],
+        'CONN_MAX_AGE': 60,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent registration writers against a scratch SQLite database, '
+        'once with SQLite defaults and once with the tuned database profile, '
+        'and compare throughput, latency and "database is locked" errors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=16, help='Concurrent writer threads')
+        parser.add_argument('--operations', type=int, default=200, help='Registrations per writer')
+        parser.add_argument('--events', type=int, default=50)
+        parser.add_argument('--students', type=int, default=2000)
+
+    def prepare(self, alias, directory, profile, options):
+        connections.settings[alias] = {
+            **connections.settings['default'],
+            **profile,
+            'NAME': str(Path(directory) / f'{alias}.sqlite3'),
+        }
+        call_command('migrate', database=alias, verbosity=0)
+        organizer = User.objects.db_manager(alias).create_user(username='bench_organizer', is_staff=True)
+        User.objects.using(alias).bulk_create(
+            User(username=f'bench_student{i}') for i in range(options['students'])
+        )
+        Event.objects.using(alias).bulk_create(
+            Event(
+                title=f'Bench Event {i}', description='Benchmark', location='Hall',
+                date=timezone.now(), organizer=organizer,
+            )
+            for i in range(options['events'])
+        )
+        return (
+            list(User.objects.using(alias).filter(is_staff=False).values_list('id', flat=True)),
+            list(Event.objects.using(alias).values_list('id', flat=True)),
+        )
+
+    def register(self, alias, student_id, event_id):
+        """The write path of services.register_student: read, insert, update"""
+        with transaction.atomic(using=alias):
+            registrations = Registration.objects.using(alias)
+            if registrations.filter(student_id=student_id, event_id=event_id).exists():
+                return
+            registrations.create(student_id=student_id, event_id=event_id)
+            Event.objects.using(alias).filter(pk=event_id).update(
+                registration_count=F('registration_count') + 1
+            )
+
+    def writer(self, alias, student_ids, event_ids, operations, seed, results):
+        rng = random.Random(seed)
+        connection = connections[alias]
+        try:
+            for _ in range(operations):
+                start = time.perf_counter()
+                try:
+                    self.register(alias, rng.choice(student_ids), rng.choice(event_ids))
+                    ok = True
+                except OperationalError:
+                    ok = False
+                results.append(((time.perf_counter() - start) * 1000, ok))
+                # What request_finished does at the end of every request
+                connection.close_if_unusable_or_obsolete()
+        finally:
+            connection.close()
+
+    def run(self, alias, student_ids, event_ids, options):
+        # list.append is atomic, so the writers share one results list
+        results = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['writers']) as pool:
+            futures = [
+                pool.submit(self.writer, alias, student_ids, event_ids, options['operations'], seed, results)
+                for seed in range(options['writers'])
+            ]
+        for future in futures:
+            future.result()
+        return results, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{options["writers"]} writers x {options["operations"]} registrations '
+            f'over {options["events"]} events\n'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for alias, profile in PROFILES.items():
+                student_ids, event_ids = self.prepare(alias, directory, profile, options)
+                connections[alias].close()
+                results, elapsed = self.run(alias, student_ids, event_ids, options)
+
+                latencies = sorted(latency for latency, _ in results)
+                errors = sum(1 for _, ok in results if not ok)
+                committed = Registration.objects.using(alias).count()
+                counted = sum(Event.objects.using(alias).values_list('registration_count', flat=True))
+                connections[alias].close()
+                self.stdout.write(
+                    f'{alias:<9} {(len(results) - errors) / elapsed:>8.1f} commits/s   '
+                    f'p50 {percentile(latencies, 0.50):>8.2f} ms   '
+                    f'p99 {percentile(latencies, 0.99):>8.2f} ms   '
+                    f'locked errors {errors:>5}   '
+                    f'registrations {committed} (counter {counted})'
+                )
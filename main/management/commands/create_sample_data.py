@@ -1,6 +1,10 @@
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import transaction
+from main import caching
 from main.models import Event, Registration
+from main.seeding import ProgressReporter, seed_dataset
 from django.utils import timezone
 from datetime import timedelta
 
@@ -8,137 +12,162 @@ from datetime import timedelta
 class Command(BaseCommand):
     help = 'Creates sample data for testing the application'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=0,
+            help='Extra generated student users on top of the sample accounts (default: 0)'
+        )
+        parser.add_argument('--events', type=int, default=0, help='Extra generated events (default: 0)')
+        parser.add_argument('--registrations', type=int, default=0, help='Extra generated registrations (default: 0)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert (default: 5000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated data (default: 0)')
+
+    def handle(self, *args, **options):
         self.stdout.write('Creating sample data...')
 
         # Create users
         self.stdout.write('Creating users...')
-        
-        # Admin user
-        if not User.objects.filter(username='admin').exists():
-            admin = User.objects.create_superuser(
-                username='admin',
-                email='admin@example.com',
-                password='admin123',
-                first_name='Admin',
-                last_name='User'
+
+        users_data = [
+            # username, password, first name, last name, email, is_staff, is_superuser
+            ('admin', 'admin123', 'Admin', 'User', 'admin@example.com', True, True),
+            ('organizer', 'organizer123', 'John', 'Organizer', 'organizer@example.com', True, False),
+            ('student', 'student123', 'Alice', 'Student', 'alice@example.com', False, False),
+            ('student2', 'student123', 'Bob', 'Johnson', 'bob@example.com', False, False),
+            ('student3', 'student123', 'Carol', 'Williams', 'carol@example.com', False, False),
+        ]
+
+        with transaction.atomic():
+            existing = set(
+                User.objects.filter(username__in=[row[0] for row in users_data])
+                .values_list('username', flat=True)
             )
-            self.stdout.write(self.style.SUCCESS('✓ Admin user created (username: admin, password: admin123)'))
-        else:
-            admin = User.objects.get(username='admin')
-            self.stdout.write(self.style.WARNING('Admin user already exists'))
-
-        # Organizer user
-        if not User.objects.filter(username='organizer').exists():
-            organizer = User.objects.create_user(
-                username='organizer',
-                email='organizer@example.com',
-                password='organizer123',
-                first_name='John',
-                last_name='Organizer',
-                is_staff=True
+            # Hash each distinct password once; PBKDF2 is deliberately slow
+            hashes = {}
+            new_users = []
+            for username, password, first_name, last_name, email, is_staff, is_superuser in users_data:
+                if username in existing:
+                    self.stdout.write(self.style.WARNING(f'User {username} already exists'))
+                    continue
+                if password not in hashes:
+                    hashes[password] = make_password(password)
+                new_users.append(User(
+                    username=username, password=hashes[password], email=email,
+                    first_name=first_name, last_name=last_name,
+                    is_staff=is_staff, is_superuser=is_superuser,
+                ))
+                self.stdout.write(self.style.SUCCESS(f'✓ User created (username: {username}, password: {password})'))
+            User.objects.bulk_create(new_users)
+
+            users = User.objects.in_bulk([row[0] for row in users_data], field_name='username')
+            admin = users['admin']
+            organizer = users['organizer']
+            students = [users['student'], users['student2'], users['student3']]
+
+            # Create events
+            self.stdout.write('\nCreating events...')
+
+            events_data = [
+                {
+                    'title': 'Python Programming Workshop',
+                    'description': 'Learn the fundamentals of Python programming in this hands-on workshop. Perfect for beginners and intermediate programmers looking to enhance their skills.',
+                    'date': timezone.now() + timedelta(days=7),
+                    'location': 'Computer Lab A, Building 3',
+                    'organizer': organizer
+                },
+                {
+                    'title': 'Annual Tech Conference 2024',
+                    'description': 'Join us for the biggest tech conference of the year! Network with industry professionals, attend keynote speeches, and explore the latest in technology.',
+                    'date': timezone.now() + timedelta(days=14),
+                    'location': 'Main Auditorium',
+                    'organizer': organizer
+                },
+                {
+                    'title': 'Web Development Bootcamp',
+                    'description': 'Intensive 3-day bootcamp covering HTML, CSS, JavaScript, and modern web frameworks. Build real-world projects and launch your web development career.',
+                    'date': timezone.now() + timedelta(days=21),
+                    'location': 'Innovation Hub',
+                    'organizer': admin
+                },
+                {
+                    'title': 'Data Science Seminar',
+                    'description': 'Explore the world of data science, machine learning, and AI. Learn from industry experts and discover career opportunities in this exciting field.',
+                    'date': timezone.now() + timedelta(days=10),
+                    'location': 'Lecture Hall B',
+                    'organizer': organizer
+                },
+                {
+                    'title': 'Hackathon 2024',
+                    'description': '24-hour coding challenge! Form teams, solve real-world problems, and compete for amazing prizes. All skill levels welcome.',
+                    'date': timezone.now() + timedelta(days=30),
+                    'location': 'Student Center',
+                    'organizer': admin
+                },
+                {
+                    'title': 'Career Fair - Tech Companies',
+                    'description': 'Meet recruiters from top tech companies. Bring your resume, network with professionals, and explore internship and job opportunities.',
+                    'date': timezone.now() + timedelta(days=5),
+                    'location': 'Sports Complex',
+                    'organizer': organizer
+                },
+            ]
+
+            existing = set(
+                Event.objects.filter(title__in=[data['title'] for data in events_data])
+                .values_list('title', flat=True)
             )
-            self.stdout.write(self.style.SUCCESS('✓ Organizer user created (username: organizer, password: organizer123)'))
-        else:
-            organizer = User.objects.get(username='organizer')
-            self.stdout.write(self.style.WARNING('Organizer user already exists'))
-
-        # Student users
-        students = []
-        student_data = [
-            ('student', 'student123', 'Alice', 'Student', 'alice@example.com'),
-            ('student2', 'student123', 'Bob', 'Johnson', 'bob@example.com'),
-            ('student3', 'student123', 'Carol', 'Williams', 'carol@example.com'),
-        ]
+            for data in events_data:
+                if data['title'] in existing:
+                    self.stdout.write(self.style.WARNING(f'Event already exists: {data["title"]}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'✓ Event created: {data["title"]}'))
+            Event.objects.bulk_create([
+                Event(**data) for data in events_data if data['title'] not in existing
+            ])
+            events = {
+                event.title: event
+                for event in Event.objects.filter(title__in=[data['title'] for data in events_data])
+            }
+            sample_events = [events[data['title']] for data in events_data]
 
-        for username, password, first_name, last_name, email in student_data:
-            if not User.objects.filter(username=username).exists():
-                student = User.objects.create_user(
-                    username=username,
-                    email=email,
-                    password=password,
-                    first_name=first_name,
-                    last_name=last_name
-                )
-                students.append(student)
-                self.stdout.write(self.style.SUCCESS(f'✓ Student user created (username: {username}, password: {password})'))
-            else:
-                student = User.objects.get(username=username)
-                students.append(student)
-                self.stdout.write(self.style.WARNING(f'Student user {username} already exists'))
-
-        # Create events
-        self.stdout.write('\nCreating events...')
-        
-        events_data = [
-            {
-                'title': 'Python Programming Workshop',
-                'description': 'Learn the fundamentals of Python programming in this hands-on workshop. Perfect for beginners and intermediate programmers looking to enhance their skills.',
-                'date': timezone.now() + timedelta(days=7),
-                'location': 'Computer Lab A, Building 3',
-                'organizer': organizer
-            },
-            {
-                'title': 'Annual Tech Conference 2024',
-                'description': 'Join us for the biggest tech conference of the year! Network with industry professionals, attend keynote speeches, and explore the latest in technology.',
-                'date': timezone.now() + timedelta(days=14),
-                'location': 'Main Auditorium',
-                'organizer': organizer
-            },
-            {
-                'title': 'Web Development Bootcamp',
-                'description': 'Intensive 3-day bootcamp covering HTML, CSS, JavaScript, and modern web frameworks. Build real-world projects and launch your web development career.',
-                'date': timezone.now() + timedelta(days=21),
-                'location': 'Innovation Hub',
-                'organizer': admin
-            },
-            {
-                'title': 'Data Science Seminar',
-                'description': 'Explore the world of data science, machine learning, and AI. Learn from industry experts and discover career opportunities in this exciting field.',
-                'date': timezone.now() + timedelta(days=10),
-                'location': 'Lecture Hall B',
-                'organizer': organizer
-            },
-            {
-                'title': 'Hackathon 2024',
-                'description': '24-hour coding challenge! Form teams, solve real-world problems, and compete for amazing prizes. All skill levels welcome.',
-                'date': timezone.now() + timedelta(days=30),
-                'location': 'Student Center',
-                'organizer': admin
-            },
-            {
-                'title': 'Career Fair - Tech Companies',
-                'description': 'Meet recruiters from top tech companies. Bring your resume, network with professionals, and explore internship and job opportunities.',
-                'date': timezone.now() + timedelta(days=5),
-                'location': 'Sports Complex',
-                'organizer': organizer
-            },
-        ]
+            # Create registrations
+            self.stdout.write('\nCreating sample registrations...')
+
+            wanted = [
+                Registration(student=student, event=event)
+                for i, event in enumerate(sample_events[:4])  # Register students for first 4 events
+                for j, student in enumerate(students)
+                if (i + j) % 2 == 0  # Register some students to some events
+            ]
+            before = Registration.objects.filter(event__in=sample_events).count()
+            Registration.objects.bulk_create(wanted, ignore_conflicts=True)
+            registration_count = Registration.objects.filter(event__in=sample_events).count() - before
 
-        created_events = []
-        for event_data in events_data:
-            if not Event.objects.filter(title=event_data['title']).exists():
-                event = Event.objects.create(**event_data)
-                created_events.append(event)
-                self.stdout.write(self.style.SUCCESS(f'✓ Event created: {event.title}'))
-            else:
-                event = Event.objects.get(title=event_data['title'])
-                created_events.append(event)
-                self.stdout.write(self.style.WARNING(f'Event already exists: {event.title}'))
-
-        # Create registrations
-        self.stdout.write('\nCreating sample registrations...')
-        
-        registration_count = 0
-        for i, event in enumerate(created_events[:4]):  # Register students for first 4 events
-            for j, student in enumerate(students):
-                if (i + j) % 2 == 0:  # Register some students to some events
-                    if not Registration.objects.filter(student=student, event=event).exists():
-                        Registration.objects.create(student=student, event=event)
-                        registration_count += 1
+            Event.objects.filter(pk__in=[event.pk for event in sample_events]).refresh_registration_counts()
+
+        # bulk_create and update() bypass the model signals that invalidate listings
+        caching.bump_list_version(caching.EVENTS_LIST, caching.POPULARITY_LIST)
+        caching.bump_event_version(*[event.pk for event in sample_events])
 
         self.stdout.write(self.style.SUCCESS(f'✓ Created {registration_count} sample registrations'))
 
+        if options['users'] or options['events']:
+            self.stdout.write('\nGenerating additional data...')
+            counts = seed_dataset(
+                students=options['users'],
+                events=options['events'],
+                registrations=options['registrations'],
+                organizers=1,
+                batch_size=options['batch_size'],
+                seed=options['seed'],
+                prefix='sample_',
+                progress=ProgressReporter(self.stdout),
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Generated {counts["students"]} students, {counts["events"]} events '
+                f'and {counts["registrations"]} registrations'
+            ))
+
         # Summary
         self.stdout.write('\n' + '='*50)
         self.stdout.write(self.style.SUCCESS('Sample data created successfully!'))
@@ -0,0 +1,39 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from main import services
+from main.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Register the students listed in a CSV of usernames or emails for an event'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('csv_file', help='Path to the CSV file, or - for stdin')
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f'Event {options["event_id"]} does not exist.')
+
+        start = time.perf_counter()
+        if options['csv_file'] == '-':
+            identifiers = services.read_identifiers(sys.stdin)
+        else:
+            try:
+                with open(options['csv_file'], encoding='utf-8-sig', newline='') as lines:
+                    identifiers = services.read_identifiers(lines)
+            except OSError as exc:
+                raise CommandError(str(exc))
+        result = services.import_registrations(event, identifiers)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {result["registered"]} registered, {result["waitlisted"]} waitlisted, '
+            f'{result["duplicate"]} duplicate, {result["unknown"]} unknown '
+            f'({len(identifiers)} rows in {time.perf_counter() - start:.1f}s)'
+        ))
+        if result['unknown_sample']:
+            self.stdout.write(self.style.WARNING('Unknown: ' + ', '.join(result['unknown_sample'])))
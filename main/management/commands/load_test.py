@@ -0,0 +1,210 @@
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from wsgiref.simple_server import WSGIRequestHandler
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+from main import benchmarks
+from main.models import Event
+
+# (weight, name) of the pages a simulated student visits
+TASKS = [
+    (10, 'home'),
+    (3, 'home (popular)'),
+    (8, 'event_detail'),
+    (2, 'search'),
+    (3, 'my_events'),
+    (2, 'api_event_list'),
+    (2, 'api_event_detail'),
+    (1, 'register/unregister'),
+]
+
+
+class NoRedirects(urllib.request.HTTPRedirectHandler):
+    """Report redirects as responses instead of following them"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class VirtualUser:
+    """A logged-in student issuing weighted random requests until the deadline"""
+
+    def __init__(self, base_url, session, events, think_time, seed):
+        self.base_url = base_url.rstrip('/')
+        self.rng = random.Random(seed)
+        self.events = events
+        self.think_time = think_time
+        csrf = get_random_string(32)
+        self.headers = {
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={csrf}',
+            'X-CSRFToken': csrf,
+        }
+        self.opener = urllib.request.build_opener(NoRedirects)
+
+    def request(self, name, path, method='GET'):
+        data = b'' if method == 'POST' else None
+        request = urllib.request.Request(self.base_url + path, data=data, headers=self.headers, method=method)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+        except OSError:
+            status = 0
+        return name, (time.perf_counter() - start) * 1000, status
+
+    def task(self, name):
+        event_id = self.rng.choice(self.events)
+        if name == 'home':
+            return [self.request(name, reverse('home'))]
+        if name == 'home (popular)':
+            return [self.request(name, reverse('home') + '?sort=popular')]
+        if name == 'event_detail':
+            return [self.request(name, reverse('event_detail', args=[event_id]))]
+        if name == 'search':
+            return [self.request(name, reverse('search_events') + '?q=' + self.rng.choice(['Workshop', 'Data', 'Hall']))]
+        if name == 'my_events':
+            return [self.request(name, reverse('my_events'))]
+        if name == 'api_event_list':
+            return [self.request(name, reverse('api_event_list'))]
+        if name == 'api_event_detail':
+            return [self.request(name, reverse('api_event_detail', args=[event_id]))]
+        return [
+            self.request('register_for_event', reverse('register_for_event', args=[event_id]), 'POST'),
+            self.request('unregister_from_event', reverse('unregister_from_event', args=[event_id]), 'POST'),
+        ]
+
+    def run(self, deadline, results):
+        names = [name for _, name in TASKS]
+        weights = [weight for weight, _ in TASKS]
+        while time.perf_counter() < deadline:
+            results.extend(self.task(self.rng.choices(names, weights)[0]))
+            if self.think_time:
+                time.sleep(self.rng.uniform(0, self.think_time))
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive a running server with concurrent simulated students, locust style, '
+        'and report throughput and latency percentiles per page. Uses the data '
+        'already in the database; run populate_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server')
+        parser.add_argument('--serve', action='store_true', help='Start a threaded WSGI server in process instead')
+        parser.add_argument('--users', type=int, default=20, help='Concurrent simulated students')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--think-time', type=float, default=0, help='Maximum random pause between requests')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Results file of an earlier run to compare against')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed p95 latency increase over the baseline, as a fraction (default: 0.25)'
+        )
+
+    def sessions(self, count):
+        """Session keys of `count` logged-in students, saved to the database the server reads"""
+        students = list(User.objects.filter(is_staff=False, is_superuser=False).order_by('id')[:count])
+        if not students:
+            raise CommandError('No students found. Run populate_data first.')
+        sessions = []
+        for index in range(count):
+            client = Client()
+            client.force_login(students[index % len(students)])
+            sessions.append(client.cookies[settings.SESSION_COOKIE_NAME].value)
+        return sessions
+
+    def report(self, results, elapsed):
+        by_name = defaultdict(list)
+        for name, latency, status in results:
+            by_name[name].append((latency, status))
+        rows = []
+        for name in sorted(by_name):
+            samples = by_name[name]
+            rows.append({
+                'name': name,
+                'requests': len(samples),
+                'rps': round(len(samples) / elapsed, 1),
+                'errors': sum(1 for _, status in samples if not 200 <= status < 400),
+                **benchmarks.summarize([latency for latency, _ in samples]),
+            })
+            row = rows[-1]
+            self.stdout.write(
+                f'{name:<24}{row["requests"]:>7} {row["rps"]:>8.1f}/s  p50 {row["median_ms"]:>8.1f} ms  '
+                f'p95 {row["p95_ms"]:>8.1f} ms  p99 {row["p99_ms"]:>8.1f} ms  errors {row["errors"]}'
+            )
+        return rows
+
+    def handle(self, *args, **options):
+        events = list(Event.objects.upcoming().values_list('id', flat=True)[:200]) or \
+            list(Event.objects.values_list('id', flat=True)[:200])
+        if not events:
+            raise CommandError('No events found. Run populate_data first.')
+        sessions = self.sessions(options['users'])
+
+        server = None
+        base_url = options['url']
+        if options['serve']:
+            server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+            server.set_app(WSGIHandler())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+
+        self.stdout.write(
+            f'{options["users"]} users against {base_url} for {options["duration"]:.0f} s\n'
+        )
+        results = []
+        deadline = time.perf_counter() + options['duration']
+        threads = [
+            threading.Thread(
+                target=VirtualUser(base_url, session, events, options['think_time'], seed).run,
+                args=(deadline, results),
+            )
+            for seed, session in enumerate(sessions)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+        rows = self.report(results, elapsed)
+        errors = sum(row['errors'] for row in rows)
+        self.stdout.write(f'\n{len(results) / elapsed:.1f} requests/s in total, {errors} errors')
+
+        if options['output']:
+            benchmarks.write_results(
+                options['output'], rows, command='load_test', url=base_url,
+                users=options['users'], duration=options['duration'],
+            )
+            self.stdout.write(f'Wrote {len(rows)} results to {options["output"]}')
+        if options['baseline']:
+            regressions = benchmarks.compare(
+                rows, benchmarks.load_results(options['baseline']), options['threshold'], 'p95_ms'
+            )
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('✓ No regressions against the baseline'))
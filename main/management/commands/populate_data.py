@@ -1,156 +1,62 @@
-from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from main.models import Event, Registration
-from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from main.seeding import ProgressReporter, seed_dataset
 import random
+import time
 
 
 class Command(BaseCommand):
-    help = 'Populate database with 50 events and registrations for 2025'
+    help = 'Populate database with events and registrations for 2025 (sizes are configurable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=30, help='Number of student users (default: 30)')
+        parser.add_argument('--organizers', type=int, default=5, help='Number of staff users (default: 5)')
+        parser.add_argument('--events', type=int, default=50, help='Number of events (default: 50)')
+        parser.add_argument(
+            '--registrations', type=int, default=None,
+            help='Total registrations spread over the events (default: 12 per event)'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert (default: 5000)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a reproducible dataset')
+        parser.add_argument('--year', type=int, default=2025, help='Year the events are scheduled in (default: 2025)')
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
         self.stdout.write('Starting data population...')
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        registrations = options['registrations']
+        if registrations is None:
+            registrations = options['events'] * 12
 
         # Create admin user if doesn't exist
-        admin_user, created = User.objects.get_or_create(
-            username='admin',
-            defaults={
-                'email': 'admin@example.com',
-                'is_staff': True,
-                'is_superuser': True,
-            }
+        if not User.objects.filter(username='admin').exists():
+            User.objects.create_superuser(username='admin', email='admin@example.com', password='admin123')
+            self.stdout.write(self.style.SUCCESS('Created admin user'))
+
+        start = time.perf_counter()
+        counts = seed_dataset(
+            students=options['users'],
+            events=options['events'],
+            registrations=registrations,
+            organizers=options['organizers'],
+            batch_size=options['batch_size'],
+            seed=seed,
+            year=options['year'],
+            progress=ProgressReporter(self.stdout),
         )
-        if created:
-            admin_user.set_password('admin123')
-            admin_user.save()
-            self.stdout.write(self.style.SUCCESS(f'Created admin user'))
-
-        # Create staff users
-        staff_users = []
-        for i in range(1, 6):
-            user, created = User.objects.get_or_create(
-                username=f'staff{i}',
-                defaults={
-                    'email': f'staff{i}@example.com',
-                    'first_name': f'Staff',
-                    'last_name': f'Member{i}',
-                    'is_staff': True,
-                }
-            )
-            if created:
-                user.set_password('staff123')
-                user.save()
-                self.stdout.write(self.style.SUCCESS(f'Created staff user: {user.username}'))
-            staff_users.append(user)
-
-        # Create student users
-        student_users = []
-        for i in range(1, 31):
-            user, created = User.objects.get_or_create(
-                username=f'student{i}',
-                defaults={
-                    'email': f'student{i}@example.com',
-                    'first_name': f'Student',
-                    'last_name': f'User{i}',
-                }
-            )
-            if created:
-                user.set_password('student123')
-                user.save()
-                self.stdout.write(self.style.SUCCESS(f'Created student user: {user.username}'))
-            student_users.append(user)
-
-        # Event data templates
-        event_types = [
-            'Workshop', 'Seminar', 'Conference', 'Lecture', 'Training',
-            'Hackathon', 'Meetup', 'Webinar', 'Symposium', 'Forum'
-        ]
-        
-        topics = [
-            'Web Development', 'Machine Learning', 'Data Science', 'Cybersecurity',
-            'Cloud Computing', 'Mobile Development', 'AI Ethics', 'Blockchain',
-            'DevOps', 'UI/UX Design', 'Database Management', 'Network Security',
-            'Python Programming', 'JavaScript Frameworks', 'Software Testing',
-            'Agile Methodologies', 'Project Management', 'Digital Marketing',
-            'Business Analytics', 'Internet of Things'
-        ]
-
-        locations = [
-            'Main Auditorium', 'Conference Room A', 'Conference Room B',
-            'Lab 101', 'Lab 102', 'Lecture Hall 1', 'Lecture Hall 2',
-            'Innovation Center', 'Tech Hub', 'Online (Zoom)',
-            'Library Meeting Room', 'Student Center', 'Building A - Room 301',
-            'Building B - Room 205', 'Outdoor Amphitheater'
-        ]
-
-        descriptions = [
-            'Join us for an engaging session covering the latest trends and best practices.',
-            'An interactive workshop designed to enhance your skills and knowledge.',
-            'Learn from industry experts and network with professionals in the field.',
-            'Hands-on training session with practical exercises and real-world examples.',
-            'Discover cutting-edge technologies and their applications in modern development.',
-            'A comprehensive overview of fundamental concepts and advanced techniques.',
-            'Participate in collaborative activities and gain valuable insights.',
-            'Expert-led discussion on current challenges and innovative solutions.',
-            'Deep dive into practical applications with live demonstrations.',
-            'Enhance your understanding through case studies and group discussions.'
-        ]
-
-        # Create 50 events for 2025
-        events_created = 0
-        start_date = datetime(2025, 1, 1, 9, 0)
-        
-        for i in range(50):
-            # Generate event date in 2025
-            days_offset = random.randint(0, 364)
-            hours_offset = random.randint(0, 9)
-            event_date = start_date + timedelta(days=days_offset, hours=hours_offset)
-            
-            # Create event
-            event_type = random.choice(event_types)
-            topic = random.choice(topics)
-            title = f"{event_type}: {topic}"
-            
-            event, created = Event.objects.get_or_create(
-                title=title,
-                date=event_date,
-                defaults={
-                    'description': random.choice(descriptions),
-                    'location': random.choice(locations),
-                    'organizer': random.choice(staff_users + [admin_user]),
-                }
-            )
-            
-            if created:
-                events_created += 1
-                
-                # Register random students for this event
-                num_registrations = random.randint(5, 20)
-                registered_students = random.sample(student_users, min(num_registrations, len(student_users)))
-                
-                for student in registered_students:
-                    Registration.objects.get_or_create(
-                        student=student,
-                        event=event
-                    )
-                
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Created event {events_created}/50: {event.title} on {event.date.strftime("%Y-%m-%d")} '
-                        f'with {num_registrations} registrations'
-                    )
-                )
+        elapsed = time.perf_counter() - start
+        rows = sum(counts.values())
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'\n✓ Data population complete!\n'
-                f'  - Created {events_created} events\n'
-                f'  - Created {len(staff_users)} staff users\n'
-                f'  - Created {len(student_users)} student users\n'
-                f'  - All events are scheduled for 2025\n\n'
+                f'\n✓ Data population complete in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s, seed {seed})\n'
+                f'  - Created {counts["events"]} events\n'
+                f'  - Created {counts["registrations"]} registrations\n'
+                f'  - Created {counts["organizers"]} staff users\n'
+                f'  - Created {counts["students"]} student users\n'
+                f'  - All events are scheduled for {options["year"]}\n\n'
                 f'Login credentials:\n'
                 f'  Admin: username=admin, password=admin123\n'
-                f'  Staff: username=staff1-5, password=staff123\n'
-                f'  Students: username=student1-30, password=student123'
+                f'  Staff: username=staff1-{options["organizers"]}, password=staff123\n'
+                f'  Students: username=student1-{options["users"]}, password=student123'
             )
         )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from main import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the event full-text search index from the event table'
+
+    def handle(self, *args, **options):
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS('✓ Search index rebuilt'))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from main import caching
+from main.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Recompute Event.registration_count from the Registration table in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of events checked per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report drifted events without fixing them'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = fixed = 0
+        last_id = 0
+
+        while True:
+            # Walk the table by primary key so each batch is an index range scan
+            batch_ids = list(
+                Event.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch_ids:
+                break
+            last_id = batch_ids[-1]
+            checked += len(batch_ids)
+
+            with transaction.atomic():
+                drifted = list(
+                    Event.objects.filter(pk__in=batch_ids)
+                    .with_actual_registration_count()
+                    .exclude(registration_count=F('actual_registration_count'))
+                    .values_list('pk', 'registration_count', 'actual_registration_count')
+                )
+                for pk, stored, actual in drifted:
+                    self.stdout.write(f'Event {pk}: stored {stored}, actual {actual}')
+                if drifted and not options['dry_run']:
+                    drifted_ids = [row[0] for row in drifted]
+                    Event.objects.filter(pk__in=drifted_ids).refresh_registration_counts()
+                    # Bulk updates bypass the model signals
+                    caching.bump_on_commit(drifted_ids, [caching.POPULARITY_LIST])
+            fixed += len(drifted)
+
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Checked {checked} events. {verb} {fixed} drifted registration counts.'
+        ))
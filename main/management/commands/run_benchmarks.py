@@ -0,0 +1,140 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from main import benchmarks
+from main.seeding import seed_dataset
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded dataset at the end of each size"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed each dataset size and measure latency, queries and peak memory of '
+        'every view with the test client. All changes are rolled back. With '
+        '--baseline, fails when a view got slower or issues more queries.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', choices=list(benchmarks.SIZES), default=['small'],
+            help='Dataset sizes to seed, one run each (default: small)'
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per view')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Results file of an earlier run to compare against')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed median latency increase over the baseline, as a fraction (default: 0.25)'
+        )
+
+    def clients(self, subjects):
+        """One logged-in client per user, plus an anonymous one"""
+        # The test client's own host name is only allowed under the test runner
+        host = 'testserver' if 'testserver' in settings.ALLOWED_HOSTS else 'localhost'
+        clients = {None: Client(HTTP_HOST=host)}
+        for user in {subjects['student'], subjects['organizer'], subjects['admin']} - {None}:
+            clients[user] = Client(HTTP_HOST=host)
+            clients[user].force_login(user)
+        return clients
+
+    def prepare(self, scenario):
+        """Put the data in the state the request expects; never measured"""
+        if scenario.prepare:
+            scenario.prepare()
+
+    def request(self, client, scenario):
+        """Make the request alone; returns (response, milliseconds)"""
+        start = time.perf_counter()
+        if scenario.method == 'POST':
+            response = client.post(scenario.path, scenario.data)
+        else:
+            response = client.get(scenario.path)
+        return response, (time.perf_counter() - start) * 1000
+
+    def measure(self, client, scenario, repeat):
+        # Once to warm caches, once counted, once traced, then the timed runs;
+        # each is prepared first, outside the query capture and the trace
+        self.prepare(scenario)
+        self.request(client, scenario)
+        self.prepare(scenario)
+        # Under DEBUG the seeding fills the bounded query log, which would hide new entries
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response, _ = self.request(client, scenario)
+        # Read now: the next request resets the query log the context slices
+        query_count = len(queries)
+        self.prepare(scenario)
+        tracemalloc.start()
+        self.request(client, scenario)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        latencies = []
+        for _ in range(repeat):
+            self.prepare(scenario)
+            latencies.append(self.request(client, scenario)[1])
+        return {
+            'name': scenario.name,
+            'url_name': scenario.url_name,
+            'method': scenario.method,
+            'status': response.status_code,
+            'queries': query_count,
+            'peak_kib': round(peak / 1024, 1),
+            **benchmarks.summarize(latencies),
+        }
+
+    def run_size(self, size, repeat):
+        results = []
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                counts = seed_dataset(**benchmarks.SIZES[size], prefix='bench_')
+                User.objects.create_superuser(username='bench_admin', password=None)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'\n=== {size}: {counts["events"]} events, {counts["registrations"]} registrations '
+                    f'(seeded in {time.perf_counter() - start:.1f} s) ==='
+                ))
+                cache.clear()
+                subjects = benchmarks.pick_subjects()
+                clients = self.clients(subjects)
+                for scenario in benchmarks.scenarios(subjects):
+                    row = {'size': size, **self.measure(clients[scenario.user], scenario, repeat)}
+                    results.append(row)
+                    self.stdout.write(
+                        f'{row["name"]:<30} {row["status"]:>4} {row["median_ms"]:>9.2f} ms '
+                        f'p95 {row["p95_ms"]:>9.2f} ms {row["queries"]:>4} queries {row["peak_kib"]:>9.1f} KiB'
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        cache.clear()
+        return results
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options['sizes']:
+            results += self.run_size(size, options['repeat'])
+
+        if options['output']:
+            benchmarks.write_results(
+                options['output'], results, command='run_benchmarks',
+                sizes=options['sizes'], repeat=options['repeat'], vendor=connection.vendor,
+            )
+            self.stdout.write(f'\nWrote {len(results)} results to {options["output"]}')
+
+        if options['baseline']:
+            regressions = benchmarks.compare(
+                results, benchmarks.load_results(options['baseline']), options['threshold']
+            )
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('✓ No regressions against the baseline'))
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from main import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (emails, digests, cache warming) until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Jobs claimed per poll')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no jobs are due')
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help='Seconds after which a job left running by a crashed worker is requeued'
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options['stale_after'])
+        total = 0
+        try:
+            while True:
+                requeued = jobs.requeue_stale(stale_after)
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+                processed = jobs.run_pending(options['batch_size'])
+                total += processed
+                if processed:
+                    continue
+                if options['once']:
+                    break
+                # Drop connections that went stale or broke while idle
+                close_old_connections()
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'✓ Ran {total} jobs'))
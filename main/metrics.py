@@ -0,0 +1,118 @@
+"""
+In-process request metrics.
+
+Each sampled request produces one RequestMetrics record. Records are kept in a
+fixed-size rolling window per URL name, from which percentiles are computed on
+demand, so memory stays bounded however long the process runs.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+
+FIELDS = ('total_ms', 'db_ms', 'db_queries', 'template_ms', 'response_bytes')
+
+_current = ContextVar('request_metrics', default=None)
+_windows = defaultdict(lambda: deque(maxlen=getattr(settings, 'PERF_WINDOW_SIZE', 1000)))
+_counts = defaultdict(int)
+_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """Costs accumulated while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.db_queries = 0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.response_bytes = 0
+
+    def server_timing(self):
+        """Format the metrics as a Server-Timing header value"""
+        return (
+            f'total;dur={self.total_ms:.1f}, '
+            f'db;dur={self.db_ms:.1f};desc="{self.db_queries} queries", '
+            f'tpl;dur={self.template_ms:.1f}'
+        )
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Database execute_wrapper that counts and times queries of sampled requests"""
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.db_ms += (time.perf_counter() - start) * 1000
+        request_metrics.db_queries += 1
+
+
+def instrument(connection):
+    """
+    Install sql_wrapper on a database connection, once.
+
+    The wrapper stays installed for the life of the connection object and
+    finds the request through a context variable, so it also sees queries an
+    async view runs in a sync_to_async worker thread.
+    """
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current():
+    """Return the metrics of the request being handled, if it is sampled"""
+    return _current.get()
+
+
+def record(url_name, metrics):
+    values = tuple(getattr(metrics, field) for field in FIELDS)
+    with _lock:
+        _windows[url_name].append(values)
+        _counts[url_name] += 1
+
+
+def percentile(ordered, fraction):
+    """The value at `fraction` (0 to 1) of a sorted, non-empty list, nearest rank"""
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def snapshot():
+    """Return p50/p95/p99 of every metric for every URL name"""
+    with _lock:
+        windows = {name: list(window) for name, window in _windows.items()}
+        counts = dict(_counts)
+    report = {}
+    for name, rows in sorted(windows.items()):
+        entry = {'requests': counts[name], 'window': len(rows)}
+        for index, field in enumerate(FIELDS):
+            ordered = sorted(row[index] for row in rows)
+            entry[field] = {
+                'p50': round(percentile(ordered, 0.50), 3),
+                'p95': round(percentile(ordered, 0.95), 3),
+                'p99': round(percentile(ordered, 0.99), 3),
+            }
+        report[name] = entry
+    return report
+
+
+def reset():
+    with _lock:
+        _windows.clear()
+        _counts.clear()
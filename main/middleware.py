@@ -0,0 +1,175 @@
+import hashlib
+import json
+import mimetypes
+import random
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseNotModified
+
+from . import metrics
+
+
+class PerformanceMiddleware:
+    """
+    Record wall time, SQL count and time, template time and response size.
+
+    Only a PERF_SAMPLE_RATE fraction of requests is measured; the rest pass
+    straight through. Sampled responses carry a Server-Timing header and feed
+    the rolling percentiles served by the request_stats view.
+
+    The middleware runs natively under both WSGI and ASGI, so async views are
+    not forced back onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        request_metrics, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self._finish(request, response, request_metrics)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        request_metrics, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self._finish(request, response, request_metrics)
+
+    def _sampled(self):
+        return random.random() < getattr(settings, 'PERF_SAMPLE_RATE', 1.0)
+
+    def _finish(self, request, response, request_metrics):
+        request_metrics.total_ms = (time.perf_counter() - request_metrics.started) * 1000
+        if not response.streaming:
+            request_metrics.response_bytes = len(response.content)
+        match = request.resolver_match
+        metrics.record(match.url_name if match and match.url_name else 'unresolved', request_metrics)
+        if getattr(settings, 'PERF_SERVER_TIMING', True):
+            response['Server-Timing'] = request_metrics.server_timing()
+        return response
+
+
+# Content-Encoding of each precompressed copy main.storage writes, best first
+STATIC_ENCODINGS = {'.br': 'br', '.gz': 'gzip'}
+StaticFile = namedtuple('StaticFile', 'content_type cache_control variants')
+
+
+def accepted_encodings(header):
+    """The content codings an Accept-Encoding header allows, leaving out those with q=0"""
+    result = set()
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        quality = params.replace(' ', '').lower()
+        if not (quality.startswith('q=0') and quality.strip('q=0.') == ''):
+            result.add(coding.strip().lower())
+    return result
+
+
+class StaticFilesMiddleware:
+    """
+    Serve the collected static files from memory, ahead of the other middleware.
+
+    Enabled by STATIC_SERVE. STATIC_ROOT is read once when the middleware is
+    loaded, so restart the server after collectstatic. Names in the
+    staticfiles.json manifest carry a content hash and never change, so they
+    are sent with a one-year immutable Cache-Control; any other name gets
+    STATIC_MAX_AGE seconds. The brotli or gzip copy written by main.storage is
+    picked by Accept-Encoding, and a matching If-None-Match gets a 304.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'STATIC_SERVE', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        if '//' in settings.STATIC_URL:
+            raise MiddlewareNotUsed('STATIC_URL points at another host')
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.files = self.load(Path(settings.STATIC_ROOT))
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def load(self, root):
+        """StaticFile entries by name for every file under root"""
+        manifest = root / ManifestStaticFilesStorage.manifest_name
+        hashed = set(json.loads(manifest.read_text())['paths'].values()) if manifest.is_file() else set()
+        immutable = f'public, max-age={365 * 24 * 3600}, immutable'
+        mutable = f'public, max-age={getattr(settings, "STATIC_MAX_AGE", 60)}'
+        files = {}
+        for path in root.rglob('*'):
+            if not path.is_file() or path.suffix in STATIC_ENCODINGS or path == manifest:
+                continue
+            name = path.relative_to(root).as_posix()
+            variants = []
+            for suffix, encoding in STATIC_ENCODINGS.items():
+                compressed = path.with_name(path.name + suffix)
+                if compressed.is_file():
+                    variants.append((encoding, compressed.read_bytes()))
+            variants.append((None, path.read_bytes()))
+            files[name] = StaticFile(
+                mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                immutable if name in hashed else mutable,
+                [
+                    (encoding, content, f'"{hashlib.md5(content).hexdigest()}"')
+                    for encoding, content in variants
+                ],
+            )
+        return files
+
+    def serve(self, request):
+        """The response for a static file request, or None to pass the request on"""
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        static = self.files.get(request.path[len(self.prefix):])
+        if static is None:
+            return None
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding, content, etag = next(
+            variant for variant in static.variants if variant[0] is None or variant[0] in accepted
+        )
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(b'' if request.method == 'HEAD' else content, content_type=static.content_type)
+            response['Content-Length'] = len(content)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Cache-Control'] = static.cache_control
+        if len(static.variants) > 1:
+            response['Vary'] = 'Accept-Encoding'
+        if settings.SECURE_CONTENT_TYPE_NOSNIFF:
+            response['X-Content-Type-Options'] = 'nosniff'
+        return response
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_registration_count(apps, schema_editor):
+    Event = apps.get_model('main', 'Event')
+    Registration = apps.get_model('main', 'Registration')
+    counts = Registration.objects.filter(event=OuterRef('pk')).order_by().values(
+        'event'
+    ).annotate(total=Count('id')).values('total')
+    Event.objects.update(registration_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='registration_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_registration_count, migrations.RunPython.noop),
+    ]
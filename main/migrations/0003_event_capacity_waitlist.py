@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:43
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0002_event_registration_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum number of students. Leave blank for unlimited.', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='main.event')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'waitlist entries',
+                'ordering': ['created_at', 'id'],
+                'unique_together': {('student', 'event')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_event_capacity_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date', 'id'], name='event_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['organizer', 'date', 'id'], name='event_organizer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['-registration_count', '-id'], name='event_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['student', '-created_at'], name='registration_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['event', '-created_at'], name='registration_event_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['event', 'created_at', 'id'], name='waitlist_event_fifo_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+from django.db import migrations
+
+# SQLite: an external-content FTS5 table over main_event, kept in sync by
+# triggers. Prefix indexes on 2 and 3 characters make short prefix queries
+# cheap. A later migration that remakes main_event (SQLite does this for most
+# column changes) drops the triggers and must recreate them; run
+# `manage.py rebuild_search_index` afterwards.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE main_event_fts USING fts5(
+        title, description, location,
+        content='main_event', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER main_event_fts_insert AFTER INSERT ON main_event BEGIN
+        INSERT INTO main_event_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+    """
+    CREATE TRIGGER main_event_fts_delete AFTER DELETE ON main_event BEGIN
+        INSERT INTO main_event_fts(main_event_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END
+    """,
+    """
+    CREATE TRIGGER main_event_fts_update AFTER UPDATE OF title, description, location ON main_event BEGIN
+        INSERT INTO main_event_fts(main_event_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO main_event_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+    "INSERT INTO main_event_fts(main_event_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS main_event_fts_update',
+    'DROP TRIGGER IF EXISTS main_event_fts_delete',
+    'DROP TRIGGER IF EXISTS main_event_fts_insert',
+    'DROP TABLE IF EXISTS main_event_fts',
+]
+
+# PostgreSQL: a GIN expression index; main.search uses the same expression
+POSTGRESQL_FORWARD = [
+    """
+    CREATE INDEX main_event_search_idx ON main_event USING GIN (
+        (setweight(to_tsvector('english', title), 'A')
+         || setweight(to_tsvector('english', location), 'B')
+         || setweight(to_tsvector('english', description), 'C'))
+    )
+    """,
+]
+
+POSTGRESQL_REVERSE = ['DROP INDEX IF EXISTS main_event_search_idx']
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor, [])
+        for sql in vendor_statements:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
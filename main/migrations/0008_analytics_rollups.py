@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_event_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('day', 'Registrations per day'), ('organizer_day', 'Registrations per organizer and day'), ('event', 'Registrations per event'), ('location', 'Registrations per location'), ('student', 'Registrations per student'), ('engagement', 'Students per engagement bucket')], max_length=20)),
+                ('key', models.CharField(max_length=200)),
+                ('label', models.CharField(blank=True, max_length=200)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('last_id', models.PositiveBigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['created_at', 'id'], name='registration_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rollup',
+            index=models.Index(fields=['dimension', '-count'], name='rollup_top_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rollup',
+            unique_together={('dimension', 'key')},
+        ),
+    ]
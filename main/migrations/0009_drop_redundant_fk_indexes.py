@@ -0,0 +1,71 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Each of these foreign keys leads a composite or unique index, which makes the
+# automatic single-column index redundant. Only the indexes are dropped: on
+# SQLite, AlterField would remake main_event and lose the search triggers.
+FIELDS = [
+    ('event', 'organizer'),
+    ('registration', 'event'),
+    ('registration', 'student'),
+    ('waitlistentry', 'event'),
+    ('waitlistentry', 'student'),
+]
+
+
+def drop_indexes(apps, schema_editor):
+    for model_name, field_name in FIELDS:
+        model = apps.get_model('main', model_name)
+        column = model._meta.get_field(field_name).column
+        for name in schema_editor._constraint_names(model, [column], index=True, unique=False, primary_key=False):
+            schema_editor.execute(schema_editor._delete_index_sql(model, name))
+
+
+def create_indexes(apps, schema_editor):
+    for model_name, field_name in FIELDS:
+        model = apps.get_model('main', model_name)
+        schema_editor.execute(schema_editor._create_index_sql(model, fields=[model._meta.get_field(field_name)]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0008_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(drop_indexes, create_indexes)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='event',
+                    name='organizer',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='organized_events', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='registration',
+                    name='event',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='registrations', to='main.event'),
+                ),
+                migrations.AlterField(
+                    model_name='registration',
+                    name='student',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='registrations', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='waitlistentry',
+                    name='event',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='main.event'),
+                ),
+                migrations.AlterField(
+                    model_name='waitlistentry',
+                    name='student',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+    ]
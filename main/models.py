@@ -1,42 +1,252 @@
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 
+class EventQuerySet(models.QuerySet):
+    """Custom queryset for listing events"""
+
+    def with_listing_data(self):
+        """Join the organizer so event cards render from a single query"""
+        return self.select_related('organizer')
+
+    def with_free_seat(self):
+        """Events that are uncapped or still below capacity"""
+        return self.filter(Q(capacity__isnull=True) | Q(registration_count__lt=F('capacity')))
+
+    def adjust_registration_count(self, delta):
+        """Atomically add delta to the stored registration counter"""
+        return self.update(registration_count=F('registration_count') + delta)
+
+    def with_actual_registration_count(self):
+        """Annotate the registration count aggregated from the Registration table"""
+        return self.annotate(actual_registration_count=Count('registrations'))
+
+    def refresh_registration_counts(self):
+        """Recompute the stored counter from the Registration table"""
+        counts = Registration.objects.filter(event=OuterRef('pk')).order_by().values(
+            'event'
+        ).annotate(total=Count('id')).values('total')
+        return self.update(registration_count=Coalesce(Subquery(counts), 0))
+
+    def upcoming(self):
+        """Events that have not started yet"""
+        return self.filter(date__gte=timezone.now())
+
+    def past(self):
+        """Events whose date has passed"""
+        return self.filter(date__lt=timezone.now())
+
+
+class EventManager(models.Manager.from_queryset(EventQuerySet)):
+    """Default Event manager; hides events that are deleted but not yet purged"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Event(models.Model):
     """Model representing an event or activity"""
     title = models.CharField(max_length=200)
     description = models.TextField()
     date = models.DateTimeField()
     location = models.CharField(max_length=200)
-    organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='organized_events')
+    # Indexed by event_organizer_date_idx, which leads with organizer
+    organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='organized_events', db_index=False)
+    # Denormalized count of Registration rows, kept in step with F() updates
+    registration_count = models.PositiveIntegerField(default=0, editable=False)
+    capacity = models.PositiveIntegerField(
+        null=True, blank=True, validators=[MinValueValidator(1)],
+        help_text='Maximum number of students. Leave blank for unlimited.'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the event is deleted; a background job then purges the row and
+    # its registrations in chunks (see services.delete_event)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = EventManager()
+    # Includes deleted events awaiting purge
+    all_objects = EventQuerySet.as_manager()
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Home page upcoming/past keyset pagination on (date, id)
+            models.Index(fields=['date', 'id'], name='event_date_id_idx'),
+            # Organizer dashboard: filter by organizer, page by (date, id)
+            models.Index(fields=['organizer', 'date', 'id'], name='event_organizer_date_idx'),
+            # Popularity listing ordered by (-registration_count, -id)
+            models.Index(fields=['-registration_count', '-id'], name='event_popularity_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # registration_count only changes through atomic F() updates, and
+        # deleted_at only through delete_event; never write back the possibly
+        # stale copies held by this instance
+        if not self._state.adding and not kwargs.get('update_fields') and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('registration_count', 'deleted_at')
+            ]
+        super().save(*args, **kwargs)
+
     def is_past(self):
         """Check if the event date has passed"""
         return self.date < timezone.now()
 
     def registered_students_count(self):
         """Get count of registered students"""
-        return self.registrations.count()
+        return self.registration_count
+
+    def is_full(self):
+        """Check if every seat has been taken"""
+        return self.capacity is not None and self.registration_count >= self.capacity
+
+    def seats_left(self):
+        """Get number of free seats, or None when uncapped"""
+        if self.capacity is None:
+            return None
+        return max(self.capacity - self.registration_count, 0)
 
 
 class Registration(models.Model):
     """Model representing a student's registration for an event"""
-    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='registrations')
-    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='registrations')
+    # Both columns lead a composite index below, so neither needs its own
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='registrations', db_index=False)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='registrations', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('student', 'event')
         ordering = ['-created_at']
+        indexes = [
+            # My events: a student's registrations, newest first
+            models.Index(fields=['student', '-created_at'], name='registration_student_idx'),
+            # Event registrations list and exports, newest first
+            models.Index(fields=['event', '-created_at'], name='registration_event_idx'),
+            # Analytics refresh: registrations after the rollup watermark
+            models.Index(fields=['created_at', 'id'], name='registration_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.event.title}"
+
+
+class WaitlistEntryQuerySet(models.QuerySet):
+    def with_position(self):
+        """Annotate queue_position, the same number as position(), without a query per entry"""
+        ahead = WaitlistEntry.objects.filter(event_id=OuterRef('event_id')).filter(
+            Q(created_at__lt=OuterRef('created_at')) | Q(created_at=OuterRef('created_at'), id__lt=OuterRef('id'))
+        ).order_by().values('event_id').annotate(count=Count('id')).values('count')
+        return self.annotate(queue_position=Coalesce(Subquery(ahead), 0) + 1)
+
+
+class WaitlistEntry(models.Model):
+    """Model representing a student queued for a full event"""
+    # Both columns lead a composite index below, so neither needs its own
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries', db_index=False)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist_entries', db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = WaitlistEntryQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('student', 'event')
+        # First come, first served; id breaks ties between equal timestamps
+        ordering = ['created_at', 'id']
+        verbose_name_plural = 'waitlist entries'
+        indexes = [
+            # Head-of-queue lookup when promoting the waitlist
+            models.Index(fields=['event', 'created_at', 'id'], name='waitlist_event_fifo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.event.title} (waitlist)"
+
+    def position(self):
+        """Get 1-based position in the event's waitlist"""
+        return WaitlistEntry.objects.filter(event_id=self.event_id).filter(
+            Q(created_at__lt=self.created_at) | Q(created_at=self.created_at, id__lt=self.id)
+        ).count() + 1
+
+
+class Job(models.Model):
+    """A unit of background work queued by a request and run by the run_worker command"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            # Worker poll: due pending jobs, oldest first
+            models.Index(fields=['status', 'run_after', 'id'], name='job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class Rollup(models.Model):
+    """A precomputed registration count for one value of a dashboard dimension"""
+    DAY = 'day'
+    ORGANIZER_DAY = 'organizer_day'
+    EVENT = 'event'
+    LOCATION = 'location'
+    STUDENT = 'student'
+    ENGAGEMENT = 'engagement'
+    DIMENSION_CHOICES = [
+        (DAY, 'Registrations per day'),
+        (ORGANIZER_DAY, 'Registrations per organizer and day'),
+        (EVENT, 'Registrations per event'),
+        (LOCATION, 'Registrations per location'),
+        (STUDENT, 'Registrations per student'),
+        (ENGAGEMENT, 'Students per engagement bucket'),
+    ]
+
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=200)
+    label = models.CharField(max_length=200, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('dimension', 'key')
+        indexes = [
+            # Top events and locations
+            models.Index(fields=['dimension', '-count'], name='rollup_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} {self.key}: {self.count}"
+
+
+class RollupWatermark(models.Model):
+    """The last registration folded into the rollups, as a (created_at, id) position"""
+    name = models.CharField(max_length=50, unique=True)
+    created_at = models.DateTimeField(null=True, blank=True)
+    last_id = models.PositiveBigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.created_at} #{self.last_id}"
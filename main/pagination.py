@@ -0,0 +1,93 @@
+import json
+
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+class KeysetPage:
+    """A single page of results from a KeysetPaginator"""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking past the last row of the previous page.
+
+    The ordering must end in a unique field (usually 'id') so every row has
+    a distinct key. Pages are fetched with a WHERE clause on the key instead
+    of OFFSET, so deep pages cost the same as the first one.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, row):
+        """Encode the ordering key of a row (model instance or dict)"""
+        values = []
+        for name in self.fields:
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        return urlsafe_base64_encode(json.dumps(values, separators=(',', ':')).encode())
+
+    def decode_cursor(self, cursor):
+        """Decode a cursor back into typed ordering values"""
+        try:
+            values = json.loads(force_str(urlsafe_base64_decode(cursor)))
+        except (ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        model = self.queryset.model
+        try:
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(cursor)
+
+    def seek_filter(self, values):
+        """Build the lexicographic 'after this key' condition"""
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[index]})
+            for prev in range(index):
+                step &= Q(**{self.fields[prev]: values[prev]})
+            condition |= step
+        return condition
+
+    def page(self, cursor=None):
+        """Return the page following the given cursor"""
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self.seek_filter(self.decode_cursor(cursor)))
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor)
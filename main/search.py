@@ -0,0 +1,117 @@
+"""
+Ranked full-text search over Event title, description and location.
+
+SQLite uses the FTS5 table created by migration 0005, PostgreSQL the GIN
+expression index from the same migration. Other backends fall back to
+unindexed icontains matching ordered by date.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Event
+
+# Title matches count most, then location, then description
+SQLITE_WEIGHTS = (10.0, 1.0, 4.0)
+
+POSTGRESQL_VECTOR = (
+    "(setweight(to_tsvector('english', e.title), 'A')"
+    " || setweight(to_tsvector('english', e.location), 'B')"
+    " || setweight(to_tsvector('english', e.description), 'C'))"
+)
+
+
+def parse_terms(query):
+    """Split a user query into lower-case word terms, ignoring search syntax"""
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def _filters(start, end, organizer_id):
+    # Deleted events stay in the index until their purge job removes the row
+    clauses, params = ['e.deleted_at IS NULL'], []
+    if start is not None:
+        clauses.append('e.date >= %s')
+        params.append(connection.ops.adapt_datetimefield_value(start))
+    if end is not None:
+        clauses.append('e.date < %s')
+        params.append(connection.ops.adapt_datetimefield_value(end))
+    if organizer_id is not None:
+        clauses.append('e.organizer_id = %s')
+        params.append(organizer_id)
+    return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+def _ranked_ids_sqlite(terms, start, end, organizer_id, limit):
+    # Every term must match; each is quoted and prefix-matched, so user input
+    # can never be interpreted as FTS5 query syntax
+    match = ' '.join(f'"{term}"*' for term in terms)
+    where, params = _filters(start, end, organizer_id)
+    sql = (
+        'SELECT e.id FROM main_event_fts f JOIN main_event e ON e.id = f.rowid '
+        f'WHERE main_event_fts MATCH %s{where} '
+        'ORDER BY bm25(main_event_fts, %s, %s, %s), e.id DESC LIMIT %s'
+    )
+    # bm25 has to score every row it orders. Events with all the terms in
+    # their title outrank the rest, so they are ranked on their own first and
+    # the other matches are only scored when titles do not fill the page.
+    ids = []
+    with connection.cursor() as cursor:
+        for expression in (f'{{title}} : ({match})', f'({match}) NOT {{title}} : ({match})'):
+            cursor.execute(sql, [expression, *params, *SQLITE_WEIGHTS, limit - len(ids)])
+            ids += [row[0] for row in cursor.fetchall()]
+            if len(ids) >= limit:
+                break
+    return ids
+
+
+def _ranked_ids_postgresql(terms, start, end, organizer_id, limit):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    where, params = _filters(start, end, organizer_id)
+    sql = (
+        f'SELECT e.id FROM main_event e, to_tsquery(\'english\', %s) query '
+        f'WHERE {POSTGRESQL_VECTOR} @@ query{where} '
+        f'ORDER BY ts_rank({POSTGRESQL_VECTOR}, query) DESC, e.id DESC LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery, *params, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _ranked_ids_fallback(terms, start, end, organizer_id, limit):
+    events = Event.objects.all()
+    for term in terms:
+        events = events.filter(
+            Q(title__icontains=term) | Q(description__icontains=term) | Q(location__icontains=term)
+        )
+    if start is not None:
+        events = events.filter(date__gte=start)
+    if end is not None:
+        events = events.filter(date__lt=end)
+    if organizer_id is not None:
+        events = events.filter(organizer_id=organizer_id)
+    return list(events.order_by('-date', '-id').values_list('id', flat=True)[:limit])
+
+
+def search_event_ids(query, start=None, end=None, organizer_id=None, limit=20):
+    """Return ids of matching events, best match first"""
+    terms = parse_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'sqlite':
+        search = _ranked_ids_sqlite
+    elif connection.vendor == 'postgresql':
+        search = _ranked_ids_postgresql
+    else:
+        search = _ranked_ids_fallback
+    return search(terms, start, end, organizer_id, limit)
+
+
+def rebuild_index():
+    """Rebuild the full-text index from the event table"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO main_event_fts(main_event_fts) VALUES ('rebuild')")
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('REINDEX INDEX main_event_search_idx')
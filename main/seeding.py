@@ -0,0 +1,220 @@
+"""
+Bulk dataset generation for sample data, load tests and benchmarks.
+
+Rows are inserted with bulk_create in fixed-size batches, one transaction per
+chunk of events, so seeding cost is dominated by the database rather than by
+per-row ORM overhead. Passwords are hashed once and the hash is shared by every
+generated account, since PBKDF2 is deliberately slow. The same seed always
+produces the same dataset.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching
+from .models import Event, Registration
+
+EVENT_TYPES = [
+    'Workshop', 'Seminar', 'Conference', 'Lecture', 'Training',
+    'Hackathon', 'Meetup', 'Webinar', 'Symposium', 'Forum'
+]
+
+TOPICS = [
+    'Web Development', 'Machine Learning', 'Data Science', 'Cybersecurity',
+    'Cloud Computing', 'Mobile Development', 'AI Ethics', 'Blockchain',
+    'DevOps', 'UI/UX Design', 'Database Management', 'Network Security',
+    'Python Programming', 'JavaScript Frameworks', 'Software Testing',
+    'Agile Methodologies', 'Project Management', 'Digital Marketing',
+    'Business Analytics', 'Internet of Things'
+]
+
+LOCATIONS = [
+    'Main Auditorium', 'Conference Room A', 'Conference Room B',
+    'Lab 101', 'Lab 102', 'Lecture Hall 1', 'Lecture Hall 2',
+    'Innovation Center', 'Tech Hub', 'Online (Zoom)',
+    'Library Meeting Room', 'Student Center', 'Building A - Room 301',
+    'Building B - Room 205', 'Outdoor Amphitheater'
+]
+
+DESCRIPTIONS = [
+    'Join us for an engaging session covering the latest trends and best practices.',
+    'An interactive workshop designed to enhance your skills and knowledge.',
+    'Learn from industry experts and network with professionals in the field.',
+    'Hands-on training session with practical exercises and real-world examples.',
+    'Discover cutting-edge technologies and their applications in modern development.',
+    'A comprehensive overview of fundamental concepts and advanced techniques.',
+    'Participate in collaborative activities and gain valuable insights.',
+    'Expert-led discussion on current challenges and innovative solutions.',
+    'Deep dive into practical applications with live demonstrations.',
+    'Enhance your understanding through case studies and group discussions.'
+]
+
+
+def ensure_users(usernames, defaults, password_hash, batch_size, progress=None, label='users'):
+    """
+    Create any missing users from `usernames` and return all of their ids.
+
+    Existing accounts are looked up in batched IN queries and left untouched,
+    so seeding can be re-run safely.
+    """
+    ids = []
+    created = 0
+    if progress:
+        progress(label, 0, len(usernames))
+    for start in range(0, len(usernames), batch_size):
+        batch = usernames[start:start + batch_size]
+        with transaction.atomic():
+            existing = dict(
+                User.objects.filter(username__in=batch).values_list('username', 'id')
+            )
+            new_users = User.objects.bulk_create([
+                User(username=username, email=f'{username}@example.com',
+                     password=password_hash, **defaults(index))
+                for index, username in enumerate(batch, start=start + 1)
+                if username not in existing
+            ])
+        ids.extend(existing.values())
+        ids.extend(user.pk for user in new_users)
+        created += len(new_users)
+        if progress:
+            progress(label, start + len(batch), len(usernames))
+    return ids, created
+
+
+def _registration_counts(rng, events, registrations, max_per_event):
+    """
+    Split `registrations` across events with a skew towards a few popular ones.
+
+    The counts add up to exactly `registrations` unless the events cannot seat
+    that many students.
+    """
+    if not events:
+        return []
+    weights = [rng.random() ** 3 for _ in range(events)]
+    scale = registrations / (sum(weights) or 1)
+    shares = [weight * scale for weight in weights]
+    counts = [min(int(share), max_per_event) for share in shares]
+    # Rounding down (and the cap) leaves registrations over; hand them out one
+    # per event, largest remainder first, until none are left or all are full
+    order = sorted(range(events), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+    leftover = registrations - sum(counts)
+    while leftover > 0:
+        open_events = [i for i in order if counts[i] < max_per_event][:leftover]
+        if not open_events:
+            break
+        for i in open_events:
+            counts[i] += 1
+        leftover -= len(open_events)
+    return counts
+
+
+def _event_date(rng, year, now):
+    if year:
+        start = timezone.make_aware(datetime(year, 1, 1, 9, 0))
+        return start + timedelta(days=rng.randint(0, 364), hours=rng.randint(0, 9))
+    # Spread events over two years centred on today
+    return now + timedelta(minutes=rng.randint(-525600, 525600))
+
+
+def seed_dataset(students, events, registrations, organizers=5, batch_size=5000,
+                 seed=0, prefix='', password='student123', organizer_password='staff123',
+                 year=None, progress=None):
+    """
+    Create students, organizers, events and registrations.
+
+    Students are named '<prefix>student<n>' and organizers '<prefix>staff<n>'.
+    Registration totals are fixed per event before insertion, so each Event is
+    written with its final registration_count and no recount pass is needed.
+    progress(label, done, total) is called after every batch.
+
+    Returns a dict with the number of rows created per table.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    student_ids, students_created = ensure_users(
+        [f'{prefix}student{i}' for i in range(1, students + 1)],
+        lambda i: {'first_name': 'Student', 'last_name': f'User{i}'},
+        make_password(password), batch_size, progress, 'students',
+    )
+    organizer_ids, organizers_created = ensure_users(
+        [f'{prefix}staff{i}' for i in range(1, organizers + 1)],
+        lambda i: {'first_name': 'Staff', 'last_name': f'Member{i}', 'is_staff': True},
+        make_password(organizer_password), batch_size, progress, 'organizers',
+    )
+    # Keep the order stable so the same seed yields the same dataset
+    student_ids.sort()
+    organizer_ids.sort()
+
+    counts = _registration_counts(rng, events, registrations, len(student_ids))
+    total_registrations = sum(counts)
+    events_created = registrations_created = 0
+    if progress:
+        progress('events', 0, events)
+        progress('registrations', 0, total_registrations)
+
+    for start in range(0, events, batch_size):
+        chunk_counts = counts[start:start + batch_size]
+        with transaction.atomic():
+            new_events = Event.objects.bulk_create([
+                Event(
+                    title=f'{rng.choice(EVENT_TYPES)}: {rng.choice(TOPICS)}',
+                    description=rng.choice(DESCRIPTIONS),
+                    date=_event_date(rng, year, now),
+                    location=rng.choice(LOCATIONS),
+                    organizer_id=rng.choice(organizer_ids),
+                    registration_count=count,
+                )
+                for count in chunk_counts
+            ])
+            batch = []
+            for event, count in zip(new_events, chunk_counts):
+                batch.extend(
+                    Registration(student_id=student_id, event_id=event.pk)
+                    for student_id in rng.sample(student_ids, count)
+                )
+                if len(batch) >= batch_size:
+                    Registration.objects.bulk_create(batch)
+                    registrations_created += len(batch)
+                    batch = []
+            if batch:
+                Registration.objects.bulk_create(batch)
+                registrations_created += len(batch)
+        events_created += len(new_events)
+        if progress:
+            progress('events', events_created, events)
+            progress('registrations', registrations_created, total_registrations)
+
+    # bulk_create bypasses the model signals that invalidate listings
+    caching.bump_list_version(caching.EVENTS_LIST, caching.POPULARITY_LIST)
+
+    return {
+        'students': students_created,
+        'organizers': organizers_created,
+        'events': events_created,
+        'registrations': registrations_created,
+    }
+
+
+class ProgressReporter:
+    """Print per-stage progress and throughput from a management command"""
+
+    def __init__(self, stdout, interval=1.0):
+        self.stdout = stdout
+        self.interval = interval
+        self.started = {}
+        self.last_report = {}
+
+    def __call__(self, label, done, total):
+        now = time.perf_counter()
+        started = self.started.setdefault(label, now)
+        if done == 0 or (done < total and now - self.last_report.get(label, 0) < self.interval):
+            return
+        self.last_report[label] = now
+        rate = done / max(now - started, 1e-9)
+        self.stdout.write(f'  {label}: {done:,}/{total:,} ({rate:,.0f} rows/s)')
@@ -0,0 +1,336 @@
+import csv
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import caching, tasks
+from .models import Event, Registration, Rollup, WaitlistEntry
+
+# Outcomes returned by register_student / unregister_student
+REGISTERED = 'registered'
+WAITLISTED = 'waitlisted'
+ALREADY_REGISTERED = 'already_registered'
+ALREADY_WAITLISTED = 'already_waitlisted'
+UNREGISTERED = 'unregistered'
+LEFT_WAITLIST = 'left_waitlist'
+NOT_REGISTERED = 'not_registered'
+# Outcome of a waitlisted student taking a freed seat
+PROMOTED = 'promoted'
+
+# Identifiers per IN (...) lookup; stays under SQLite's bound-parameter limit
+IMPORT_BATCH_SIZE = 500
+# Queries an import runs whatever its size, and per IMPORT_BATCH_SIZE identifiers
+IMPORT_FIXED_QUERIES = 10
+IMPORT_QUERIES_PER_BATCH = 5
+# Rows removed per DELETE statement (and per transaction) when purging events
+PURGE_CHUNK_SIZE = 5000
+
+
+class EventFull(Exception):
+    """Raised inside a seat allocation to roll back the registration insert"""
+
+
+def _take_seat(event_id):
+    """
+    Claim one seat with a conditional UPDATE.
+
+    The capacity check and the increment happen in a single statement, so the
+    database serializes concurrent claims on the event row and a seat can never
+    be handed out twice.
+    """
+    return Event.objects.filter(pk=event_id).with_free_seat().adjust_registration_count(1) == 1
+
+
+def _notify(event_id, student_id, outcome):
+    """Queue the student's email, and the organizer digest for changes to the seat count"""
+    tasks.send_registration_notice.delay(student_id=student_id, event_id=event_id, outcome=outcome)
+    if outcome in (REGISTERED, UNREGISTERED, PROMOTED):
+        tasks.send_organizer_digest.delay(event_id=event_id, outcome=outcome)
+
+
+def _notify_many(event_id, student_ids, outcome):
+    """_notify for several students at once, with one INSERT per task"""
+    tasks.send_registration_notice.delay_many([
+        {'student_id': student_id, 'event_id': event_id, 'outcome': outcome} for student_id in student_ids
+    ])
+    tasks.send_organizer_digest.delay_many([{'event_id': event_id, 'outcome': outcome} for _ in student_ids])
+
+
+def register_student(event, student):
+    """Register a student, or queue them on the waitlist when the event is full"""
+    try:
+        with transaction.atomic():
+            Registration.objects.create(student=student, event=event)
+            if not _take_seat(event.pk):
+                raise EventFull
+            WaitlistEntry.objects.filter(student=student, event=event).delete()
+            _notify(event.pk, student.pk, REGISTERED)
+    except IntegrityError:
+        return ALREADY_REGISTERED
+    except EventFull:
+        try:
+            with transaction.atomic():
+                WaitlistEntry.objects.create(student=student, event=event)
+                _notify(event.pk, student.pk, WAITLISTED)
+        except IntegrityError:
+            return ALREADY_WAITLISTED
+        return WAITLISTED
+    return REGISTERED
+
+
+def unregister_student(event, student):
+    """Cancel a registration or waitlist entry, promoting the waitlist if a seat frees up"""
+    registration = Registration.objects.filter(student=student, event=event).first()
+    if registration is not None:
+        with transaction.atomic():
+            # Deleting the fetched instance is a single DELETE, so the transaction
+            # opens with a write rather than a read that must later upgrade its
+            # lock (which SQLite reports as "database is locked" under load).
+            # A concurrent cancel of the same row deletes nothing here.
+            deleted, _ = registration.delete()
+            if deleted:
+                Event.objects.filter(pk=event.pk).adjust_registration_count(-1)
+                _notify(event.pk, student.pk, UNREGISTERED)
+                promote_waitlist(event)
+                return UNREGISTERED
+    with transaction.atomic():
+        deleted, _ = WaitlistEntry.objects.filter(student=student, event=event).delete()
+        if deleted:
+            _notify(event.pk, student.pk, LEFT_WAITLIST)
+    return LEFT_WAITLIST if deleted else NOT_REGISTERED
+
+
+def promote_waitlist(event):
+    """
+    Move waitlisted students into free seats in FIFO order; returns promoted student ids.
+
+    The free seats are worked out once and claimed with a single conditional
+    UPDATE, so promoting any number of students costs the same few queries.
+    """
+    with transaction.atomic():
+        state = Event.objects.filter(pk=event.pk).values_list('capacity', 'registration_count').first()
+        if state is None:
+            return []
+        capacity, count = state
+        entries = WaitlistEntry.objects.filter(event=event).order_by('created_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Concurrent promoters each take different head-of-queue entries
+            entries = entries.select_for_update(skip_locked=True)
+        if capacity is not None:
+            entries = entries[:max(capacity - count, 0)]
+        entries = list(entries.values_list('id', 'student_id'))
+        if not entries:
+            return []
+        # Claims nothing if a concurrent sign-up took any of the seats meanwhile
+        seats = Event.objects.filter(pk=event.pk).filter(
+            Q(capacity__isnull=True) | Q(registration_count__lte=F('capacity') - len(entries))
+        )
+        if not seats.adjust_registration_count(len(entries)):
+            return []
+        promoted = [student_id for _, student_id in entries]
+        WaitlistEntry.objects.filter(id__in=[entry_id for entry_id, _ in entries]).delete()
+        Registration.objects.bulk_create([Registration(student_id=student_id, event=event) for student_id in promoted])
+        _notify_many(event.pk, promoted, PROMOTED)
+        # bulk_create sends no post_save signals
+        caching.bump_on_commit([event.pk], [caching.POPULARITY_LIST])
+    return promoted
+
+
+def read_identifiers(lines):
+    """
+    Return the usernames or emails in the first column of CSV `lines`.
+
+    Blank rows and a 'username' or 'email' header row are skipped.
+    """
+    identifiers = []
+    for row in csv.reader(lines):
+        value = row[0].strip() if row else ''
+        if value and not (not identifiers and value.lower() in ('username', 'email')):
+            identifiers.append(value)
+    return identifiers
+
+
+def _resolve_students(identifiers):
+    """Map each username or email to a student id, with IN lookups of IMPORT_BATCH_SIZE"""
+    usernames = [value for value in identifiers if '@' not in value]
+    emails = [value for value in identifiers if '@' in value]
+    students = User.objects.filter(is_staff=False, is_superuser=False)
+    resolved = {}
+    for start in range(0, len(usernames), IMPORT_BATCH_SIZE):
+        batch = usernames[start:start + IMPORT_BATCH_SIZE]
+        resolved.update(students.filter(username__in=batch).values_list('username', 'id'))
+    for start in range(0, len(emails), IMPORT_BATCH_SIZE):
+        batch = emails[start:start + IMPORT_BATCH_SIZE]
+        resolved.update(students.filter(email__in=batch).values_list('email', 'id'))
+    return resolved
+
+
+def _existing_student_ids(model, event, student_ids):
+    existing = set()
+    for start in range(0, len(student_ids), IMPORT_BATCH_SIZE):
+        batch = student_ids[start:start + IMPORT_BATCH_SIZE]
+        existing.update(
+            model.objects.filter(event=event, student_id__in=batch).values_list('student_id', flat=True)
+        )
+    return existing
+
+
+def import_query_budget(rows):
+    """
+    Query budget of importing `rows` identifiers.
+
+    Every batch runs a student lookup, two signed-up checks and an insert, so
+    the cost grows with the file and no fixed view budget can cover it.
+    """
+    batches = -(-rows // IMPORT_BATCH_SIZE)
+    return IMPORT_FIXED_QUERIES + IMPORT_QUERIES_PER_BATCH * batches
+
+
+def import_registrations(event, identifiers):
+    """
+    Register a cohort of students given by username or email.
+
+    Students beyond the event's free seats join the waitlist in file order.
+    Returns counts of 'registered', 'waitlisted', 'duplicate' (already signed
+    up, or repeated in the file) and 'unknown' (no matching student account),
+    plus up to 20 of the unknown identifiers.
+    """
+    resolved = _resolve_students(identifiers)
+    unknown = []
+    student_ids = []
+    seen = set()
+    for value in identifiers:
+        student_id = resolved.get(value)
+        if student_id is None:
+            unknown.append(value)
+        elif student_id not in seen:
+            seen.add(student_id)
+            student_ids.append(student_id)
+
+    with transaction.atomic():
+        # Lock the event row so seats cannot be handed out while we count them
+        event = Event.objects.select_for_update().get(pk=event.pk)
+        signed_up = (
+            _existing_student_ids(Registration, event, student_ids)
+            | _existing_student_ids(WaitlistEntry, event, student_ids)
+        )
+        new_ids = [student_id for student_id in student_ids if student_id not in signed_up]
+        if event.capacity is None:
+            seats = len(new_ids)
+        else:
+            seats = max(0, event.capacity - event.registration_count)
+
+        before = Registration.objects.filter(event=event).count()
+        Registration.objects.bulk_create(
+            [Registration(student_id=student_id, event=event) for student_id in new_ids[:seats]],
+            batch_size=IMPORT_BATCH_SIZE, ignore_conflicts=True,
+        )
+        # Conflicts with a concurrent sign-up are skipped, so count what landed
+        registered = Registration.objects.filter(event=event).count() - before
+        Event.objects.filter(pk=event.pk).adjust_registration_count(registered)
+        WaitlistEntry.objects.bulk_create(
+            [WaitlistEntry(student_id=student_id, event=event) for student_id in new_ids[seats:]],
+            batch_size=IMPORT_BATCH_SIZE, ignore_conflicts=True,
+        )
+
+    # bulk_create sends no post_save signals
+    caching.bump_event_version(event.pk)
+    caching.bump_list_version(caching.POPULARITY_LIST)
+    return {
+        'registered': registered,
+        'waitlisted': max(0, len(new_ids) - seats),
+        'duplicate': len(identifiers) - len(unknown) - len(new_ids),
+        'unknown': len(unknown),
+        'unknown_sample': unknown[:20],
+    }
+
+
+def delete_event(event, notify_students=False):
+    """
+    Delete an event without waiting for its registrations to be removed.
+
+    The event is tombstoned with deleted_at, which hides it from every page at
+    once, and a purge_event job removes the rows in chunks. With
+    notify_students, that job emails the registered students before it
+    deletes their registrations.
+    """
+    cancellation = None
+    if notify_students:
+        cancellation = {'title': event.title, 'date': event.date.strftime('%b %d, %Y %H:%M')}
+    with transaction.atomic():
+        Event.all_objects.filter(pk=event.pk, deleted_at__isnull=True).update(deleted_at=timezone.now())
+        tasks.purge_event.delay(event_id=event.pk, cancellation=cancellation)
+    caching.bump_event_version(event.pk)
+    caching.bump_list_version(caching.EVENTS_LIST, caching.POPULARITY_LIST)
+
+
+def _delete_in_chunks(queryset, chunk_size):
+    deleted = 0
+    while True:
+        # One short transaction per chunk, so writers are never blocked for long
+        with transaction.atomic():
+            ids = list(queryset.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            # A plain DELETE: no per-row collection, signals or cascade queries
+            deleted += queryset.model.objects.filter(id__in=ids)._raw_delete(queryset.db)
+
+
+def purge_event(event_id, chunk_size=PURGE_CHUNK_SIZE):
+    """
+    Remove an event, its registrations and waitlist with chunked DELETEs.
+
+    Unlike Model.delete(), the related rows are never loaded into Python.
+    Returns the number of rows removed.
+    """
+    deleted = _delete_in_chunks(WaitlistEntry.objects.filter(event_id=event_id), chunk_size)
+    deleted += _delete_in_chunks(Registration.objects.filter(event_id=event_id), chunk_size)
+    with transaction.atomic():
+        events = Event.all_objects.filter(pk=event_id)
+        deleted += events._raw_delete(events.db)
+        # Keep deleted events out of the dashboards' top events
+        Rollup.objects.filter(dimension=Rollup.EVENT, key=str(event_id)).delete()
+    # The raw deletes send no post_delete signals
+    caching.bump_event_version(event_id)
+    caching.bump_list_version(caching.EVENTS_LIST, caching.POPULARITY_LIST)
+    return deleted
+
+
+def release_student(student):
+    """
+    Remove all of a student's registrations and waitlist entries, freeing their seats.
+
+    A student holds at most one seat per event, so every event they leave
+    loses one registration: the counters drop with a single UPDATE, and only
+    events with someone waiting are promoted. Returns the affected event ids.
+    """
+    registrations = Registration.objects.filter(student=student)
+    waitlist = WaitlistEntry.objects.filter(student=student)
+    with transaction.atomic():
+        event_ids = list(registrations.values_list('event_id', flat=True))
+        Event.all_objects.filter(pk__in=registrations.values('event_id')).adjust_registration_count(-1)
+        waitlist._raw_delete(waitlist.db)
+        waiting = list(Event.objects.filter(registrations__student=student, waitlist_entries__isnull=False).distinct())
+        registrations._raw_delete(registrations.db)
+        for event in waiting:
+            promote_waitlist(event)
+        # The raw deletes send no post_delete signals
+        caching.bump_on_commit(event_ids, [caching.POPULARITY_LIST])
+    return event_ids
+
+
+def delete_organizer(user, chunk_size=PURGE_CHUNK_SIZE):
+    """
+    Delete a user, purging the events they organize first.
+
+    Left to User.delete(), the cascade would load every event and every one of
+    their registrations into memory, and the user's own registrations would
+    vanish without freeing their seats or promoting the waitlists.
+    """
+    event_ids = list(Event.all_objects.filter(organizer=user).values_list('id', flat=True))
+    for event_id in event_ids:
+        purge_event(event_id, chunk_size)
+    release_student(user)
+    user.delete()
@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import budgets, caching, metrics
+from .auth_backends import user_cache_key
+from .models import Event, Registration
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event(sender, instance, **kwargs):
+    """An event changed: drop its fragments and every listing page"""
+    caching.bump_on_commit([instance.pk], [caching.EVENTS_LIST, caching.POPULARITY_LIST])
+
+
+@receiver(post_save, sender=Registration)
+@receiver(post_delete, sender=Registration)
+def invalidate_registration(sender, instance, **kwargs):
+    """A registration changed: the event's count and the popularity order moved"""
+    caching.bump_on_commit([instance.event_id], [caching.POPULARITY_LIST])
+
+
+@receiver(post_save, sender=User)
+def invalidate_organizer(sender, instance, created, update_fields, **kwargs):
+    """Organizer names are rendered into event fragments"""
+    # Skip new users and the last_login update made on every login
+    if created or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    event_ids = list(Event.objects.filter(organizer=instance).values_list('id', flat=True))
+    if event_ids:
+        caching.bump_on_commit(event_ids, [caching.PAGES])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    """Password, permission and profile changes must reach authenticated requests at once"""
+    cache.delete(user_cache_key(instance.pk))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Let PerformanceMiddleware and query budgets count the queries on every connection"""
+    metrics.instrument(connection)
+    budgets.instrument(connection)
@@ -0,0 +1,126 @@
+"""
+Background tasks queued by the views; run by the run_worker command.
+
+Tasks take ids rather than objects and re-read their rows, since the data may
+have changed or gone by the time a worker picks the job up.
+"""
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core.mail import get_connection, send_mail, send_mass_mail
+
+from . import caching, jobs, services
+from .models import Event, Registration
+
+NOTICES = {
+    'registered': ('You are registered for {title}', 'You are registered for "{title}" on {date} at {location}.'),
+    'waitlisted': ('You are on the waitlist for {title}', '"{title}" is full. You are on the waitlist and will be registered automatically if a seat frees up.'),
+    'promoted': ('A seat opened up for {title}', 'A seat opened up and you are now registered for "{title}" on {date} at {location}.'),
+    'unregistered': ('Registration cancelled for {title}', 'Your registration for "{title}" has been cancelled.'),
+    'left_waitlist': ('You left the waitlist for {title}', 'You are no longer on the waitlist for "{title}".'),
+}
+# Recipients per SMTP connection when mailing every registered student
+MAIL_CHUNK_SIZE = 500
+
+
+def _event_context(event):
+    return {
+        'title': event.title,
+        'date': event.date.strftime('%b %d, %Y %H:%M'),
+        'location': event.location,
+    }
+
+
+@jobs.task()
+def send_registration_notice(student_id, event_id, outcome):
+    """Email a student about a change to their registration"""
+    student = User.objects.filter(pk=student_id).first()
+    event = Event.objects.filter(pk=event_id).first()
+    if student is None or event is None or not student.email:
+        return
+    subject, body = NOTICES[outcome]
+    context = _event_context(event)
+    send_mail(subject.format(**context), body.format(**context), None, [student.email])
+
+
+@jobs.task(batch=True)
+def send_organizer_digest(payloads):
+    """Email each organizer one summary of the sign-ups and cancellations in the batch"""
+    changes = defaultdict(lambda: defaultdict(int))
+    for payload in payloads:
+        changes[payload['event_id']][payload['outcome']] += 1
+
+    events = Event.objects.select_related('organizer').in_bulk(list(changes))
+    lines_by_organizer = defaultdict(list)
+    for event_id, counts in changes.items():
+        event = events.get(event_id)
+        if event is None or not event.organizer.email:
+            continue
+        summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(counts.items()))
+        lines_by_organizer[event.organizer.email].append(
+            f'- {event.title}: {summary} (now {event.registration_count} registered)'
+        )
+
+    send_mass_mail([
+        ('Registration activity for your events', '\n'.join(lines), None, [email])
+        for email, lines in lines_by_organizer.items()
+    ])
+
+
+def _mail_students(emails, subject, body):
+    connection = get_connection()
+    batch = []
+    for email in emails:
+        batch.append((subject, body, None, [email]))
+        if len(batch) == MAIL_CHUNK_SIZE:
+            send_mass_mail(batch, connection=connection)
+            batch = []
+    if batch:
+        send_mass_mail(batch, connection=connection)
+
+
+@jobs.task()
+def notify_event_updated(event_id):
+    """Email every registered student that the event details changed"""
+    event = Event.objects.filter(pk=event_id).first()
+    if event is None:
+        return
+    context = _event_context(event)
+    emails = (
+        Registration.objects.filter(event_id=event_id).exclude(student__email='')
+        .values_list('student__email', flat=True).iterator(chunk_size=MAIL_CHUNK_SIZE)
+    )
+    _mail_students(
+        emails,
+        f'Updated: {event.title}',
+        'The details of "{title}" have changed. It now takes place on {date} at {location}.'.format(**context),
+    )
+
+
+@jobs.task()
+def notify_event_cancelled(event_id, title, date):
+    """Email the students of a deleted event, streaming their addresses from its registrations"""
+    emails = (
+        Registration.objects.filter(event_id=event_id).exclude(student__email='')
+        .values_list('student__email', flat=True).iterator(chunk_size=MAIL_CHUNK_SIZE)
+    )
+    _mail_students(emails, f'Cancelled: {title}', f'"{title}" on {date} has been cancelled.')
+
+
+@jobs.task()
+def warm_event_cache(event_id):
+    """Re-render an edited event's cached object and fragments before readers ask for them"""
+    if caching.get_event(event_id) is None:
+        return
+    for template_name in ('main/includes/event_card.html', 'main/includes/event_row.html'):
+        caching.render_event_fragments(template_name, [event_id])
+
+
+@jobs.task()
+def purge_event(event_id, cancellation=None):
+    """Remove a deleted event and its registrations in chunks, first emailing its students if asked"""
+    # The notices read the registrations this job deletes, so they are sent
+    # here rather than from a separate job that could run after the purge
+    if cancellation:
+        notify_event_cancelled(event_id=event_id, **cancellation)
+    services.purge_event(event_id)
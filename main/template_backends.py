@@ -0,0 +1,40 @@
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+from . import metrics
+
+
+class TimedTemplate:
+    """Backend template wrapper that adds its render time to the request metrics"""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        request_metrics = metrics.current()
+        if request_metrics is None:
+            return self._template.render(context, request)
+
+        # Only the outermost render is timed so nested renders are not counted twice
+        request_metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            request_metrics.template_depth -= 1
+            if request_metrics.template_depth == 0:
+                request_metrics.template_ms += (time.perf_counter() - start) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend whose templates report render time to PerformanceMiddleware"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -1,9 +1,32 @@
-from django.test import TestCase, Client
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, AsyncClient, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib import admin
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
 from django.urls import reverse
 from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from .models import Event, Registration
+from io import StringIO
+import os
+import random
+import re
+import shutil
+import tempfile
+import gzip
+import json
+import time
+import unittest.mock
+from .budgets import QueryBudgetTestMixin
+from .context_processors import registered_event_ids
+from .models import Event, Job, Registration, Rollup, WaitlistEntry
+from . import analytics, benchmarks, budgets, caching, ical, jobs, metrics, search, seeding, services
 
 
 class EventModelTest(TestCase):
@@ -124,3 +147,1650 @@ class ViewsTest(TestCase):
         self.client.login(username='testorganizer', password='testpass123')
         response = self.client.get(reverse('dashboard'))
         self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class ListingQueryCountTest(TestCase):
+    """Test that event listings use a fixed number of queries"""
+
+    def setUp(self):
+        self.client = Client()
+        self.organizer = User.objects.create_user(
+            username='testorganizer',
+            password='testpass123',
+            is_staff=True
+        )
+        self.students = [
+            User.objects.create_user(username=f'student{i}', password='testpass123')
+            for i in range(3)
+        ]
+
+    def create_events(self, count):
+        for i in range(count):
+            event = Event.objects.create(
+                title=f'Event {i}',
+                description='Test Description',
+                date=timezone.now() + timedelta(days=i + 1),
+                location='Test Location',
+                organizer=self.organizer
+            )
+            for student in self.students:
+                Registration.objects.create(student=student, event=event)
+        Event.objects.refresh_registration_counts()
+
+    def test_stored_count_is_used(self):
+        """Test registered_students_count reads the stored counter without a query"""
+        self.create_events(1)
+        event = Event.objects.with_listing_data().get()
+        with self.assertNumQueries(0):
+            self.assertEqual(event.registered_students_count(), 3)
+            self.assertEqual(event.organizer, self.organizer)
+
+    def test_home_query_count_is_constant(self):
+        """Test home page query count does not grow with the number of events"""
+        self.create_events(1)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('home'))
+        self.create_events(10)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, '3 students')
+
+    def test_dashboard_query_count_is_constant(self):
+        """Test dashboard query count does not grow with the number of events"""
+        self.client.login(username='testorganizer', password='testpass123')
+        self.create_events(1)
+        self.client.get(reverse('dashboard'))
+        # Session, user, events, then the rollup watermark and daily counts
+        with self.assertNumQueries(5):
+            self.client.get(reverse('dashboard'))
+        self.create_events(10)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('dashboard'))
+
+
+class KeysetPaginationTest(TestCase):
+    """Test cases for keyset pagination of event listings"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.organizer = User.objects.create_user(
+            username='testorganizer',
+            password='testpass123',
+            is_staff=True
+        )
+        same_date = timezone.now() + timedelta(days=3)
+        for i in range(7):
+            # Several events share a date to exercise the id tie-breaker
+            date = same_date if i < 3 else timezone.now() + timedelta(days=i + 1)
+            Event.objects.create(
+                title=f'Upcoming {i}', description='Test Description', date=date,
+                location='Test Location', organizer=self.organizer
+            )
+        for i in range(2):
+            Event.objects.create(
+                title=f'Past {i}', description='Test Description',
+                date=timezone.now() - timedelta(days=i + 1),
+                location='Test Location', organizer=self.organizer
+            )
+
+    def collect_pages(self, url, when):
+        seen = []
+        params = {'when': when, 'size': 2}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(event.id for event in response.context['events'])
+            page = response.context['page']
+            if not page.has_next():
+                return seen
+            params['after'] = page.next_cursor
+
+    def test_upcoming_pages_cover_all_events_in_order(self):
+        """Test walking upcoming pages returns each event once in date order"""
+        seen = self.collect_pages(reverse('home'), 'upcoming')
+        expected = list(Event.objects.upcoming().order_by('date', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_past_slice(self):
+        """Test past slice lists past events newest first"""
+        seen = self.collect_pages(reverse('home'), 'past')
+        expected = list(Event.objects.past().order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_dashboard_pagination(self):
+        """Test organizer dashboard pages through the organizer's events"""
+        self.client.login(username='testorganizer', password='testpass123')
+        seen = self.collect_pages(reverse('dashboard'), 'upcoming')
+        self.assertEqual(len(seen), 7)
+
+    def test_deep_page_does_not_use_offset(self):
+        """Test later pages seek by key instead of scanning with OFFSET"""
+        response = self.client.get(reverse('home'), {'size': 2})
+        cursor = response.context['page'].next_cursor
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('home'), {'size': 2, 'after': cursor})
+        self.assertNotIn('OFFSET', ctx.captured_queries[-1]['sql'].upper())
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor returns 404"""
+        response = self.client.get(reverse('home'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class RegistrationCounterTest(TestCase):
+    """Test cases for the denormalized Event.registration_count"""
+
+    def setUp(self):
+        self.client = Client()
+        self.student = User.objects.create_user(
+            username='teststudent',
+            password='testpass123'
+        )
+        self.organizer = User.objects.create_user(
+            username='testorganizer',
+            password='testpass123',
+            is_staff=True
+        )
+        self.event = Event.objects.create(
+            title='Test Event',
+            description='Test Description',
+            date=timezone.now() + timedelta(days=7),
+            location='Test Location',
+            organizer=self.organizer
+        )
+
+    def test_register_and_unregister_update_counter(self):
+        """Test the counter follows register/unregister, including duplicates"""
+        self.client.login(username='teststudent', password='testpass123')
+        url = reverse('register_for_event', args=[self.event.id])
+        self.client.post(url)
+        self.client.post(url)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 1)
+
+        url = reverse('unregister_from_event', args=[self.event.id])
+        self.client.post(url)
+        self.client.post(url)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        """Test reconcile_registration_counts recomputes drifted counters"""
+        Registration.objects.create(student=self.student, event=self.event)
+        Event.objects.filter(pk=self.event.pk).update(registration_count=5)
+        out = StringIO()
+        call_command('reconcile_registration_counts', batch_size=1, stdout=out)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 1)
+        self.assertIn('Fixed 1 drifted', out.getvalue())
+
+    def test_popular_sort(self):
+        """Test sorting by popularity orders on the stored counter"""
+        busy = Event.objects.create(
+            title='Busy Event', description='Test Description',
+            date=timezone.now() + timedelta(days=9), location='Test Location',
+            organizer=self.organizer
+        )
+        Event.objects.filter(pk=busy.pk).adjust_registration_count(10)
+        response = self.client.get(reverse('home'), {'sort': 'popular'})
+        self.assertEqual([e.id for e in response.context['events']], [busy.id, self.event.id])
+
+
+class CapacityTest(TestCase):
+    """Test cases for event capacity and the waitlist"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            username='testorganizer',
+            password='testpass123',
+            is_staff=True
+        )
+        self.students = [
+            User.objects.create_user(username=f'student{i}', password='testpass123')
+            for i in range(4)
+        ]
+        self.event = Event.objects.create(
+            title='Small Event',
+            description='Test Description',
+            date=timezone.now() + timedelta(days=7),
+            location='Test Location',
+            organizer=self.organizer,
+            capacity=2
+        )
+
+    def test_full_event_waitlists_in_order(self):
+        """Test students beyond capacity are queued first come, first served"""
+        outcomes = [services.register_student(self.event, s) for s in self.students]
+        self.assertEqual(outcomes, [
+            services.REGISTERED, services.REGISTERED, services.WAITLISTED, services.WAITLISTED
+        ])
+        self.assertEqual(services.register_student(self.event, self.students[3]), services.ALREADY_WAITLISTED)
+        entries = list(WaitlistEntry.objects.filter(event=self.event))
+        self.assertEqual([e.student for e in entries], self.students[2:])
+        self.assertEqual([e.position() for e in entries], [1, 2])
+
+    def test_unregister_promotes_waitlist(self):
+        """Test a freed seat goes to the head of the waitlist"""
+        for student in self.students:
+            services.register_student(self.event, student)
+        self.assertEqual(services.unregister_student(self.event, self.students[0]), services.UNREGISTERED)
+        self.assertTrue(Registration.objects.filter(event=self.event, student=self.students[2]).exists())
+        self.assertEqual(list(WaitlistEntry.objects.values_list('student', flat=True)), [self.students[3].id])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 2)
+
+    def test_leave_waitlist(self):
+        """Test unregistering while waitlisted removes the waitlist entry"""
+        for student in self.students[:3]:
+            services.register_student(self.event, student)
+        self.assertEqual(services.unregister_student(self.event, self.students[2]), services.LEFT_WAITLIST)
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_raising_capacity_promotes_waitlist(self):
+        """Test editing the capacity upwards fills the new seats from the waitlist"""
+        for student in self.students:
+            services.register_student(self.event, student)
+        self.client.login(username='testorganizer', password='testpass123')
+        self.client.post(reverse('edit_event', args=[self.event.id]), {
+            'title': self.event.title,
+            'description': self.event.description,
+            'date': (timezone.now() + timedelta(days=7)).strftime('%Y-%m-%dT%H:%M'),
+            'location': self.event.location,
+            'capacity': 3,
+        })
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.capacity, 3)
+        self.assertEqual(self.event.registration_count, 3)
+        self.assertEqual(WaitlistEntry.objects.count(), 1)
+
+    @override_settings(JOBS_EAGER=False)
+    def test_promotion_cost_does_not_grow_with_the_queue(self):
+        """Test promoting three students takes as many queries as promoting one"""
+        User.objects.bulk_create([User(username=f'extra{i}') for i in range(2)])
+        for student in [*self.students, *User.objects.filter(username__startswith='extra')]:
+            services.register_student(self.event, student)
+        costs = []
+        for capacity in (3, 6):
+            Event.objects.filter(pk=self.event.pk).update(capacity=capacity)
+            with CaptureQueriesContext(connection) as ctx:
+                promoted = services.promote_waitlist(self.event)
+            costs.append((len(promoted), len(ctx)))
+        self.assertEqual(costs[0][0], 1)
+        self.assertEqual(costs[1][0], 3)
+        self.assertEqual(costs[0][1], costs[1][1])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, Registration.objects.filter(event=self.event).count())
+        self.assertEqual(self.event.registration_count, 6)
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertEqual(Job.objects.filter(name='main.tasks.send_registration_notice', payload__outcome='promoted').count(), 4)
+
+
+class ConcurrentRegistrationTest(TransactionTestCase):
+    """Stress test seat allocation with parallel sign-ups"""
+
+    def test_parallel_registrations_never_oversell(self):
+        """Test concurrent registrations fill exactly the capacity and queue the rest"""
+        organizer = User.objects.create_user(username='testorganizer', is_staff=True)
+        User.objects.bulk_create([User(username=f'student{i}') for i in range(40)])
+        students = list(User.objects.filter(is_staff=False))
+        event = Event.objects.create(
+            title='Popular Event', description='Test Description',
+            date=timezone.now() + timedelta(days=7), location='Test Location',
+            organizer=organizer, capacity=10
+        )
+
+        def attempt(student):
+            try:
+                return services.register_student(event, student)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            outcomes = list(pool.map(attempt, students))
+
+        event.refresh_from_db()
+        self.assertEqual(outcomes.count(services.REGISTERED), 10)
+        self.assertEqual(outcomes.count(services.WAITLISTED), 30)
+        self.assertEqual(event.registration_count, 10)
+        self.assertEqual(Registration.objects.filter(event=event).count(), 10)
+        self.assertEqual(WaitlistEntry.objects.filter(event=event).count(), 30)
+
+        # Cancelling in parallel must keep the event exactly full
+        registered = [r.student for r in Registration.objects.filter(event=event)]
+
+        def cancel(student):
+            try:
+                return services.unregister_student(event, student)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(cancel, registered[:5]))
+
+        event.refresh_from_db()
+        self.assertEqual(event.registration_count, 10)
+        self.assertEqual(Registration.objects.filter(event=event).count(), 10)
+        self.assertEqual(WaitlistEntry.objects.filter(event=event).count(), 25)
+
+
+class DatabaseProfileTest(TransactionTestCase):
+    """Test the tuned SQLite connection profile"""
+
+    def test_connection_pragmas(self):
+        """Test new connections run the configured PRAGMAs"""
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)
+            self.assertGreater(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 0)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_read_then_write_transactions_do_not_lock(self):
+        """Test concurrent transactions that read before writing queue instead of failing"""
+        organizer = User.objects.create_user(username='testorganizer', is_staff=True)
+        User.objects.bulk_create([User(username=f'student{i}') for i in range(8)])
+        event = Event.objects.create(
+            title='Test Event', description='Test Description',
+            date=timezone.now() + timedelta(days=7), location='Test Location', organizer=organizer
+        )
+
+        def read_then_write(student):
+            try:
+                with transaction.atomic():
+                    Registration.objects.filter(event=event).exists()
+                    time.sleep(0.02)
+                    Registration.objects.create(student=student, event=event)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(read_then_write, User.objects.filter(is_staff=False)))
+        self.assertEqual(Registration.objects.filter(event=event).count(), 8)
+
+
+class BenchmarkQueriesCommandTest(TestCase):
+    """Smoke test for the benchmark_queries command"""
+
+    def test_benchmark_leaves_database_untouched(self):
+        """Test the benchmark prints plans and rolls back its seeded data"""
+        out = StringIO()
+        call_command(
+            'benchmark_queries', students=20, events=50, registrations=100, repeat=1, stdout=out
+        )
+        self.assertIn('Summary', out.getvalue())
+        self.assertFalse(Event.objects.exists())
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, 'main_event')
+        self.assertIn('event_date_id_idx', constraints)
+
+
+class IndexTest(TestCase):
+    """Test cases for the indexes behind the hot queries"""
+
+    def test_foreign_keys_rely_on_composite_indexes(self):
+        """Test no foreign key keeps a single-column index that a composite one already covers"""
+        with connection.cursor() as cursor:
+            for table, column in (('main_event', 'organizer_id'), ('main_registration', 'event_id'),
+                                  ('main_registration', 'student_id'), ('main_waitlistentry', 'event_id'),
+                                  ('main_waitlistentry', 'student_id')):
+                indexes = [
+                    constraint['columns'] for constraint in connection.introspection.get_constraints(cursor, table).values()
+                    if constraint['index'] and constraint['columns'] and constraint['columns'][0] == column
+                ]
+                self.assertNotIn([column], indexes, table)
+                self.assertTrue(indexes, table)
+
+
+class BenchmarkSuiteTest(TestCase):
+    """Smoke tests for the run_benchmarks command and its regression check"""
+
+    def test_every_url_is_benchmarked(self):
+        """Test the results cover every URL name in main/urls.py except the skipped ones"""
+        from .urls import urlpatterns
+        output = os.path.join(tempfile.mkdtemp(), 'results.json')
+        call_command('run_benchmarks', sizes=['tiny'], repeat=1, output=output, stdout=StringIO())
+        results = benchmarks.load_results(output)
+        self.assertEqual(
+            {row['url_name'] for row in results},
+            {pattern.name for pattern in urlpatterns} - set(benchmarks.SKIPPED)
+        )
+        self.assertTrue(all(row['status'] < 400 for row in results))
+        self.assertFalse(Event.objects.exists())
+        # Only the request is counted, not the untimed preparation before it
+        budgets_by_name = {pattern.name: pattern.callback.query_budget for pattern in urlpatterns}
+        for row in results:
+            self.assertLessEqual(row['queries'], budgets_by_name[row['url_name']], row['name'])
+
+    def test_regressions_fail_the_run(self):
+        """Test slower medians beyond the threshold and extra queries are regressions"""
+        baseline = [{'size': 'small', 'name': 'home', 'median_ms': 10.0, 'queries': 1}]
+        self.assertEqual(benchmarks.compare([dict(baseline[0], median_ms=12.0)], baseline, 0.25), [])
+        self.assertEqual(len(benchmarks.compare([dict(baseline[0], median_ms=13.0)], baseline, 0.25)), 1)
+        self.assertEqual(len(benchmarks.compare([dict(baseline[0], queries=2)], baseline, 0.25)), 1)
+
+        output = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        benchmarks.write_results(output, [{'size': 'tiny', 'name': 'dashboard (organizer)', 'median_ms': 1000, 'queries': 0}])
+        with self.assertRaisesMessage(CommandError, 'dashboard (organizer): queries 0 ->'):
+            call_command('run_benchmarks', sizes=['tiny'], repeat=1, baseline=output, stdout=StringIO())
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE=False)
+class EventCachingTest(TestCase):
+    """Test cases for cached event pages, fragments and invalidation"""
+
+    def setUp(self):
+        cache.clear()
+        caching.reset_cache_stats()
+        self.client = Client()
+        self.student = User.objects.create_user(
+            username='teststudent',
+            password='testpass123'
+        )
+        self.organizer = User.objects.create_user(
+            username='testorganizer',
+            password='testpass123',
+            is_staff=True
+        )
+        self.event = Event.objects.create(
+            title='Test Event',
+            description='Test Description',
+            date=timezone.now() + timedelta(days=7),
+            location='Test Location',
+            organizer=self.organizer
+        )
+
+    def test_warm_home_page_skips_database(self):
+        """Test a repeated home page request is served from cache"""
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Test Event')
+        stats = caching.cache_stats()
+        self.assertEqual(stats['list_hits'], 1)
+        self.assertEqual(stats['fragment_hits'], 1)
+
+    @override_settings(CACHE_VERSION_TIMEOUT=60)
+    def test_version_tokens_expire(self):
+        """Test tokens minted for unknown event ids are stored with a finite timeout"""
+        with unittest.mock.patch.object(caching.cache, 'set_many', wraps=caching.cache.set_many) as set_many:
+            self.assertEqual(Client().get(reverse('api_event_detail', args=[99999])).status_code, 404)
+            caching.bump_event_version(self.event.id)
+            caching.bump_list_version(caching.EVENTS_LIST)
+        self.assertIn('event:99999:version', set_many.call_args_list[0].args[0])
+        self.assertTrue(all(call.args[1] == 60 for call in set_many.call_args_list))
+
+    def test_versions_change_when_the_write_commits(self):
+        """Test readers racing an open write transaction keep the old version token"""
+        before = caching.event_versions([self.event.id])[self.event.id]
+        with self.captureOnCommitCallbacks(execute=True):
+            services.register_student(self.event, self.student)
+            self.assertEqual(caching.event_versions([self.event.id])[self.event.id], before)
+        self.assertNotEqual(caching.event_versions([self.event.id])[self.event.id], before)
+
+    def test_registration_invalidates_only_that_event(self):
+        """Test a sign-up re-renders the event's card with the new count"""
+        other = Event.objects.create(
+            title='Other Event', description='Test Description',
+            date=timezone.now() + timedelta(days=8), location='Test Location',
+            organizer=self.organizer
+        )
+        self.client.get(reverse('home'))
+        self.assertContains(self.client.get(reverse('home')), '0 students')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.register_student(self.event, self.student)
+        caching.reset_cache_stats()
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '1 student')
+        stats = caching.cache_stats()
+        self.assertEqual(stats['fragment_misses'], 1)
+        self.assertEqual(stats['fragment_hits'], 1)
+        self.assertIn(other.id, [fragment.id for fragment in response.context['events']])
+
+    def test_edit_and_delete_invalidate_pages(self):
+        """Test editing and deleting an event are reflected immediately"""
+        self.client.get(reverse('home'))
+        self.client.get(reverse('event_detail', args=[self.event.id]))
+        self.event.title = 'Renamed Event'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        self.assertContains(self.client.get(reverse('home')), 'Renamed Event')
+        self.assertContains(self.client.get(reverse('event_detail', args=[self.event.id])), 'Renamed Event')
+
+        event_id = self.event.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.delete()
+        self.assertNotContains(self.client.get(reverse('home')), 'Renamed Event')
+        self.assertEqual(self.client.get(reverse('event_detail', args=[event_id])).status_code, 404)
+
+    def test_cache_stats_is_staff_only(self):
+        """Test the cache stats endpoint requires a staff account"""
+        self.client.login(username='teststudent', password='testpass123')
+        self.assertEqual(self.client.get(reverse('cache_stats')).status_code, 302)
+        self.client.login(username='testorganizer', password='testpass123')
+        response = self.client.get(reverse('cache_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json(), dict)
+
+
+class SeedingCommandTest(TestCase):
+    """Test cases for the bulk seeding commands"""
+
+    def test_populate_data_is_consistent_and_deterministic(self):
+        """Test populate_data sizes, stored counters and seed reproducibility"""
+        call_command('populate_data', users=8, events=10, registrations=40, seed=7, stdout=StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='student').count(), 8)
+        self.assertEqual(Event.objects.count(), 10)
+        first_run = list(Event.objects.order_by('id').values_list('title', 'location', 'registration_count'))
+        for event in Event.objects.with_actual_registration_count():
+            self.assertEqual(event.registration_count, event.actual_registration_count)
+
+        # Users are reused on a second run; the same seed yields the same events
+        call_command('populate_data', users=8, events=10, registrations=40, seed=7, stdout=StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='student').count(), 8)
+        second_run = list(Event.objects.order_by('id').values_list('title', 'location', 'registration_count'))[10:]
+        self.assertEqual(first_run, second_run)
+
+    def test_registration_total_is_exact(self):
+        """Test the requested number of registrations is created when the events can seat them"""
+        counts = seeding.seed_dataset(students=50, events=30, registrations=437, seed=3)
+        self.assertEqual(counts['registrations'], 437)
+        self.assertEqual(Registration.objects.count(), 437)
+        self.assertEqual(sum(Event.objects.values_list('registration_count', flat=True)), 437)
+        # More than the events can seat fills every event
+        self.assertEqual(sum(seeding._registration_counts(random.Random(0), 3, 100, 10)), 30)
+
+    def test_create_sample_data_is_idempotent(self):
+        """Test create_sample_data can run twice without duplicating rows"""
+        call_command('create_sample_data', stdout=StringIO())
+        call_command('create_sample_data', stdout=StringIO())
+        self.assertEqual(Event.objects.count(), 6)
+        self.assertEqual(Registration.objects.count(), 6)
+        self.assertTrue(User.objects.get(username='student').check_password('student123'))
+        self.assertEqual(sum(Event.objects.values_list('registration_count', flat=True)), 6)
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE=False)
+class PerformanceMiddlewareTest(TestCase):
+    """Test cases for request performance instrumentation"""
+
+    def setUp(self):
+        metrics.reset()
+        self.client = Client()
+        self.organizer = User.objects.create_user(
+            username='testorganizer',
+            password='testpass123',
+            is_staff=True
+        )
+        self.event = Event.objects.create(
+            title='Test Event',
+            description='Test Description',
+            date=timezone.now() + timedelta(days=7),
+            location='Test Location',
+            organizer=self.organizer
+        )
+
+    def test_server_timing_header_and_rolling_stats(self):
+        """Test sampled requests get Server-Timing and feed the per-view percentiles"""
+        response = self.client.get(reverse('event_detail', args=[self.event.id]))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        self.client.get(reverse('event_detail', args=[self.event.id]))
+
+        report = metrics.snapshot()
+        self.assertEqual(report['event_detail']['requests'], 2)
+        self.assertGreater(report['event_detail']['template_ms']['p50'], 0)
+        self.assertGreater(report['event_detail']['response_bytes']['p99'], 0)
+
+    def test_query_count_is_recorded(self):
+        """Test the recorded query count matches the queries actually run"""
+        self.client.login(username='testorganizer', password='testpass123')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('my_events'))
+        self.assertEqual(metrics.snapshot()['my_events']['db_queries']['p50'], len(ctx.captured_queries))
+
+    @override_settings(PERF_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_measured(self):
+        """Test requests outside the sample rate skip instrumentation"""
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_request_stats_is_staff_only(self):
+        """Test the request stats endpoint requires a staff account"""
+        self.assertEqual(self.client.get(reverse('request_stats')).status_code, 302)
+        self.client.login(username='testorganizer', password='testpass123')
+        self.client.get(reverse('home'))
+        self.assertIn('home', self.client.get(reverse('request_stats')).json())
+
+
+class EventSearchTest(TestCase):
+    """Test cases for full-text event search"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        self.other = User.objects.create_user(username='otherorganizer', password='testpass123', is_staff=True)
+        now = timezone.now()
+        self.workshop = Event.objects.create(
+            title='Python Workshop', description='Hands-on coding session',
+            date=now + timedelta(days=3), location='Lab 1', organizer=self.organizer
+        )
+        self.talk = Event.objects.create(
+            title='Career Talk', description='Using Python in industry',
+            date=now + timedelta(days=10), location='Main Hall', organizer=self.other
+        )
+        self.social = Event.objects.create(
+            title='Games Night', description='Board games and snacks',
+            date=now + timedelta(days=20), location='Python Lounge', organizer=self.organizer
+        )
+
+    def test_title_matches_rank_first(self):
+        """Test a title match outranks location and description matches"""
+        ids = search.search_event_ids('python')
+        self.assertEqual(ids[0], self.workshop.id)
+        self.assertCountEqual(ids, [self.workshop.id, self.talk.id, self.social.id])
+
+    def test_prefix_and_all_terms_must_match(self):
+        """Test terms are prefix matched and combined with AND"""
+        self.assertEqual(search.search_event_ids('work'), [self.workshop.id])
+        self.assertEqual(search.search_event_ids('pyth industry'), [self.talk.id])
+        self.assertEqual(search.search_event_ids('"OR* ('), [])
+
+    def test_date_range_and_organizer_filters(self):
+        """Test date and organizer filters narrow the ranked results"""
+        now = timezone.now()
+        ids = search.search_event_ids('python', start=now + timedelta(days=5), end=now + timedelta(days=15))
+        self.assertEqual(ids, [self.talk.id])
+        ids = search.search_event_ids('python', organizer_id=self.organizer.id)
+        self.assertEqual(ids, [self.workshop.id, self.social.id])
+
+    def test_older_title_match_outranks_newer_matches(self):
+        """Test the best title match is found however many newer events match elsewhere"""
+        for i in range(25):
+            Event.objects.create(
+                title=f'Session {i}', description='More python practice',
+                date=timezone.now() + timedelta(days=30), location='Lab 2', organizer=self.other
+            )
+        ids = search.search_event_ids('python', limit=5)
+        self.assertEqual(ids[0], self.workshop.id)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(search.search_event_ids('python workshop', limit=5), [self.workshop.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test the index stays in sync with edited and deleted events"""
+        self.social.title = 'Quiz Night'
+        self.social.location = 'Student Union'
+        self.social.save()
+        self.assertEqual(search.search_event_ids('quiz'), [self.social.id])
+        self.assertNotIn(self.social.id, search.search_event_ids('python'))
+
+        workshop_id = self.workshop.id
+        self.workshop.delete()
+        self.assertNotIn(workshop_id, search.search_event_ids('python'))
+
+    def test_search_view(self):
+        """Test the search page renders ranked results and rejects bad ranges"""
+        response = Client().get(reverse('search_events'), {'q': 'python', 'organizer': self.organizer.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Python Workshop')
+        self.assertNotContains(response, 'Career Talk')
+
+        response = Client().get(reverse('search_events'), {'q': 'python', 'start': '2030-02-01', 'end': '2030-01-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['events'], [])
+
+
+class AsyncViewsTest(TestCase):
+    """Test cases for the async read views served through the ASGI handler"""
+
+    def setUp(self):
+        metrics.reset()
+        self.client = AsyncClient()
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        self.student = User.objects.create_user(username='teststudent', password='testpass123')
+        self.event = Event.objects.create(
+            title='Test Event',
+            description='Test Description',
+            date=timezone.now() + timedelta(days=7),
+            location='Test Location',
+            organizer=self.organizer,
+            capacity=1
+        )
+
+    def request(self, method, url):
+        async def send():
+            return await getattr(self.client, method)(url)
+        return async_to_sync(send)()
+
+    def get(self, url):
+        return self.request('get', url)
+
+    def test_read_views(self):
+        """Test the async read views render for the right users"""
+        self.assertContains(self.get(reverse('home')), 'Test Event')
+        self.assertContains(self.get(reverse('event_detail', args=[self.event.id])), 'Test Description')
+
+        self.client.force_login(self.student)
+        services.register_student(self.event, self.student)
+        self.assertContains(self.get(reverse('event_detail', args=[self.event.id])), 'Unregister')
+        self.assertContains(self.get(reverse('my_events')), 'Test Event')
+        response = self.get(reverse('event_registrations', args=[self.event.id]))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+
+        self.client.force_login(self.organizer)
+        self.assertContains(self.get(reverse('event_registrations', args=[self.event.id])), 'teststudent')
+        self.assertEqual(self.get(reverse('event_registrations', args=[9999])).status_code, 404)
+
+    def test_login_required(self):
+        """Test anonymous users are sent to the login page"""
+        response = self.get(reverse('my_events'))
+        self.assertRedirects(
+            response, f"{reverse('login')}?next={reverse('my_events')}", fetch_redirect_response=False
+        )
+
+    def test_write_paths_under_asgi(self):
+        """Test registration and the waitlist behave the same through the ASGI handler"""
+        other = User.objects.create_user(username='otherstudent', password='testpass123')
+        url = reverse('register_for_event', args=[self.event.id])
+        self.client.force_login(self.student)
+        self.request('post', url)
+        self.client.force_login(other)
+        self.request('post', url)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 1)
+        self.assertTrue(WaitlistEntry.objects.filter(student=other, event=self.event).exists())
+
+    def test_metrics_cover_async_views(self):
+        """Test PerformanceMiddleware counts queries run by async views in worker threads"""
+        self.client.force_login(self.student)
+        response = self.get(reverse('my_events'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertGreater(metrics.snapshot()['my_events']['db_queries']['p50'], 0)
+
+
+class RegistrationExportTest(TestCase):
+    """Test cases for streaming registration exports"""
+
+    def setUp(self):
+        self.client = Client()
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        self.other = User.objects.create_user(username='otherorganizer', password='testpass123', is_staff=True)
+        self.events = [
+            Event.objects.create(
+                title=f'Event {i}', description='Test Description',
+                date=timezone.now() + timedelta(days=7), location='Test Location',
+                organizer=self.organizer if i < 2 else self.other
+            )
+            for i in range(3)
+        ]
+        User.objects.bulk_create([User(username=f'student{i}', email=f'student{i}@example.com') for i in range(3)])
+        for student in User.objects.filter(username__startswith='student'):
+            for event in self.events:
+                Registration.objects.create(student=student, event=event)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_cells_cannot_inject_formulas(self):
+        """Test student-controlled text that starts with a formula character is quoted"""
+        User.objects.filter(username='student0').update(first_name='=HYPERLINK("http://evil")', last_name='-2+3')
+        self.client.login(username='testorganizer', password='testpass123')
+        body = self.read(self.client.get(reverse('export_event_registrations', args=[self.events[0].id, 'csv'])))
+        self.assertIn('"\'=HYPERLINK(""http://evil"")",\'-2+3', body)
+        ndjson = self.read(self.client.get(reverse('export_event_registrations', args=[self.events[0].id, 'ndjson'])))
+        self.assertIn('"first_name": "=HYPERLINK', ndjson)
+
+    def test_event_csv_export(self):
+        """Test a single event exports one CSV row per registration"""
+        self.client.login(username='testorganizer', password='testpass123')
+        response = self.client.get(reverse('export_event_registrations', args=[self.events[0].id, 'csv']))
+        self.assertIn('attachment;', response['Content-Disposition'])
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['event_id', 'event_title', 'event_date', 'username'])
+        self.assertEqual(len(lines), 4)
+        self.assertIn('student0@example.com', lines[1])
+
+    def test_organizer_ndjson_export(self):
+        """Test the organizer export covers only their own events"""
+        self.client.login(username='testorganizer', password='testpass123')
+        response = self.client.get(reverse('export_registrations', args=['ndjson']))
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({row['event_id'] for row in rows}, {self.events[0].id, self.events[1].id})
+
+    def test_export_permissions(self):
+        """Test other organizers and students cannot export, and unknown formats 404"""
+        self.client.login(username='otherorganizer', password='testpass123')
+        response = self.client.get(reverse('export_event_registrations', args=[self.events[0].id, 'csv']))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        response = self.client.get(reverse('export_registrations', args=['xml']))
+        self.assertEqual(response.status_code, 404)
+
+        self.client.force_login(User.objects.get(username='student0'))
+        response = self.client.get(reverse('export_registrations', args=['csv']))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+
+class RegistrationImportTest(TestCase):
+    """Test cases for bulk registration import"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        User.objects.bulk_create([
+            User(username=f'student{i}', email=f'student{i}@example.com') for i in range(10)
+        ])
+        self.event = Event.objects.create(
+            title='Orientation', description='Test Description',
+            date=timezone.now() + timedelta(days=7), location='Test Location',
+            organizer=self.organizer, capacity=6
+        )
+
+    def test_import_counts_and_overflow(self):
+        """Test the import reports each outcome and waitlists students beyond capacity"""
+        services.register_student(self.event, User.objects.get(username='student0'))
+        lines = ['username', 'student0', 'student1', 'student2@example.com', 'student1', 'nobody',
+                 'testorganizer', 'student3', 'student4', 'student5', 'student6', 'student7', '']
+        result = services.import_registrations(self.event, services.read_identifiers(lines))
+
+        self.assertEqual(result['registered'], 5)
+        self.assertEqual(result['waitlisted'], 2)
+        self.assertEqual(result['duplicate'], 2)
+        self.assertEqual(result['unknown'], 2)
+        self.assertEqual(result['unknown_sample'], ['nobody', 'testorganizer'])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 6)
+        self.assertEqual(
+            list(WaitlistEntry.objects.filter(event=self.event).values_list('student__username', flat=True)),
+            ['student6', 'student7']
+        )
+
+    def test_upload_view_and_command(self):
+        """Test the upload view and management command both import the file"""
+        client = Client()
+        client.login(username='testorganizer', password='testpass123')
+        upload = SimpleUploadedFile('cohort.csv', b'\xef\xbb\xbfemail\nstudent1@example.com\nstudent2@example.com\n')
+        response = client.post(reverse('import_registrations', args=[self.event.id]), {'file': upload})
+        self.assertRedirects(response, reverse('event_registrations', args=[self.event.id]))
+        self.assertEqual(Registration.objects.filter(event=self.event).count(), 2)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('student2\nstudent3\n')
+        out = StringIO()
+        call_command('import_registrations', self.event.id, csv_file.name, stdout=out)
+        os.unlink(csv_file.name)
+        self.assertIn('1 registered', out.getvalue())
+        self.assertIn('1 duplicate', out.getvalue())
+
+    def test_large_upload_stays_in_its_scaled_budget(self):
+        """Test a file of several batches fits the budget that grows with it"""
+        User.objects.bulk_create([User(username=f'cohort{i}', email=f'cohort{i}@example.com') for i in range(1200)])
+        rows = [f'cohort{i}' if i % 2 else f'cohort{i}@example.com' for i in range(1200)]
+        with CaptureQueriesContext(connection) as ctx:
+            services.import_registrations(self.event, rows)
+        self.assertLessEqual(len(ctx), services.import_query_budget(len(rows)))
+
+        client = Client()
+        client.force_login(self.organizer)
+        upload = SimpleUploadedFile('cohort.csv', '\n'.join(rows).encode())
+        with self.settings(QUERY_BUDGET_STRICT=True):
+            response = client.post(reverse('import_registrations', args=[self.event.id]), {'file': upload})
+        self.assertRedirects(response, reverse('event_registrations', args=[self.event.id]))
+
+
+@jobs.task(name='tests.flaky', max_attempts=2)
+def flaky_task(fail):
+    if fail:
+        raise RuntimeError('flaky')
+
+
+class JobQueueTest(TestCase):
+    """Test cases for the background job queue and notification tasks"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            username='testorganizer', password='testpass123', email='organizer@example.com', is_staff=True
+        )
+        self.students = [
+            User.objects.create_user(username=f'student{i}', password='testpass123', email=f'student{i}@example.com')
+            for i in range(3)
+        ]
+        self.event = Event.objects.create(
+            title='Test Event', description='Test Description',
+            date=timezone.now() + timedelta(days=7), location='Test Location',
+            organizer=self.organizer, capacity=1
+        )
+
+    def subjects(self, recipient):
+        return [message.subject for message in mail.outbox if recipient in message.to]
+
+    def test_eager_notifications(self):
+        """Test registrations, the waitlist and promotions email students when run eagerly"""
+        services.register_student(self.event, self.students[0])
+        services.register_student(self.event, self.students[1])
+        services.unregister_student(self.event, self.students[0])
+
+        self.assertEqual(Job.objects.count(), 0)
+        self.assertEqual(self.subjects('student0@example.com'), [
+            'You are registered for Test Event', 'Registration cancelled for Test Event'
+        ])
+        self.assertEqual(self.subjects('student1@example.com'), [
+            'You are on the waitlist for Test Event', 'A seat opened up for Test Event'
+        ])
+
+    @override_settings(JOBS_EAGER=False)
+    def test_queued_jobs_are_batched_by_the_worker(self):
+        """Test handlers only enqueue, and the worker sends one digest per organizer"""
+        self.event.capacity = None
+        self.event.save()
+        for student in self.students:
+            services.register_student(self.event, student)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.count(), 6)
+
+        call_command('run_worker', '--once', stdout=StringIO())
+        self.assertEqual(Job.objects.count(), 0)
+        digests = [message for message in mail.outbox if message.to == ['organizer@example.com']]
+        self.assertEqual(len(digests), 1)
+        self.assertIn('Test Event: 3 registered', digests[0].body)
+        self.assertEqual(len(mail.outbox), 4)
+
+    @override_settings(JOBS_EAGER=False)
+    def test_retries_with_backoff_then_fails(self):
+        """Test a failing job is rescheduled with backoff and marked failed after max attempts"""
+        job = flaky_task.delay(fail=True)
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('RuntimeError: flaky', job.last_error)
+
+        self.assertEqual(jobs.run_pending(), 0)
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('main.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_delete_event_notifies_registered_students(self):
+        """Test deleting an event emails its registered students"""
+        services.register_student(self.event, self.students[0])
+        client = Client()
+        client.login(username='testorganizer', password='testpass123')
+        client.post(reverse('delete_event', args=[self.event.id]))
+        self.assertIn('Cancelled: Test Event', self.subjects('student0@example.com'))
+
+    @override_settings(JOBS_EAGER=False)
+    def test_cancellation_is_mailed_by_the_purge(self):
+        """Test the queued payload holds no addresses and students are emailed before rows go"""
+        services.register_student(self.event, self.students[0])
+        Job.objects.all().delete()
+        client = Client()
+        client.login(username='testorganizer', password='testpass123')
+        client.post(reverse('delete_event', args=[self.event.id]))
+
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'main.tasks.purge_event')
+        self.assertNotIn('@', json.dumps(job.payload))
+        jobs.run_pending()
+        self.assertIn('Cancelled: Test Event', self.subjects('student0@example.com'))
+        self.assertFalse(Registration.objects.filter(event_id=self.event.id).exists())
+
+
+class EventDeletionTest(TestCase):
+    """Test cases for tombstoned, chunked event deletion"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        User.objects.bulk_create([User(username=f'student{i}') for i in range(5)])
+        self.students = list(User.objects.filter(is_staff=False))
+        self.event = Event.objects.create(
+            title='Doomed Event', description='Test Description',
+            date=timezone.now() + timedelta(days=7), location='Test Location', organizer=self.organizer
+        )
+        for student in self.students:
+            Registration.objects.create(student=student, event=self.event)
+
+    @override_settings(JOBS_EAGER=False)
+    def test_tombstoned_event_is_hidden_until_purged(self):
+        """Test a deleted event disappears at once and its rows go when the job runs"""
+        client = Client()
+        client.login(username='testorganizer', password='testpass123')
+        client.post(reverse('delete_event', args=[self.event.id]), follow=True)
+
+        self.assertFalse(Event.objects.filter(pk=self.event.pk).exists())
+        self.assertTrue(Event.all_objects.filter(pk=self.event.pk).exists())
+        self.assertEqual(Registration.objects.filter(event_id=self.event.pk).count(), 5)
+        self.assertNotContains(client.get(reverse('home')), 'Doomed Event')
+        self.assertEqual(client.get(reverse('event_detail', args=[self.event.id])).status_code, 404)
+        self.assertEqual(search.search_event_ids('doomed'), [])
+        client.force_login(self.students[0])
+        self.assertNotContains(client.get(reverse('my_events')), 'Doomed Event')
+
+        jobs.run_pending()
+        self.assertFalse(Event.all_objects.filter(pk=self.event.pk).exists())
+        self.assertEqual(Registration.objects.filter(event_id=self.event.pk).count(), 0)
+
+    def test_purge_in_chunks(self):
+        """Test purging removes every row however small the chunks"""
+        services.register_student(
+            Event.objects.create(
+                title='Other Event', description='Test Description',
+                date=timezone.now() + timedelta(days=7), location='Test Location', organizer=self.organizer
+            ),
+            self.students[0]
+        )
+        self.assertEqual(services.purge_event(self.event.pk, chunk_size=2), 6)
+        self.assertEqual(Registration.objects.count(), 1)
+
+    def test_delete_organizer(self):
+        """Test deleting an organizer purges their events and then the account"""
+        with CaptureQueriesContext(connection) as ctx:
+            services.delete_organizer(self.organizer, chunk_size=2)
+        self.assertFalse(User.objects.filter(username='testorganizer').exists())
+        self.assertEqual(Event.all_objects.count(), 0)
+        self.assertEqual(Registration.objects.count(), 0)
+        # The collector never had to gather the events' registrations
+        self.assertFalse(any('"main_registration"."event_id" IN' in query['sql'] for query in ctx.captured_queries))
+
+    def test_deleting_a_student_frees_their_seats(self):
+        """Test a deleted account's seats are released and the waitlists promoted"""
+        capped = Event.objects.create(
+            title='Capped Event', description='Test Description', capacity=1,
+            date=timezone.now() + timedelta(days=7), location='Test Location', organizer=self.organizer
+        )
+        services.register_student(capped, self.students[0])
+        services.register_student(capped, self.students[1])
+        Event.objects.filter(pk=self.event.pk).update(registration_count=5)
+
+        services.delete_organizer(self.students[0])
+        capped.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual((capped.registration_count, self.event.registration_count), (1, 4))
+        self.assertTrue(Registration.objects.filter(event=capped, student=self.students[1]).exists())
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_admin_deletes_go_through_services(self):
+        """Test deleting registrations in the admin keeps the counter and promotes the waitlist"""
+        capped = Event.objects.create(
+            title='Capped Event', description='Test Description', capacity=1,
+            date=timezone.now() + timedelta(days=7), location='Test Location', organizer=self.organizer
+        )
+        services.register_student(capped, self.students[0])
+        services.register_student(capped, self.students[1])
+        registration_admin = admin.site._registry[Registration]
+
+        registration_admin.delete_queryset(None, Registration.objects.filter(event=capped))
+        capped.refresh_from_db()
+        self.assertEqual(capped.registration_count, 1)
+        promoted = Registration.objects.get(event=capped)
+        self.assertEqual(promoted.student, self.students[1])
+
+        registration_admin.delete_model(None, promoted)
+        capped.refresh_from_db()
+        self.assertEqual(capped.registration_count, 0)
+
+
+class CalendarFeedTest(TestCase):
+    """Test cases for iCalendar feeds and their conditional GET handling"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        self.student = User.objects.create_user(username='teststudent', password='testpass123')
+        self.event = Event.objects.create(
+            title='Test Event, with commas; and semicolons',
+            description='Line one\nLine two ' + 'x' * 100,
+            date=timezone.now() + timedelta(days=7),
+            location='Test Location',
+            organizer=self.organizer
+        )
+        services.register_student(self.event, self.student)
+        self.url = reverse('calendar_feed', args=[ical.STUDENT, ical.feed_token(self.student, ical.STUDENT)])
+
+    def test_student_feed(self):
+        """Test the student feed lists registered events as escaped, folded iCalendar"""
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn(f'UID:event-{self.event.id}@student-engagement', body)
+        self.assertIn('SUMMARY:Test Event\\, with commas\\; and semicolons', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+        self.assertIn('\r\n ', body)
+
+    def test_not_modified_until_the_feed_changes(self):
+        """Test an unchanged feed is a one-query 304 and any change produces a new ETag"""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.event.location = 'Main Hall'
+        self.event.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('LOCATION:Main Hall', response.content.decode())
+
+        etag = response['ETag']
+        services.unregister_student(self.event, self.student)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('BEGIN:VEVENT', response.content.decode())
+
+    def test_organizer_feed_tracks_registrations(self):
+        """Test the organizer feed shows counts and changes when students sign up"""
+        url = reverse('calendar_feed', args=[ical.ORGANIZER, ical.feed_token(self.organizer, ical.ORGANIZER)])
+        response = self.client.get(url)
+        self.assertIn('1 registered', response.content.decode())
+        other = User.objects.create_user(username='otherstudent')
+        with self.captureOnCommitCallbacks(execute=True):
+            services.register_student(self.event, other)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_organizer_feed_tracks_offsetting_registrations(self):
+        """Test a cancellation on one event and a sign-up on another still change the organizer ETag"""
+        url = reverse('calendar_feed', args=[ical.ORGANIZER, ical.feed_token(self.organizer, ical.ORGANIZER)])
+        other_event = Event.objects.create(
+            title='Other Event', description='Test Description', date=timezone.now() + timedelta(days=8),
+            location='Test Location', organizer=self.organizer
+        )
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            services.unregister_student(self.event, self.student)
+            services.register_student(other_event, self.student)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('0 registered', response.content.decode())
+
+    def test_invalid_tokens(self):
+        """Test forged tokens and tokens for the other feed kind are rejected"""
+        self.assertEqual(self.client.get(reverse('calendar_feed', args=[ical.STUDENT, f'{self.student.pk}:forged'])).status_code, 404)
+        token = ical.feed_token(self.student, ical.STUDENT)
+        self.assertEqual(self.client.get(reverse('calendar_feed', args=[ical.ORGANIZER, token])).status_code, 404)
+
+
+class ApiTest(TestCase):
+    """Test cases for the read-only JSON API"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        self.student = User.objects.create_user(username='teststudent', password='testpass123')
+        self.events = [
+            Event.objects.create(
+                title=f'Event {i}',
+                description='Test Description',
+                date=timezone.now() + timedelta(days=i + 1),
+                location='Test Location',
+                organizer=self.organizer
+            )
+            for i in range(5)
+        ]
+
+    def test_event_list_fields_and_pages(self):
+        """Test sparse fieldsets and following next links through every event"""
+        url = reverse('api_event_list') + '?fields=id,title,organizer&size=2'
+        titles = []
+        while url:
+            data = self.client.get(url).json()
+            self.assertTrue(all(set(row) == {'id', 'title', 'organizer'} for row in data['results']))
+            titles += [row['title'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(titles, [f'Event {i}' for i in range(5)])
+        self.assertEqual(self.client.get(reverse('api_event_list')).json()['results'][0]['organizer'], 'testorganizer')
+
+    def test_bad_parameters(self):
+        """Test unknown fields, bad cursors and bad sorts are 400s"""
+        response = self.client.get(reverse('api_event_list') + '?fields=title,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+        self.assertEqual(self.client.get(reverse('api_event_list') + '?after=garbage').status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_event_list') + '?sort=random').status_code, 400)
+
+    def test_event_detail_conditional(self):
+        """Test a matching ETag is a 304 without queries and edits change the ETag"""
+        url = reverse('api_event_detail', args=[self.events[0].id])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['title'], 'Event 0')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.events[0].title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.events[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Renamed')
+
+    def test_event_list_conditional(self):
+        """Test the list ETag answers 304 without queries until a registration changes it"""
+        url = reverse('api_event_list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            services.register_student(self.events[0], self.student)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_event_detail_not_found(self):
+        """Test missing and deleted events are 404s"""
+        self.assertEqual(self.client.get(reverse('api_event_detail', args=[99999])).status_code, 404)
+        services.delete_event(self.events[0])
+        self.assertEqual(self.client.get(reverse('api_event_detail', args=[self.events[0].id])).status_code, 404)
+
+    def test_my_registrations(self):
+        """Test the registrations endpoint needs a session and lists the user's events"""
+        url = reverse('api_my_registrations')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        services.register_student(self.events[1], self.student)
+        self.client.login(username='teststudent', password='testpass123')
+        response = self.client.get(url + '?fields=event_id,event_title')
+        self.assertEqual(response.json()['results'], [{'event_id': self.events[1].id, 'event_title': 'Event 1'}])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class AnalyticsRollupTest(TestCase):
+    """Test cases for the incremental dashboard rollups"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        self.admin = User.objects.create_superuser(username='testadmin', password='testpass123')
+        self.students = [User.objects.create_user(username=f'student{i}') for i in range(3)]
+        self.events = [
+            Event.objects.create(
+                title=f'Event {i}',
+                description='Test Description',
+                date=timezone.now() + timedelta(days=7),
+                location='Main Hall' if i else 'Library',
+                organizer=self.organizer
+            )
+            for i in range(3)
+        ]
+
+    def counts(self, dimension):
+        return dict(Rollup.objects.filter(dimension=dimension).values_list('key', 'count'))
+
+    def test_incremental_refresh(self):
+        """Test each refresh only adds registrations past the watermark"""
+        for event in self.events:
+            services.register_student(event, self.students[0])
+        services.register_student(self.events[0], self.students[1])
+        self.assertEqual(analytics.refresh_rollups(batch_size=2, lag=0), 4)
+        self.assertEqual(analytics.refresh_rollups(lag=0), 0)
+
+        services.register_student(self.events[1], self.students[2])
+        self.assertEqual(analytics.refresh_rollups(lag=0), 1)
+        self.assertEqual(self.counts(Rollup.DAY), {timezone.localdate().isoformat(): 5})
+        self.assertEqual(self.counts(Rollup.LOCATION), {'Library': 2, 'Main Hall': 3})
+        self.assertEqual(analytics.top(Rollup.EVENT)[0], ('Event 0', 2))
+        self.assertEqual(
+            dict(analytics.engagement_distribution()),
+            {'1': 2, '2': 0, '3-5': 1, '6-10': 0, '11+': 0}
+        )
+
+    def test_lag_defers_recent_registrations(self):
+        """Test registrations younger than the lag wait for a later refresh"""
+        services.register_student(self.events[0], self.students[0])
+        self.assertEqual(analytics.refresh_rollups(lag=60), 0)
+        self.assertEqual(analytics.refresh_rollups(lag=0), 1)
+
+    def test_deleted_events_leave_top_events(self):
+        """Test purging an event removes it from the top events"""
+        services.register_student(self.events[0], self.students[0])
+        analytics.refresh_rollups(lag=0)
+        services.delete_event(self.events[0])
+        self.assertEqual(analytics.top(Rollup.EVENT), [])
+        self.assertEqual(self.counts(Rollup.LOCATION), {'Library': 1})
+
+    def test_dashboard_charts(self):
+        """Test admins see site-wide charts and organizers their own sign-ups"""
+        services.register_student(self.events[1], self.students[0])
+        call_command('refresh_rollups', lag=0, stdout=StringIO())
+        self.client.login(username='testadmin', password='testpass123')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Top locations')
+        self.assertEqual(response.context['analytics']['events'][0]['label'], 'Event 1')
+
+        self.client.login(username='testorganizer', password='testpass123')
+        response = self.client.get(reverse('dashboard'))
+        self.assertNotContains(response, 'Top locations')
+        self.assertEqual(response.context['analytics']['days'][-1]['count'], 1)
+
+
+class QueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """Test cases for query budgets on views and blocks"""
+
+    def setUp(self):
+        super().setUp()
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        for i in range(3):
+            Event.objects.create(
+                title=f'Event {i}', description='Test Description', date=timezone.now() + timedelta(days=1),
+                location='Test Location', organizer=self.organizer
+            )
+
+    def test_every_view_has_a_budget(self):
+        """Test each URL's view declares a query budget"""
+        from .urls import urlpatterns
+        for pattern in urlpatterns:
+            self.assertTrue(hasattr(pattern.callback, 'query_budget'), pattern.name)
+
+    def test_exceeded_budget_reports_call_sites(self):
+        """Test an N+1 loop fails with its queries grouped by the line that ran them"""
+        with self.assertRaises(budgets.QueryBudgetExceeded) as raised:
+            with self.assertMaxQueries(2, 'organizer names'):
+                names = [event.organizer.username for event in Event.objects.all()]
+        self.assertEqual(len(names), 3)
+        report = str(raised.exception)
+        self.assertIn('organizer names ran 4 queries, over its budget of 2', report)
+        self.assertIn('3x main/tests.py', report)
+        self.assertIn('FROM "auth_user"', report)
+
+    def test_budgeted_views(self):
+        """Test sync and async views count their queries, including sync_to_async work"""
+        def titles(request):
+            return HttpResponse(', '.join(event.title for event in Event.objects.all()))
+
+        async def count(request):
+            return HttpResponse(str(await Event.objects.acount()))
+
+        request = RequestFactory().get('/')
+        self.assertEqual(budgets.query_budget(1)(titles)(request).status_code, 200)
+        with self.assertRaises(budgets.QueryBudgetExceeded):
+            async_to_sync(budgets.query_budget(0)(count))(request)
+
+    def test_event_detail_for_registered_and_waitlisted_students(self):
+        """Test the detail page of a capped event stays in budget with a cold cache"""
+        event = Event.objects.create(
+            title='Capped Event', description='Test Description', date=timezone.now() + timedelta(days=2),
+            location='Test Location', organizer=self.organizer, capacity=1
+        )
+        registered = User.objects.create_user(username='registered', password='testpass123')
+        waiting = [User.objects.create_user(username=f'waiting{i}', password='testpass123') for i in range(2)]
+        for student in [registered] + waiting:
+            services.register_student(event, student)
+
+        for student, text in ((registered, 'Unregister'), (waiting[1], 'You are number 2 on the waitlist')):
+            cache.clear()
+            client = Client()
+            client.force_login(student)
+            self.assertContains(client.get(reverse('event_detail', args=[event.id])), text)
+
+    @override_settings(JOBS_EAGER=False)
+    def test_edit_event_promotions_with_the_real_queue(self):
+        """Test raising a capacity stays in budget when the jobs it queues are real INSERTs"""
+        event = Event.objects.create(
+            title='Capped Event', description='Test Description', date=timezone.now() + timedelta(days=2),
+            location='Test Location', organizer=self.organizer, capacity=1
+        )
+        User.objects.bulk_create([User(username=f'student{i}') for i in range(5)])
+        for student in User.objects.filter(username__startswith='student'):
+            services.register_student(event, student)
+        self.client.force_login(self.organizer)
+        for capacity in (2, 5):
+            self.client.post(reverse('edit_event', args=[event.id]), {
+                'title': event.title, 'description': event.description,
+                'date': event.date.strftime('%Y-%m-%dT%H:%M'), 'location': event.location, 'capacity': capacity,
+            })
+        event.refresh_from_db()
+        self.assertEqual(event.registration_count, 5)
+
+    def test_lenient_budget_logs_a_warning(self):
+        """Test outside strict mode an exceeded budget logs a stack sample instead of raising"""
+        with self.assertLogs('main.budgets', 'WARNING') as logs:
+            with budgets.QueryBudget(0, 'lenient', strict=False):
+                Event.objects.count()
+        self.assertIn('lenient ran 1 queries, over its budget of 0', logs.output[0])
+        self.assertIn('main/tests.py', logs.output[0])
+
+
+class AuthHotPathTest(TestCase):
+    """Test cases for the session engine and cached user lookups"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.student = User.objects.create_user(username='teststudent', password='testpass123')
+
+    def test_login_checks_password_once(self):
+        """Test the login view hashes the submitted password a single time"""
+        original = User.check_password
+        calls = []
+
+        def check_password(user, raw_password):
+            calls.append(raw_password)
+            return original(user, raw_password)
+
+        with unittest.mock.patch.object(User, 'check_password', check_password):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('login'), {'username': 'teststudent', 'password': 'testpass123'})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(calls, ['testpass123'])
+        self.assertLessEqual(len(queries), 9)
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=300
+    )
+    def test_cached_session_and_user(self):
+        """Test cached sessions and users leave authenticated pages only their own queries"""
+        self.client.force_login(self.student)
+        url = reverse('api_my_registrations')
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=300)
+    def test_saving_user_forgets_cached_copy(self):
+        """Test deactivating a user takes effect on their next request"""
+        self.client.force_login(self.student)
+        url = reverse('api_my_registrations')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.student.is_active = False
+        self.student.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        """Test logging in and out with sessions kept in a signed cookie"""
+        self.client.post(reverse('login'), {'username': 'teststudent', 'password': 'testpass123'})
+        self.assertEqual(self.client.get(reverse('api_my_registrations')).status_code, 200)
+        self.client.post(reverse('logout'))
+        self.assertEqual(self.client.get(reverse('api_my_registrations')).status_code, 401)
+
+
+class StaticPipelineTest(TestCase):
+    """Test cases for hashed, precompressed static files served by the app"""
+
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        production = self.settings(
+            STATIC_ROOT=static_root, STATIC_SERVE=True,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'main.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        production.enable()
+        self.addCleanup(production.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.client = Client()
+        self.url = re.search(r'/static/css/style[^"]*', self.client.get(reverse('home')).content.decode()).group()
+        with open(os.path.join(os.path.dirname(__file__), 'static', 'css', 'style.css'), 'rb') as source:
+            self.original = source.read()
+
+    def test_hashed_compressed_and_immutable(self):
+        """Test pages link hashed names served gzipped with a far-future immutable lifetime"""
+        self.assertRegex(self.url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.original)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        plain = self.client.get(self.url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(plain.content, self.original)
+        self.assertEqual(self.client.get('/static/css/style.css')['Cache-Control'], 'public, max-age=60')
+
+    def test_repeat_load_is_not_modified(self):
+        """Test a revalidation with the ETag is an empty 304 and unknown files 404"""
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get('/static/css/missing.css').status_code, 404)
+
+
+class TemplateRenderingTest(TestCase):
+    """Test cases for fragment rendering with precomputed links"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            username='testorganizer', password='testpass123', first_name='Ada', last_name='Lovelace', is_staff=True
+        )
+        self.event = Event.objects.create(
+            title='Test Event', description='Test Description', date=timezone.now() + timedelta(days=1),
+            location='Test Location', organizer=self.organizer
+        )
+
+    def test_fragments_link_like_url_tag(self):
+        """Test spliced links match reverse() and the organizer name is shown"""
+        card = caching.render_events('main/includes/event_card.html', [self.event])[self.event.id]
+        row = caching.render_events('main/includes/event_row.html', [self.event])[self.event.id]
+        self.assertIn(f'href="{reverse("event_detail", args=[self.event.id])}"', card)
+        self.assertIn('Ada Lovelace', card)
+        for name in caching.EVENT_URL_NAMES.values():
+            self.assertIn(f'href="{reverse(name, args=[self.event.id])}"', row)
+
+    def test_cached_loader_and_benchmark(self):
+        """Test templates use the cached loader and the benchmark command runs"""
+        out = StringIO()
+        call_command('benchmark_templates', events=20, repeat=1, stdout=out)
+        self.assertIn('Cached template loader: on', out.getvalue())
+        self.assertIn('event_row.html', out.getvalue())
+
+
+class AnonymousPageCacheTest(TestCase):
+    """Test cases for whole-page caching of anonymous home and event pages"""
+
+    def setUp(self):
+        cache.clear()
+        caching.reset_cache_stats()
+        self.client = Client()
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        self.student = User.objects.create_user(username='teststudent', password='testpass123')
+        self.event = Event.objects.create(
+            title='Test Event', description='Test Description', date=timezone.now() + timedelta(days=7),
+            location='Test Location', organizer=self.organizer
+        )
+
+    def test_repeat_visit_is_cached_and_revalidates(self):
+        """Test a warm anonymous page needs no queries and a matching ETag gets a 304"""
+        first = self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('home'))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('Last-Modified', second)
+        self.assertIn('Cookie', second['Vary'])
+        self.assertEqual(caching.cache_stats()['page_hits'], 1)
+
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_changes_select_a_new_page(self):
+        """Test sign-ups and edits show up on the next anonymous request"""
+        url = reverse('event_detail', args=[self.event.id])
+        etag = self.client.get(url)['ETag']
+        self.client.get(reverse('home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            services.register_student(self.event, self.student)
+        self.assertContains(self.client.get(reverse('home')), '1 student')
+        self.event.title = 'Renamed Event'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed Event')
+
+    def test_logged_in_and_flash_messages_bypass_cache(self):
+        """Test visitors with a session or pending messages get their own page"""
+        self.client.get(reverse('home'))
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'teststudent')
+        self.assertFalse(response.has_header('ETag'))
+
+        anonymous = Client()
+        anonymous.cookies['messages'] = 'pending'
+        self.assertFalse(anonymous.get(reverse('home')).has_header('ETag'))
+
+
+class RegisteredEventIdsTest(TestCase):
+    """Test cases for the per-request set of the student's registered events"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.organizer = User.objects.create_user(username='testorganizer', password='testpass123', is_staff=True)
+        self.student = User.objects.create_user(username='teststudent', password='testpass123')
+        self.events = [
+            Event.objects.create(
+                title=f'Event {i}', description='Test Description', date=timezone.now() + timedelta(days=i + 1),
+                location='Test Location', organizer=self.organizer
+            )
+            for i in range(4)
+        ]
+
+    def test_loaded_once_per_request(self):
+        """Test the set is queried once and staff get an empty set without a query"""
+        services.register_student(self.events[0], self.student)
+        request = RequestFactory().get('/')
+        request.user = self.student
+        with self.assertNumQueries(1):
+            self.assertEqual(registered_event_ids(request), {self.events[0].id})
+            self.assertIs(registered_event_ids(request), registered_event_ids(request))
+        request = RequestFactory().get('/')
+        request.user = self.organizer
+        with self.assertNumQueries(0):
+            self.assertEqual(registered_event_ids(request), set())
+
+    def test_badges_cost_one_query_per_page(self):
+        """Test home and search badge the registered cards with the same number of queries"""
+        self.client.force_login(self.student)
+        services.register_student(self.events[0], self.student)
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as one:
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'bi-check-circle', count=1)
+
+        for event in self.events[1:3]:
+            services.register_student(event, self.student)
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as three:
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'bi-check-circle', count=3)
+        self.assertEqual(len(three), len(one))
+
+        search.rebuild_index()
+        response = self.client.get(reverse('search_events'), {'q': 'Event'})
+        self.assertContains(response, 'bi-check-circle', count=3)
+
+    def test_event_detail_uses_the_set(self):
+        """Test the detail page shows the registered state"""
+        self.client.force_login(self.student)
+        services.register_student(self.events[0], self.student)
+        self.assertContains(self.client.get(reverse('event_detail', args=[self.events[0].id])), 'Unregister')
+        self.assertNotContains(self.client.get(reverse('event_detail', args=[self.events[1].id])), 'Unregister')
@@ -1,9 +1,10 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Home
     path('', views.home, name='home'),
+    path('search/', views.search_events, name='search_events'),
     
     # Authentication
     path('login/', views.login_view, name='login'),
@@ -15,6 +16,8 @@ urlpatterns = [
     path('event/<int:event_id>/register/', views.register_for_event, name='register_for_event'),
     path('event/<int:event_id>/unregister/', views.unregister_from_event, name='unregister_from_event'),
     path('event/<int:event_id>/registrations/', views.event_registrations, name='event_registrations'),
+    path('event/<int:event_id>/registrations/import/', views.import_registrations, name='import_registrations'),
+    path('event/<int:event_id>/registrations/export.<str:fmt>', views.export_event_registrations, name='export_event_registrations'),
     
     # Event Management (Organizers)
     path('event/create/', views.create_event, name='create_event'),
@@ -24,4 +27,15 @@ urlpatterns = [
     # Dashboards
     path('dashboard/', views.dashboard, name='dashboard'),
     path('my-events/', views.my_events, name='my_events'),
+    path('calendar/<str:kind>/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('dashboard/registrations/export.<str:fmt>', views.export_registrations, name='export_registrations'),
+    
+    # Monitoring (staff only)
+    path('stats/cache/', views.cache_stats, name='cache_stats'),
+    path('stats/requests/', views.request_stats, name='request_stats'),
+
+    # JSON API (read-only)
+    path('api/v1/events/', api.event_list, name='api_event_list'),
+    path('api/v1/events/<int:event_id>/', api.event_detail, name='api_event_detail'),
+    path('api/v1/me/registrations/', api.my_registrations, name='api_my_registrations'),
 ]
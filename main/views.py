@@ -1,19 +1,114 @@
+import io
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, logout, authenticate
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import IntegrityError
 from django.contrib.auth.forms import AuthenticationForm
-from .models import Event, Registration
-from .forms import StudentRegistrationForm, EventForm
+from .models import Event, Registration, WaitlistEntry
+from .forms import StudentRegistrationForm, EventForm, EventSearchForm, RegistrationImportForm
+from . import analytics, budgets, caching, exports, ical, metrics, search, services, tasks
+from .budgets import QueryBudget, query_budget
+from .context_processors import registered_event_ids
+from .decorators import aget_user, async_login_required, cache_anonymous_page
+from .pagination import InvalidCursor, KeysetPaginator
+
+# Keyset ordering for each listing slice; 'id' breaks ties between equal keys
+EVENT_SLICES = {
+    'upcoming': ('date', 'id'),
+    'past': ('-date', '-id'),
+}
+POPULAR_ORDERING = ('-registration_count', '-id')
+MAX_PAGE_SIZE = 100
+
+# Rendering runs context processors that read the session and user, which
+# may query the database, so async views render in a worker thread
+arender = sync_to_async(render)
+
+
+def _event_page(request, events, scope, fragment_template, default_size):
+    """
+    Paginate an event queryset from the 'when', 'sort', 'size' and 'after' query params.
+
+    Pages are cached as lists of event ids under `scope`, and each event is
+    rendered through `fragment_template` from the fragment cache. Because the
+    upcoming/past split moves with the clock, an event crossing over shows up
+    in its new slice once the cached page expires (EVENT_CACHE_TIMEOUT).
+    """
+    when = request.GET.get('when', 'upcoming')
+    if when not in EVENT_SLICES:
+        when = 'upcoming'
+    sort = 'popular' if request.GET.get('sort') == 'popular' else 'date'
+    try:
+        size = int(request.GET.get('size', default_size))
+    except ValueError:
+        size = default_size
+    size = max(1, min(size, MAX_PAGE_SIZE))
+
+    events = events.upcoming() if when == 'upcoming' else events.past()
+    ordering = POPULAR_ORDERING if sort == 'popular' else EVENT_SLICES[when]
+    paginator = KeysetPaginator(events, ordering, size)
+    cursor = request.GET.get('after')
+    try:
+        page, loaded = caching.cached_event_page(
+            (scope, when, sort, size, cursor), sort == 'popular', lambda: paginator.page(cursor)
+        )
+    except InvalidCursor:
+        raise Http404('Invalid page cursor.')
 
+    return {
+        'events': caching.render_event_fragments(fragment_template, page.object_list, loaded),
+        'page': page,
+        'when': when,
+        'sort': sort,
+        'page_size': size,
+        'is_first_page': not request.GET.get('after'),
+    }
 
-def home(request):
-    """Home page showing all events"""
-    events = Event.objects.all()
-    return render(request, 'main/index.html', {'events': events})
 
+def _home_versions(request):
+    """Anonymous home pages show registration counts, so sign-ups change them too"""
+    return caching.list_versions([caching.EVENTS_LIST, caching.POPULARITY_LIST, caching.PAGES])
 
+
+@query_budget(4)
+@cache_anonymous_page(_home_versions)
+async def home(request):
+    """Home page showing a page of upcoming or past events"""
+    context = await sync_to_async(_event_page)(
+        request, Event.objects.with_listing_data(), 'home',
+        'main/includes/event_card.html', 12
+    )
+    return await arender(request, 'main/index.html', context)
+
+
+@query_budget(6)
+def search_events(request):
+    """Ranked full-text search over event titles, descriptions and locations"""
+    form = EventSearchForm(request.GET or None)
+    events = []
+    
+    if form.is_valid():
+        start, end = form.date_range()
+        organizer = form.cleaned_data.get('organizer')
+        event_ids = search.search_event_ids(
+            form.cleaned_data['q'], start=start, end=end,
+            organizer_id=organizer.pk if organizer else None, limit=30
+        )
+        events = caching.render_event_fragments('main/includes/event_card.html', event_ids)
+    
+    return render(request, 'main/search.html', {'form': form, 'events': events})
+
+
+@query_budget(9)
 def login_view(request):
     """Login page for all users"""
     if request.user.is_authenticated:
@@ -22,13 +117,11 @@ def login_view(request):
     if request.method == 'POST':
         form = AuthenticationForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                messages.success(request, f'Welcome back, {username}!')
-                return redirect('dashboard')
+            # is_valid() already authenticated; a second authenticate() would hash the password again
+            user = form.get_user()
+            login(request, user)
+            messages.success(request, f'Welcome back, {user.get_username()}!')
+            return redirect('dashboard')
         else:
             messages.error(request, 'Invalid username or password.')
     else:
@@ -37,6 +130,7 @@ def login_view(request):
     return render(request, 'main/login.html', {'form': form})
 
 
+@query_budget(4)
 def logout_view(request):
     """Logout user"""
     logout(request)
@@ -44,6 +138,7 @@ def logout_view(request):
     return redirect('home')
 
 
+@query_budget(11)
 def register_view(request):
     """Student registration page"""
     if request.user.is_authenticated:
@@ -62,20 +157,29 @@ def register_view(request):
     return render(request, 'main/register.html', {'form': form})
 
 
-def event_detail(request, event_id):
+@query_budget(5)
+@cache_anonymous_page(lambda request, event_id: caching.event_versions([event_id]).values())
+async def event_detail(request, event_id):
     """Event detail page"""
-    event = get_object_or_404(Event, id=event_id)
-    is_registered = False
+    event = await sync_to_async(caching.get_event)(event_id)
+    if event is None:
+        raise Http404('No Event matches the given query.')
+    waitlist_entry = None
     
-    if request.user.is_authenticated:
-        is_registered = Registration.objects.filter(student=request.user, event=event).exists()
+    user = await aget_user(request)
+    is_registered = event.id in await sync_to_async(registered_event_ids)(request)
+    if user.is_authenticated:
+        if not is_registered and event.capacity is not None:
+            waitlist_entry = await WaitlistEntry.objects.with_position().filter(student=user, event=event).afirst()
     
-    return render(request, 'main/event_detail.html', {
+    return await arender(request, 'main/event_detail.html', {
         'event': event,
-        'is_registered': is_registered
+        'is_registered': is_registered,
+        'waitlist_entry': waitlist_entry,
     })
 
 
+@query_budget(12)
 @login_required
 def register_for_event(request, event_id):
     """Register student for an event"""
@@ -86,56 +190,82 @@ def register_for_event(request, event_id):
         messages.error(request, 'Only students can register for events.')
         return redirect('event_detail', event_id=event_id)
     
-    try:
-        registration = Registration.objects.create(student=request.user, event=event)
+    outcome = services.register_student(event, request.user)
+    if outcome == services.REGISTERED:
         messages.success(request, f'Successfully registered for "{event.title}"!')
-    except IntegrityError:
+    elif outcome == services.WAITLISTED:
+        messages.info(request, f'"{event.title}" is full. You have been added to the waitlist.')
+    elif outcome == services.ALREADY_WAITLISTED:
+        messages.warning(request, 'You are already on the waitlist for this event.')
+    else:
         messages.warning(request, 'You are already registered for this event.')
     
     return redirect('event_detail', event_id=event_id)
 
 
+@query_budget(19)
 @login_required
 def unregister_from_event(request, event_id):
     """Unregister student from an event"""
     event = get_object_or_404(Event, id=event_id)
     
-    try:
-        registration = Registration.objects.get(student=request.user, event=event)
-        registration.delete()
+    outcome = services.unregister_student(event, request.user)
+    if outcome == services.UNREGISTERED:
         messages.success(request, f'Successfully unregistered from "{event.title}".')
-    except Registration.DoesNotExist:
+    elif outcome == services.LEFT_WAITLIST:
+        messages.success(request, f'You have left the waitlist for "{event.title}".')
+    else:
         messages.error(request, 'You are not registered for this event.')
     
     return redirect('event_detail', event_id=event_id)
 
 
+@query_budget(8)
 @login_required
 def dashboard(request):
     """Dashboard for organizers and admins"""
     if request.user.is_staff or request.user.is_superuser:
         # Organizer/Admin dashboard
         if request.user.is_superuser:
-            events = Event.objects.all()
+            events = Event.objects.with_listing_data()
+            scope = 'dashboard:all'
         else:
-            events = Event.objects.filter(organizer=request.user)
+            events = Event.objects.filter(organizer=request.user).with_listing_data()
+            scope = f'dashboard:{request.user.pk}'
         
-        return render(request, 'main/dashboard.html', {
-            'events': events,
-            'is_organizer': True
-        })
+        context = _event_page(
+            request, events, scope, 'main/includes/event_row.html', default_size=25
+        )
+        context['is_organizer'] = True
+        context['analytics'] = analytics.dashboard_summary(request.user)
+        context['calendar_url'] = request.build_absolute_uri(
+            reverse('calendar_feed', args=[ical.ORGANIZER, ical.feed_token(request.user, ical.ORGANIZER)])
+        )
+        return render(request, 'main/dashboard.html', context)
     else:
         # Student dashboard - redirect to my events
         return redirect('my_events')
 
 
-@login_required
-def my_events(request):
+@query_budget(3)
+@async_login_required
+async def my_events(request):
     """Show student's registered events"""
-    registrations = Registration.objects.filter(student=request.user).select_related('event')
-    return render(request, 'main/my_events.html', {'registrations': registrations})
+    registrations = [
+        registration async for registration in
+        Registration.objects.filter(student=request.user, event__deleted_at__isnull=True)
+        .select_related('event')
+    ]
+    calendar_url = request.build_absolute_uri(
+        reverse('calendar_feed', args=[ical.STUDENT, ical.feed_token(request.user, ical.STUDENT)])
+    )
+    return await arender(request, 'main/my_events.html', {
+        'registrations': registrations,
+        'calendar_url': calendar_url,
+    })
 
 
+@query_budget(3)
 @login_required
 def create_event(request):
     """Create a new event (organizers only)"""
@@ -157,20 +287,28 @@ def create_event(request):
     return render(request, 'main/create_event.html', {'form': form})
 
 
+# A raised capacity adds a fixed nine queries however many students it promotes
+@query_budget(15)
 @login_required
 def edit_event(request, event_id):
     """Edit an existing event"""
     event = get_object_or_404(Event, id=event_id)
     
     # Check permissions
-    if not request.user.is_superuser and event.organizer != request.user:
+    if not request.user.is_superuser and event.organizer_id != request.user.pk:
         messages.error(request, 'You do not have permission to edit this event.')
         return redirect('dashboard')
     
     if request.method == 'POST':
         form = EventForm(request.POST, instance=event)
         if form.is_valid():
-            form.save()
+            event = form.save()
+            # A raised or removed capacity frees seats for waitlisted students
+            if 'capacity' in form.changed_data:
+                services.promote_waitlist(event)
+            if form.has_changed():
+                tasks.notify_event_updated.delay(event_id=event.id)
+                tasks.warm_event_cache.delay(event_id=event.id)
             messages.success(request, f'Event "{event.title}" updated successfully!')
             return redirect('dashboard')
     else:
@@ -179,6 +317,7 @@ def edit_event(request, event_id):
     return render(request, 'main/edit_event.html', {'form': form, 'event': event})
 
 
+@query_budget(12)
 @login_required
 def delete_event(request, event_id):
     """Delete an event"""
@@ -190,27 +329,147 @@ def delete_event(request, event_id):
         return redirect('dashboard')
     
     if request.method == 'POST':
-        event_title = event.title
-        event.delete()
-        messages.success(request, f'Event "{event_title}" deleted successfully!')
+        # Hidden at once; a background job emails the students, then removes the registrations
+        services.delete_event(event, notify_students=True)
+        messages.success(request, f'Event "{event.title}" deleted successfully!')
         return redirect('dashboard')
     
     return render(request, 'main/delete_event.html', {'event': event})
 
 
-@login_required
-def event_registrations(request, event_id):
+@query_budget(4)
+@async_login_required
+async def event_registrations(request, event_id):
     """View registered students for an event (organizers only)"""
-    event = get_object_or_404(Event, id=event_id)
+    try:
+        event = await Event.objects.aget(id=event_id)
+    except Event.DoesNotExist:
+        raise Http404('No Event matches the given query.')
     
     # Check permissions
-    if not request.user.is_superuser and event.organizer != request.user:
+    if not request.user.is_superuser and event.organizer_id != request.user.pk:
         messages.error(request, 'You do not have permission to view registrations for this event.')
         return redirect('dashboard')
     
-    registrations = Registration.objects.filter(event=event).select_related('student')
+    registrations = [
+        registration async for registration in
+        Registration.objects.filter(event=event).select_related('student')
+    ]
     
-    return render(request, 'main/event_registrations.html', {
+    return await arender(request, 'main/event_registrations.html', {
         'event': event,
         'registrations': registrations
     })
+
+
+# The import itself grows with the file and is checked against
+# services.import_query_budget instead, so this only covers the page
+@query_budget(6)
+@login_required
+def import_registrations(request, event_id):
+    """Register a cohort of students from an uploaded CSV (organizers only)"""
+    event = get_object_or_404(Event, id=event_id)
+    
+    # Check permissions
+    if not request.user.is_superuser and event.organizer != request.user:
+        messages.error(request, 'You do not have permission to import registrations for this event.')
+        return redirect('dashboard')
+    
+    if request.method == 'POST':
+        form = RegistrationImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            lines = io.TextIOWrapper(form.cleaned_data['file'], encoding='utf-8-sig', errors='replace')
+            identifiers = services.read_identifiers(lines)
+            with budgets.exempt(), QueryBudget(services.import_query_budget(len(identifiers)), 'import'):
+                result = services.import_registrations(event, identifiers)
+            messages.success(
+                request,
+                f'Imported {result["registered"]} registrations, {result["waitlisted"]} waitlisted; '
+                f'{result["duplicate"]} already signed up, {result["unknown"]} unknown.'
+            )
+            if result['unknown_sample']:
+                messages.warning(request, 'Unknown: ' + ', '.join(result['unknown_sample']))
+            return redirect('event_registrations', event_id=event.id)
+    else:
+        form = RegistrationImportForm()
+    
+    return render(request, 'main/import_registrations.html', {'form': form, 'event': event})
+
+
+@query_budget(3)
+@login_required
+def export_event_registrations(request, event_id, fmt):
+    """Download an event's registrations as CSV or NDJSON (organizers only)"""
+    if fmt not in exports.FORMATS:
+        raise Http404('Unknown export format.')
+    event = get_object_or_404(Event, id=event_id)
+    
+    # Check permissions
+    if not request.user.is_superuser and event.organizer_id != request.user.pk:
+        messages.error(request, 'You do not have permission to export registrations for this event.')
+        return redirect('dashboard')
+    
+    return exports.streaming_response(
+        Registration.objects.filter(event=event), fmt, f'event-{event.id}-registrations'
+    )
+
+
+@query_budget(2)
+@login_required
+def export_registrations(request, fmt):
+    """Download the registrations of every event the user organizes (all events for admins)"""
+    if fmt not in exports.FORMATS:
+        raise Http404('Unknown export format.')
+    if not (request.user.is_staff or request.user.is_superuser):
+        messages.error(request, 'Only organizers can export registrations.')
+        return redirect('home')
+    
+    if request.user.is_superuser:
+        registrations = Registration.objects.filter(event__deleted_at__isnull=True)
+    else:
+        registrations = Registration.objects.filter(event__organizer=request.user, event__deleted_at__isnull=True)
+    return exports.streaming_response(registrations, fmt, f'{request.user.username}-registrations')
+
+
+@query_budget(2)
+def calendar_feed(request, kind, token):
+    """
+    iCalendar feed of a student's registrations or an organizer's events.
+
+    Authenticated by the signed token in the URL. Unchanged feeds get a 304,
+    and rendered feeds are cached under their ETag.
+    """
+    user_id = ical.user_id_for_token(token, kind)
+    if user_id is None:
+        raise Http404('Unknown calendar feed.')
+    
+    etag, last_modified = ical.feed_state(kind, user_id)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        key = f'ical:{request.get_host()}:{etag}'
+        body = cache.get(key)
+        if body is None:
+            body = ical.render_feed(kind, user_id, request.build_absolute_uri)
+            cache.set(key, body, getattr(settings, 'EVENT_CACHE_TIMEOUT', 300))
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+    
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Clients may reuse the feed briefly, then must revalidate
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
+
+@query_budget(2)
+@staff_member_required
+def cache_stats(request):
+    """Cache hit/miss counters for this server process (staff only)"""
+    return JsonResponse(caching.cache_stats())
+
+
+@query_budget(2)
+@staff_member_required
+def request_stats(request):
+    """Rolling request latency, query and size percentiles per URL name (staff only)"""
+    return JsonResponse(metrics.snapshot())
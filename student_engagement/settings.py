@@ -2,6 +2,8 @@
 Django settings for student_engagement project.
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -35,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.StaticFilesMiddleware',
+    'main.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,15 +52,24 @@ ROOT_URLCONF = 'student_engagement.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to PerformanceMiddleware
+        'BACKEND': 'main.template_backends.TimedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compile each template once per process in every environment;
+            # runserver's autoreloader still resets the cache on edits
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'main.context_processors.registrations',
             ],
         },
     },
@@ -67,14 +80,135 @@ WSGI_APPLICATION = 'student_engagement.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# DJANGO_DB_ENGINE selects sqlite (default) or postgresql; the DJANGO_DB_*
+# variables below fill in the connection details.
+
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+DATABASE_PROFILES = {
+    'sqlite': {
+        # Stock SQLite backend plus connection PRAGMAs and BEGIN IMMEDIATE
+        'ENGINE': 'main.db_backends.sqlite3',
+        'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            # Seconds a writer waits for the lock before "database is locked"
+            'timeout': int(os.environ.get('DJANGO_DB_BUSY_TIMEOUT', 20)),
+            # Writers queue on the lock at BEGIN instead of deadlocking when a
+            # transaction that has already read tries to write
+            'transaction_mode': 'IMMEDIATE',
+            # WAL lets readers run alongside the writer; NORMAL sync is safe in
+            # WAL mode and only fsyncs at checkpoints
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA mmap_size={int(os.environ.get("DJANGO_DB_MMAP_SIZE", 256 * 1024 * 1024))};'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        'TEST': {
+            # File-backed so concurrency tests get real SQLite locking instead
+            # of the shared-cache table locks of an in-memory database
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DJANGO_DB_NAME', 'student_engagement'),
+        'USER': os.environ.get('DJANGO_DB_USER', 'student_engagement'),
+        'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+        'HOST': os.environ.get('DJANGO_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DJANGO_DB_PORT', '5432'),
+        'OPTIONS': {'connect_timeout': 5},
+        # PgBouncer in transaction pooling mode cannot keep a server-side
+        # cursor open between transactions
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DJANGO_DB_PGBOUNCER') == '1',
+    },
+}
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **DATABASE_PROFILES[DB_ENGINE],
+        # Seconds to keep a connection open across requests (0 closes it after
+        # every request); reused connections are checked first
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# DJANGO_CACHE_BACKEND selects locmem (default, per process), file (shared by
+# the processes on one host) or redis (shared by all hosts, needs redis-py).
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_BACKEND = os.environ.get('DJANGO_CACHE_BACKEND', 'locmem')
+CACHE_LOCATIONS = {
+    'locmem': 'student-engagement',
+    'file': str(BASE_DIR / 'cache'),
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', CACHE_LOCATIONS[CACHE_BACKEND]),
+        'OPTIONS': {'MAX_ENTRIES': 10000} if CACHE_BACKEND != 'redis' else {},
     }
 }
 
+# Sessions
+# https://docs.djangoproject.com/en/4.2/topics/http/sessions/#configuring-the-session-engine
+# DJANGO_SESSION_ENGINE selects db, cached_db (reads from the cache, writes
+# through to the database), cache or signed_cookies (no server-side storage).
+# cached_db is the default with a shared cache; with locmem each process would
+# keep its own copy and could still accept a session another one logged out.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[
+    os.environ.get('DJANGO_SESSION_ENGINE', 'db' if CACHE_BACKEND == 'locmem' else 'cached_db')
+]
+
+# Authenticated requests load their user through main.auth_backends, which
+# keeps users in the cache for this many seconds; saving a user drops its
+# entry. Off (0) by default with locmem for the same reason as sessions.
+AUTHENTICATION_BACKENDS = ['main.auth_backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get(
+    'AUTH_USER_CACHE_TIMEOUT', 0 if CACHE_BACKEND == 'locmem' else 300
+))
+
+# Seconds that cached event pages, fragments and objects live. Signals
+# invalidate them on change; the timeout only bounds clock-driven staleness
+# such as an event moving from the upcoming to the past slice.
+EVENT_CACHE_TIMEOUT = int(os.environ.get('EVENT_CACHE_TIMEOUT', 300))
+# Seconds that the version tokens in those keys live. Requests for any event
+# id mint a token, so they must expire; a token that does only turns the
+# entries and ETags made with it into misses.
+CACHE_VERSION_TIMEOUT = int(os.environ.get('CACHE_VERSION_TIMEOUT', 3600))
+# Serve home and event detail pages to anonymous visitors from a shared
+# whole-page cache (main.decorators.cache_anonymous_page)
+ANONYMOUS_PAGE_CACHE = os.environ.get('ANONYMOUS_PAGE_CACHE', '1') == '1'
+
+
+# Request performance metrics (main.middleware.PerformanceMiddleware)
+# Fraction of requests measured; the rest skip instrumentation entirely.
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', 1.0))
+# Number of recent requests per URL name kept for percentiles.
+PERF_WINDOW_SIZE = int(os.environ.get('PERF_WINDOW_SIZE', 1000))
+# Add a Server-Timing header to measured responses.
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', '1') == '1'
+# Raise QueryBudgetExceeded instead of logging a warning when a view runs more
+# queries than its @query_budget (main.budgets); always on for tests.
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT') == '1' or sys.argv[1:2] == ['test']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -112,6 +246,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'main' / 'static']
+STATIC_ROOT = Path(os.environ.get('DJANGO_STATIC_ROOT', BASE_DIR / 'staticfiles'))
+
+# DJANGO_STATIC_PROFILE=production stores collected files under content-hashed
+# names with gzip/brotli copies (main.storage) and serves them from the app
+# process (main.middleware.StaticFilesMiddleware). Run collectstatic first.
+STATIC_PROFILE = os.environ.get('DJANGO_STATIC_PROFILE', 'dev')
+STATIC_SERVE = STATIC_PROFILE == 'production'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'main.storage.CompressedManifestStaticFilesStorage' if STATIC_SERVE
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# Cache lifetime of static files without a content hash in their name
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 60))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -126,3 +276,25 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
+
+
+# Email
+# The console backend prints messages instead of sending them; set
+# DJANGO_EMAIL_BACKEND to django.core.mail.backends.smtp.EmailBackend (and the
+# EMAIL_HOST settings) in production. Tests always use the locmem backend.
+EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DJANGO_DEFAULT_FROM_EMAIL', 'events@student-engagement.local')
+
+
+# Background jobs (main.jobs, run by `manage.py run_worker`)
+# Run jobs inline in the request instead of queueing them; always on for tests.
+JOBS_EAGER = os.environ.get('JOBS_EAGER') == '1' or sys.argv[1:2] == ['test']
+# Seconds before the first retry of a failed job; doubles on every attempt.
+JOBS_RETRY_BACKOFF = int(os.environ.get('JOBS_RETRY_BACKOFF', 10))
+JOBS_MAX_BACKOFF = int(os.environ.get('JOBS_MAX_BACKOFF', 3600))
+
+
+# Dashboard analytics (main.analytics, refreshed by `manage.py refresh_rollups`)
+# Registrations younger than this many seconds are left for the next refresh,
+# so rows from transactions that commit late are not skipped by the watermark.
+ROLLUP_LAG = int(os.environ.get('ROLLUP_LAG', 30))